@@ -0,0 +1,276 @@
+"""
+Agregados materializados para los endpoints del dashboard
+Se calculan una sola vez tras cargar los datos y se sirven directamente,
+sin recorrer de nuevo la tabla de transacciones en cada petición. Las
+transacciones nuevas se suman a los agregados con update(); las tablas por
+producto y categoría de cada lote quedan pendientes hasta superar el umbral
+de mezcla, y los listados, los tops y las categorías se reconstruyen recién
+cuando se piden.
+"""
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+from listings import Listing
+
+PRODUCT_KEYS = ['CodigoStock', 'Descripcion_Ingles', 'Descripcion_Español', 'Categoria']
+CLIENT_LIST_COLUMNS = ['IDCliente', 'Ingresos_Total', 'Cantidad_Total', 'Num_Compras']
+TOP_N = 20
+# Valores pendientes (sin ordenar) a partir de los cuales se mezclan con los
+# ordenados: el mayor entre un mínimo y una fracción de los ordenados
+MERGE_MIN_ROWS = 10000
+MERGE_FRACTION = 0.05
+
+
+def compute_product_table(df):
+    """Métricas por producto (ingresos, cantidad y suma/conteo de precios)"""
+    return df.groupby(PRODUCT_KEYS, observed=True).agg(
+        Ingresos=('Ingresos', 'sum'),
+        Cantidad=('Cantidad', 'sum'),
+        Precio_Suma=('PrecioUnitario', 'sum'),
+        Precio_Conteo=('PrecioUnitario', 'count')
+    )
+
+
+def compute_category_table(df):
+    """Ingresos y cantidad vendida por categoría"""
+    return df.groupby('Categoria', observed=True).agg(
+        Ingresos=('Ingresos', 'sum'),
+        Cantidad_Vendida=('Cantidad', 'sum')
+    )
+
+
+def top_products_records(products):
+    """
+    Productos más rentables a partir de una tabla con PRODUCT_KEYS, Ingresos,
+    Cantidad, Precio_Suma y Precio_Conteo
+    """
+    products = products.assign(PrecioUnitario=products['Precio_Suma'] / products['Precio_Conteo'])
+    top_products = products.sort_values('Ingresos', ascending=False).head(TOP_N)
+    return top_products[PRODUCT_KEYS + ['Ingresos', 'Cantidad', 'PrecioUnitario']].to_dict('records')
+
+
+def category_records(categories):
+    """Categorías ordenadas por ingresos (índice Categoria; Ingresos, Cantidad_Vendida y Productos_Unicos)"""
+    categories = categories.rename_axis('Categoria').reset_index().sort_values('Ingresos', ascending=False)
+    return categories.to_dict('records')
+
+
+def client_results(clients):
+    """
+    Top de clientes más frecuentes y listado de clientes a partir de una tabla
+    con IDCliente, Ingresos_Total, Cantidad_Total, Num_Compras y Productos_Unicos
+    """
+    # Clientes más frecuentes (por número de compras)
+    top_clients = clients.sort_values('Num_Compras', ascending=False).head(TOP_N)
+    clients_list = clients[CLIENT_LIST_COLUMNS].sort_values('Ingresos_Total', ascending=False)
+    return top_clients.to_dict('records'), Listing(
+        clients_list,
+        sort_columns=CLIENT_LIST_COLUMNS,
+        search_columns=['IDCliente']
+    )
+
+
+def _as_object(frame):
+    # Los lotes nuevos traen otras categorías; se combinan como texto
+    return frame.astype({col: object for col in frame.columns if isinstance(frame[col].dtype, pd.CategoricalDtype)})
+
+
+def _add_tables(table, delta):
+    """Suma dos tablas de agregados por índice conservando los tipos enteros"""
+    total = table.add(delta, fill_value=0)
+    for col in table.columns:
+        if table[col].dtype.kind in 'iu' and delta[col].dtype.kind in 'iu':
+            total[col] = total[col].astype(np.int64)
+    return total
+
+
+def _merge_sums(table, deltas):
+    """Suma a una tabla de agregados las tablas de los lotes pendientes (una sola pasada)"""
+    if not deltas:
+        return table
+    delta = deltas[0] if len(deltas) == 1 else pd.concat(deltas).groupby(level=table.index.names).sum()
+    return _add_tables(table, delta)
+
+
+def _merge_rows(rows, pending):
+    """Une las filas distintas de producto de los lotes pendientes"""
+    return pd.concat([rows, *pending]).drop_duplicates() if pending else rows
+
+
+def _kth(ordered, pending, k):
+    """
+    k-ésimo menor valor (desde 0) de un arreglo ordenado más otro sin ordenar
+    Antes de él hay a lo sumo len(pending) valores de `pending`, así que basta
+    mirar ordered[k - len(pending):k + 1] junto con `pending`
+    """
+    start = max(k - len(pending), 0)
+    window = np.concatenate([ordered[start:k + 1], pending])
+    return np.partition(window, k - start)[k - start]
+
+
+class LazyResult:
+    """Resultado que se calcula una sola vez, la primera vez que se pide"""
+
+    def __init__(self, build):
+        self._build = build
+        self._value = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        if self._build is not None:
+            with self._lock:
+                if self._build is not None:
+                    self._value = self._build()
+                    self._build = None
+        return self._value
+
+
+class DashboardResults(dict):
+    """Resultados del dashboard; las entradas LazyResult se calculan al leerlas"""
+
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        return value.get() if isinstance(value, LazyResult) else value
+
+
+class DashboardAggregates:
+    """
+    Agregados del dashboard actualizables por lotes
+
+    Args:
+        df: DataFrame preprocesado con las transacciones
+        client_index: ClientIndex de las mismas transacciones (métricas por cliente)
+    """
+
+    def __init__(self, df, client_index):
+        self.client_index = client_index
+
+        self.total_ventas = float(df['Ingresos'].sum())
+        self.total_productos = int(df['Cantidad'].sum())
+        self.total_transacciones = len(df)
+        self.ingresos_conteo = int(df['Ingresos'].count())
+        # Ingresos ordenados para la mediana; los de los lotes nuevos quedan
+        # pendientes (sin ordenar) hasta superar el umbral de mezcla
+        self.ingresos_ordenados = np.sort(df['Ingresos'].dropna().to_numpy(dtype=float))
+        self.ingresos_pendientes = np.zeros(0)
+
+        self.codigos = set(df['CodigoStock'].dropna().tolist())
+        self.categorias = set(df['Categoria'].dropna().tolist())
+        self.categoria_codigos = set(
+            df[['Categoria', 'CodigoStock']].dropna().drop_duplicates().itertuples(index=False, name=None)
+        )
+        # Productos distintos por categoría (se incrementa con los pares nuevos)
+        self.productos_por_categoria = {}
+        for categoria, _ in self.categoria_codigos:
+            self.productos_por_categoria[categoria] = self.productos_por_categoria.get(categoria, 0) + 1
+
+        self.products = _as_object(compute_product_table(df).reset_index()).set_index(PRODUCT_KEYS)
+        self.category_totals = compute_category_table(df)
+        self.category_totals.index = self.category_totals.index.astype(object)
+        self.product_rows = _as_object(df[PRODUCT_KEYS].drop_duplicates())
+        # Tablas de los lotes nuevos: se suman a las completas al superar el
+        # umbral de mezcla (o al leer los resultados, sin guardar la suma)
+        self.pending_products = ()
+        self.pending_categories = ()
+        self.pending_product_rows = ()
+        self.pending_rows = 0
+
+    def update(self, batch):
+        """Suma un lote de transacciones nuevas (ya preprocesadas) a los agregados"""
+        self.total_ventas += float(batch['Ingresos'].sum())
+        self.total_productos += int(batch['Cantidad'].sum())
+        self.total_transacciones += len(batch)
+        self.ingresos_conteo += int(batch['Ingresos'].count())
+
+        pendientes = np.concatenate([self.ingresos_pendientes, batch['Ingresos'].dropna().to_numpy(dtype=float)])
+        if len(pendientes) >= max(MERGE_MIN_ROWS, MERGE_FRACTION * len(self.ingresos_ordenados)):
+            pendientes = np.sort(pendientes)
+            self.ingresos_ordenados = np.insert(
+                self.ingresos_ordenados, np.searchsorted(self.ingresos_ordenados, pendientes), pendientes
+            )
+            pendientes = np.zeros(0)
+        self.ingresos_pendientes = pendientes
+
+        self.codigos.update(batch['CodigoStock'].dropna().tolist())
+        self.categorias.update(batch['Categoria'].dropna().tolist())
+        for pair in batch[['Categoria', 'CodigoStock']].dropna().drop_duplicates().itertuples(index=False, name=None):
+            if pair not in self.categoria_codigos:
+                self.categoria_codigos.add(pair)
+                self.productos_por_categoria[pair[0]] = self.productos_por_categoria.get(pair[0], 0) + 1
+
+        # Tuplas nuevas en lugar de agregar a las existentes: los resultados ya
+        # publicados conservan las de su versión
+        batch = _as_object(batch)
+        self.pending_products += (compute_product_table(batch),)
+        self.pending_categories += (compute_category_table(batch),)
+        self.pending_product_rows += (batch[PRODUCT_KEYS].drop_duplicates(),)
+        self.pending_rows += len(batch)
+        if self.pending_rows >= max(MERGE_MIN_ROWS, MERGE_FRACTION * len(self.products)):
+            self.products = _merge_sums(self.products, self.pending_products)
+            self.category_totals = _merge_sums(self.category_totals, self.pending_categories)
+            self.product_rows = _merge_rows(self.product_rows, self.pending_product_rows)
+            self.pending_products = self.pending_categories = self.pending_product_rows = ()
+            self.pending_rows = 0
+
+    def median(self):
+        """Mediana de los ingresos: del arreglo ordenado y de los valores pendientes"""
+        ordered, pending = self.ingresos_ordenados, self.ingresos_pendientes
+        n = len(ordered) + len(pending)
+        if n == 0:
+            return float('nan')
+        if not len(pending):
+            return float((ordered[(n - 1) // 2] + ordered[n // 2]) / 2)
+        return float((_kth(ordered, pending, (n - 1) // 2) + _kth(ordered, pending, n // 2)) / 2)
+
+    def results(self):
+        """
+        Resultados de cada endpoint del dashboard listos para serializar
+
+        Returns:
+            DashboardResults con los resultados de cada endpoint. Los tops,
+            las categorías y los listados se calculan al pedirlos por primera
+            vez (tras una ingesta solo se reconstruyen si alguien los lee), con
+            las tablas y los lotes pendientes de esta versión: update()
+            reemplaza las tablas y las tuplas, no las modifica.
+        """
+        stats = {
+            'total_ventas': int(self.total_ventas),
+            'total_productos': int(self.total_productos),
+            'total_transacciones': self.total_transacciones,
+            'productos_unicos': len(self.codigos),
+            'categorias_unicas': len(self.categorias),
+            'ingreso_promedio': self.total_ventas / self.ingresos_conteo if self.ingresos_conteo else float('nan'),
+            'ingreso_mediano': self.median()
+        }
+
+        products, pending_products = self.products, self.pending_products
+        category_totals, pending_categories = self.category_totals, self.pending_categories
+        product_rows, pending_product_rows = self.product_rows, self.pending_product_rows
+        productos_por_categoria = pd.Series(self.productos_por_categoria, dtype=np.int64)
+        client_table = self.client_index.table()
+        clients = LazyResult(lambda: client_results(client_table))
+
+        def categories():
+            table = _merge_sums(category_totals, pending_categories).copy()
+            table['Productos_Unicos'] = productos_por_categoria.reindex(table.index, fill_value=0)
+            return category_records(table)
+
+        return DashboardResults({
+            'stats': stats,
+            'top_products': LazyResult(
+                lambda: top_products_records(_merge_sums(products, pending_products).reset_index())
+            ),
+            'categories': LazyResult(categories),
+            'top_clients': LazyResult(lambda: clients.get()[0]),
+            'clients_list': LazyResult(lambda: clients.get()[1]),
+            'products_list': LazyResult(lambda: Listing(
+                _merge_rows(product_rows, pending_product_rows).sort_values('Descripcion_Ingles'),
+                sort_columns=PRODUCT_KEYS,
+                search_columns=['CodigoStock', 'Descripcion_Ingles', 'Descripcion_Español'],
+                filter_columns={'category': 'Categoria'}
+            )),
+            'categories_list': sorted(self.categorias)
+        })
@@ -2,55 +2,108 @@ from flask import Flask, render_template, jsonify, request
 from flask_cors import CORS
 import pandas as pd
 import numpy as np
-import joblib
 import os
+import threading
+import time
 from datetime import datetime
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import LabelEncoder
+from data_cache import load_frame, save_frame
+from schema import USED_COLUMNS, apply_schema, memory_usage_mb
+from aggregates import DashboardAggregates
+from indexes import ClientIndex, ProductIndex
+from prediction_cache import PredictionCache
+from listings import Listing, page_from_request
+from neighbors import DEFAULT_SIMILAR
+from response_cache import ResponseCache
+from ingestion import prepare_batch, concat_batches, append_to_csv
+from features import load_feature_tables
+from clusters import assign_client_clusters, assign_product_clusters
+from metrics import PHASE_DATA, RequestMetrics, phase
+from trends import TrendsCube
+from date_index import DateIndex, parse_date_range
+from training_jobs import JobLimitError, TrainingJobs
+from model_artifacts import FAILED, RELOADING, ArtifactReloader, load_current_artifacts
 import warnings
 warnings.filterwarnings('ignore')
 
 app = Flask(__name__)
 CORS(app)
 
-# Rutas globales
+# Latencia, tamaño y estado por ruta; encabezado Server-Timing y /api/metrics
+request_metrics = RequestMetrics()
+request_metrics.init_app(app)
+
+# Rutas globales (los artefactos están en models/versions/<versión>/, ver train_model.py)
 MODELS_DIR = 'models'
-MODEL_PATH = os.path.join(MODELS_DIR, 'model_rentabilidad.pkl')
-CLUSTER_MODEL_PATH = os.path.join(MODELS_DIR, 'model_clusters.pkl')
-CLUSTER_CLIENTS_MODEL_PATH = os.path.join(MODELS_DIR, 'model_clusters_clientes.pkl')
-LABEL_ENCODER_PATH = os.path.join(MODELS_DIR, 'label_encoders.pkl')
-SCALER_PATH = os.path.join(MODELS_DIR, 'scaler.pkl')
-SCALER_CLIENTS_PATH = os.path.join(MODELS_DIR, 'scaler_clientes.pkl')
-CLUSTER_DATA_PATH = os.path.join(MODELS_DIR, 'product_clusters.csv')
-CLUSTER_CLIENTS_DATA_PATH = os.path.join(MODELS_DIR, 'client_clusters.csv')
 DATA_PATH = 'SUPERMERCADO_500_000_ESPAÑOL.csv'
 
 # Variables globales
-model = None
-kmeans_model = None
-kmeans_clients_model = None
-scaler = None
-scaler_clients = None
+# Modelos, scalers, encoders y datos de clusters de una misma versión
+# (ModelArtifacts); una recarga los reemplaza con una sola asignación
+artifacts = None
+models_loaded = False
 label_encoders = {}
 df_processed = None
-cluster_data = None
-cluster_clients_data = None
+dashboard_aggregates = None
+dashboard_state = None
+# Cubo día × categoría y hora × día de la semana para /api/trends
+trends_cube = None
+# Transacciones ordenadas por fecha para los filtros desde/hasta del dashboard
+date_index = None
+# Lotes ingeridos que aún no se unieron a df_processed (se unen al pedirlo)
+pending_batches = []
+# True si se ingirieron transacciones que no están en el CSV cargado
+data_ingested = False
+# Tablas de características por producto/cliente (se calculan al pedirlas)
+feature_tables = None
+feature_listings = None
+feature_tables_version = None
+client_index = None
+product_index = None
+
+# Caché de predicciones; la versión del modelo cambia en cada carga
+model_version = 0
+# Versión de los datos; cambia en cada carga y renueva las respuestas cacheadas
+data_version = 0
+response_cache = ResponseCache(maxsize=int(os.environ.get('RESPONSE_CACHE_SIZE', 256)))
+
+# Evita que varias peticiones simultáneas carguen los datos o modelos más de una vez
+init_lock = threading.RLock()
+# Entrenamientos lanzados con /api/train (en procesos aparte)
+training_jobs = TrainingJobs(max_jobs=int(os.environ.get('TRAIN_MAX_JOBS', 1)))
+prediction_cache = PredictionCache(
+    maxsize=int(os.environ.get('PREDICTION_CACHE_SIZE', 10000)),
+    ttl=int(os.environ.get('PREDICTION_CACHE_TTL', 3600))
+)
 
 def load_and_preprocess_data():
     """Carga y preprocesa los datos"""
-    global df_processed, label_encoders
+    global df_processed, label_encoders, dashboard_aggregates, dashboard_state, client_index, product_index, data_version
+    global data_ingested, trends_cube, date_index
     
     print("Cargando datos...")
-    df = pd.read_csv(DATA_PATH, encoding='utf-8')
-    
-    # Calcular ingresos (rentabilidad)
-    df['Ingresos'] = df['Cantidad'] * df['PrecioUnitario']
-    
-    # Convertir fecha
-    df['Fecha'] = pd.to_datetime(df['Fecha'], format='%d/%m/%Y', errors='coerce')
-    df['Mes'] = df['Fecha'].dt.month
-    df['DiaSemana'] = df['Fecha'].dt.dayofweek
+    start = time.perf_counter()
+    # Usar la caché columnar si el CSV no cambió desde el último arranque
+    df = load_frame(DATA_PATH)
+    if df is not None:
+        print(f"Datos cargados desde caché ({memory_usage_mb(df):.1f} MB)")
+    else:
+        # Leer solo las columnas que se usan
+        df = pd.read_csv(DATA_PATH, encoding='utf-8', usecols=lambda col: col in USED_COLUMNS)
+        
+        # Calcular ingresos (rentabilidad)
+        df['Ingresos'] = df['Cantidad'] * df['PrecioUnitario']
+        
+        # Convertir fecha
+        df['Fecha'] = pd.to_datetime(df['Fecha'], format='%d/%m/%Y', errors='coerce')
+        df['Mes'] = df['Fecha'].dt.month
+        df['DiaSemana'] = df['Fecha'].dt.dayofweek
+        
+        # Tipos compactos: categóricos para textos y enteros reducidos
+        df = apply_schema(df)
+        save_frame(df, DATA_PATH)
     
     # Codificar categorías (usar encoder cargado si existe, sino crear uno nuevo)
     if 'Categoria' not in label_encoders or not label_encoders:
@@ -61,483 +114,953 @@ def load_and_preprocess_data():
         df['Categoria_Encoded'] = label_encoders['Categoria'].transform(df['Categoria'])
     
     df_processed = df
+    pending_batches.clear()
+    data_ingested = False
+    
+    # Recalcular los agregados del dashboard (invalida los de la carga anterior)
+    client_index = ClientIndex(df)
+    product_index = ProductIndex(df)
+    dashboard_state = DashboardAggregates(df, client_index)
+    dashboard_aggregates = dashboard_state.results()
+    trends_cube = TrendsCube(df)
+    date_index = DateIndex(df)
+    data_version += 1
+    request_metrics.observe_load('datos', time.perf_counter() - start)
     return df
 
+def install_model_artifacts(new):
+    """
+    Publica un conjunto de artefactos ya cargado. La publicación es una sola
+    asignación: cada petición toma `artifacts` una vez y usa ese conjunto completo.
+    """
+    global artifacts, label_encoders, model_version, models_loaded
+    
+    with init_lock:
+        # Conservar las categorías agregadas por la ingesta (al final, sin cambiar los códigos)
+        encoder = new.label_encoders.get('Categoria')
+        previous = label_encoders.get('Categoria')
+        if encoder is not None and previous is not None:
+            known = set(encoder.classes_)
+            nuevas = [c for c in previous.classes_ if c not in known]
+            if nuevas:
+                encoder.classes_ = np.concatenate([encoder.classes_, np.array(nuevas, dtype=encoder.classes_.dtype)])
+        
+        # Invalidar las predicciones y respuestas en caché del conjunto anterior
+        model_version += 1
+        new.model_version = model_version
+        prediction_cache.clear()
+        if new.label_encoders:
+            label_encoders = new.label_encoders
+        artifacts = new
+        models_loaded = True
+    request_metrics.observe_load('modelos', new.load_seconds)
+
 def load_model():
-    """Carga los modelos si existen"""
-    global model, kmeans_model, kmeans_clients_model, scaler, scaler_clients, label_encoders, cluster_data, cluster_clients_data
-    
+    """Carga los modelos de la versión activa (sin validar: al iniciar se usa lo que haya)"""
     # Crear directorio si no existe
     os.makedirs(MODELS_DIR, exist_ok=True)
-    
-    # Cargar modelo de predicción
-    if os.path.exists(MODEL_PATH):
-        print("Cargando modelo de predicción existente...")
-        model = joblib.load(MODEL_PATH)
-    else:
-        print("Modelo de predicción no encontrado. Ejecuta train_model.py primero.")
-        model = None
-    
-    # Cargar modelo de clustering
-    if os.path.exists(CLUSTER_MODEL_PATH):
-        print("Cargando modelo de clustering existente...")
-        cluster_info = joblib.load(CLUSTER_MODEL_PATH)
-        kmeans_model = cluster_info['kmeans']
-    else:
-        print("Modelo de clustering no encontrado. Ejecuta train_model.py primero.")
-        kmeans_model = None
-    
-    # Cargar scaler
-    if os.path.exists(SCALER_PATH):
-        scaler = joblib.load(SCALER_PATH)
-    else:
-        scaler = None
-    
-    # Cargar label encoders
-    if os.path.exists(LABEL_ENCODER_PATH):
-        label_encoders = joblib.load(LABEL_ENCODER_PATH)
-    else:
-        label_encoders = {}
-    
-    # Cargar datos de clusters de productos
-    if os.path.exists(CLUSTER_DATA_PATH):
-        cluster_data = pd.read_csv(CLUSTER_DATA_PATH, encoding='utf-8')
-        print(f"Datos de clusters de productos cargados: {len(cluster_data)} productos")
-    else:
-        cluster_data = None
-    
-    # Cargar modelo de clustering de clientes
-    if os.path.exists(CLUSTER_CLIENTS_MODEL_PATH):
-        print("Cargando modelo de clustering de clientes existente...")
-        cluster_clients_info = joblib.load(CLUSTER_CLIENTS_MODEL_PATH)
-        kmeans_clients_model = cluster_clients_info['kmeans']
-    else:
-        print("Modelo de clustering de clientes no encontrado.")
-        kmeans_clients_model = None
-    
-    # Cargar scaler de clientes
-    if os.path.exists(SCALER_CLIENTS_PATH):
-        scaler_clients = joblib.load(SCALER_CLIENTS_PATH)
-    else:
-        scaler_clients = None
-    
-    # Cargar datos de clusters de clientes
-    if os.path.exists(CLUSTER_CLIENTS_DATA_PATH):
-        cluster_clients_data = pd.read_csv(CLUSTER_CLIENTS_DATA_PATH, encoding='utf-8')
-        print(f"Datos de clusters de clientes cargados: {len(cluster_clients_data)} clientes")
-    else:
-        cluster_clients_data = None
-    
-    return model
+    install_model_artifacts(load_current_artifacts())
+    return artifacts.model
+
+def ensure_data_loaded():
+    """Carga los datos si aún no están cargados (una sola vez aunque haya varios hilos)"""
+    if dashboard_aggregates is None:
+        with phase(PHASE_DATA), init_lock:
+            if dashboard_aggregates is None:
+                load_and_preprocess_data()
+
+def ensure_models_loaded():
+    """Carga los modelos si aún no se intentó cargarlos (una sola vez aunque haya varios hilos)"""
+    if not models_loaded:
+        with phase(PHASE_DATA), init_lock:
+            if not models_loaded:
+                load_model()
+
+def initialize():
+    """
+    Carga datos y modelos antes de atender peticiones.
+    Con gunicorn (preload_app) se ejecuta en el proceso maestro, de modo que
+    los workers comparten la memoria copy-on-write.
+    """
+    ensure_data_loaded()
+    ensure_models_loaded()
+
+# Recarga de modelos sin reiniciar (/api/admin/reload y revisión de models/version.json)
+model_reloader = ArtifactReloader(
+    install_model_artifacts, lambda: artifacts,
+    interval=float(os.environ.get('MODEL_RELOAD_INTERVAL', 30))
+)
+
+@app.before_request
+def watch_model_versions():
+    """Inicia en cada worker la revisión periódica de la versión de los modelos"""
+    model_reloader.watch()
 
 @app.route('/')
 def index():
     """Página principal"""
     return render_template('index.html')
 
+def dashboard_response(section):
+    """
+    Responde con una sección de los agregados del dashboard. Con desde y/o
+    hasta (AAAA-MM-DD) la calcula sobre ese rango de fechas con el índice por fecha
+    """
+    ensure_data_loaded()
+    
+    if 'desde' not in request.args and 'hasta' not in request.args:
+        return response_cache.respond(data_version, lambda: dashboard_aggregates[section])
+    try:
+        desde, hasta = parse_date_range(request.args)
+        return response_cache.respond(data_version, lambda: date_index.results(section, desde, hasta))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
 @app.route('/api/dashboard/stats')
 def get_dashboard_stats():
     """Obtiene estadísticas generales para el dashboard"""
-    global df_processed
-    
-    if df_processed is None:
-        load_and_preprocess_data()
-    
-    stats = {
-        'total_ventas': int(df_processed['Ingresos'].sum()),
-        'total_productos': int(df_processed['Cantidad'].sum()),
-        'total_transacciones': len(df_processed),
-        'productos_unicos': df_processed['CodigoStock'].nunique(),
-        'categorias_unicas': df_processed['Categoria'].nunique(),
-        'ingreso_promedio': float(df_processed['Ingresos'].mean()),
-        'ingreso_mediano': float(df_processed['Ingresos'].median())
-    }
-    
-    return jsonify(stats)
+    return dashboard_response('stats')
 
 @app.route('/api/dashboard/top-products')
 def get_top_products():
     """Obtiene los productos más rentables"""
-    global df_processed
-    
-    if df_processed is None:
-        load_and_preprocess_data()
-    
-    top_products = df_processed.groupby(['CodigoStock', 'Descripcion_Ingles', 'Descripcion_Español', 'Categoria']).agg({
-        'Ingresos': 'sum',
-        'Cantidad': 'sum',
-        'PrecioUnitario': 'mean'
-    }).reset_index()
-    
-    top_products = top_products.sort_values('Ingresos', ascending=False).head(20)
-    
-    return jsonify(top_products.to_dict('records'))
+    return dashboard_response('top_products')
 
 @app.route('/api/dashboard/categories')
 def get_category_stats():
     """Obtiene estadísticas por categoría"""
-    global df_processed
-    
-    if df_processed is None:
-        load_and_preprocess_data()
-    
-    category_stats = df_processed.groupby('Categoria').agg({
-        'Ingresos': 'sum',
-        'Cantidad': 'sum',
-        'CodigoStock': 'nunique'
-    }).reset_index()
-    
-    category_stats.columns = ['Categoria', 'Ingresos', 'Cantidad_Vendida', 'Productos_Unicos']
-    category_stats = category_stats.sort_values('Ingresos', ascending=False)
-    
-    return jsonify(category_stats.to_dict('records'))
+    return dashboard_response('categories')
 
 @app.route('/api/dashboard/top-clients')
 def get_top_clients():
     """Obtiene los clientes más comunes/frecuentes"""
-    global df_processed
-    
-    if df_processed is None:
-        load_and_preprocess_data()
-    
-    # Agrupar por cliente y calcular métricas
-    clients = df_processed.groupby('IDCliente').agg({
-        'Ingresos': 'sum',
-        'Cantidad': 'sum',
-        'NumeroFactura': 'nunique',
-        'CodigoStock': 'nunique'
-    }).reset_index()
-    
-    clients.columns = ['IDCliente', 'Ingresos_Total', 'Cantidad_Total', 'Num_Compras', 'Productos_Unicos']
-    
-    # Ordenar por número de compras (clientes más frecuentes)
-    clients = clients.sort_values('Num_Compras', ascending=False).head(20)
-    
-    return jsonify(clients.to_dict('records'))
+    return dashboard_response('top_clients')
 
 @app.route('/api/products/list')
 def get_products_list():
-    """Obtiene lista de productos únicos"""
-    global df_processed
-    
-    if df_processed is None:
-        load_and_preprocess_data()
-    
-    products = df_processed[['CodigoStock', 'Descripcion_Ingles', 'Descripcion_Español', 'Categoria']].drop_duplicates()
-    products = products.sort_values('Descripcion_Ingles')
-    
-    return jsonify(products.to_dict('records'))
+    """
+    Obtiene lista de productos únicos
+    Acepta offset, limit, sort, order, q y category para paginar en el servidor
+    """
+    ensure_data_loaded()
+    
+    try:
+        return response_cache.respond(
+            data_version, lambda: page_from_request(dashboard_aggregates['products_list'], request.args)
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/products/<codigo>/similar')
+def get_similar_products(codigo):
+    """
+    Obtiene los productos más parecidos a uno en las características del
+    clustering de productos (índice de vecinos del entrenamiento)
+    Acepta k (cantidad de similares, default: 10)
+    """
+    ensure_models_loaded()
+    current = artifacts
+    
+    if current.similar_products is None:
+        return jsonify({'error': 'No hay índice de productos similares. Ejecuta train_model.py primero.'}), 404
+    
+    k = request.args.get('k', DEFAULT_SIMILAR, type=int)
+    try:
+        return response_cache.respond(current.model_version, lambda: current.similar_products.similar(codigo, k))
+    except KeyError:
+        return jsonify({'error': f'Producto no encontrado: {codigo}'}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
 @app.route('/api/categories/list')
 def get_categories_list():
     """Obtiene lista de categorías"""
-    global df_processed
-    
-    if df_processed is None:
-        load_and_preprocess_data()
+    ensure_data_loaded()
     
-    categories = sorted(df_processed['Categoria'].unique().tolist())
-    return jsonify(categories)
+    return response_cache.respond(data_version, lambda: dashboard_aggregates['categories_list'])
 
 @app.route('/api/clusters')
 def get_clusters():
-    """Obtiene información de los clusters"""
-    global cluster_data
-    
-    if cluster_data is None:
-        load_model()
-    
-    if cluster_data is None:
+    """
+    Obtiene el resumen de los clusters de productos (miembros y totales por cluster)
+    Con miembros=true incluye además todos los productos de cada cluster
+    """
+    ensure_models_loaded()
+    current = artifacts
+    
+    if current.cluster_products is None:
         return jsonify({'error': 'No hay datos de clusters disponibles. Ejecuta train_model.py primero.'}), 404
     
-    # Agrupar por cluster
-    cluster_summary = cluster_data.groupby('Cluster').agg({
-        'Producto': 'count',
-        'Ingresos_Total': 'sum' if 'Ingresos_Total' in cluster_data.columns else lambda x: 0,
-        'Cantidad_Total': 'sum' if 'Cantidad_Total' in cluster_data.columns else lambda x: 0
-    }).reset_index()
-    
-    cluster_summary.columns = ['Cluster', 'Num_Productos', 'Ingresos_Total', 'Cantidad_Total']
-    
-    # Obtener productos por cluster con todas las métricas disponibles
-    clusters_detail = {}
-    available_cols = ['CodigoStock', 'Descripcion_Ingles', 'Categoria', 'Cluster']
-    
-    # Agregar descripción en español si existe
-    if 'Descripcion_Español' in cluster_data.columns:
-        available_cols.insert(2, 'Descripcion_Español')
-    
-    # Agregar columnas de métricas si existen
-    if 'Ingresos_Total' in cluster_data.columns:
-        available_cols.append('Ingresos_Total')
-    if 'Cantidad_Total' in cluster_data.columns:
-        available_cols.append('Cantidad_Total')
-    if 'Precio_Promedio' in cluster_data.columns:
-        available_cols.append('Precio_Promedio')
-    
-    for cluster_id in cluster_data['Cluster'].unique():
-        cluster_products = cluster_data[cluster_data['Cluster'] == cluster_id][
-            available_cols
-        ].to_dict('records')
-        clusters_detail[int(cluster_id)] = cluster_products
+    view = current.cluster_products
+    build = view.members if request.args.get('miembros', 'false').lower() == 'true' else view.summary
+    return response_cache.respond(current.model_version, build)
+
+@app.route('/api/clusters/<int:cluster_id>')
+def get_cluster_detail(cluster_id):
+    """
+    Obtiene los productos de un cluster
+    Acepta top (los N de mayores ingresos) u offset, limit, sort, order y q para paginar
+    """
+    ensure_models_loaded()
+    current = artifacts
+    
+    if current.cluster_products is None:
+        return jsonify({'error': 'No hay datos de clusters disponibles.'}), 404
     
+    try:
+        return response_cache.respond(
+            current.model_version, lambda: current.cluster_products.detail(cluster_id, request.args)
+        )
+    except KeyError:
+        return jsonify({'error': f'Cluster no encontrado: {cluster_id}'}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/clusters/assign', methods=['POST'])
+def assign_products_to_clusters():
+    """
+    Asigna cluster a productos nuevos o con transacciones nuevas: calcula sus
+    características con sus transacciones y aplica el scaler y el modelo de
+    clusters guardados, sin volver a entrenar
+    
+    Cuerpo esperado:
+        {"productos": [codigo_stock, ...]}
+    """
+    ensure_models_loaded()
+    current = artifacts
+    
+    if current.kmeans_model is None or current.scaler is None or current.cluster_type is None:
+        return jsonify({'error': 'Modelo de clusters no disponible. Ejecuta train_model.py primero.'}), 500
+    
+    data = request.json or {}
+    # Los productos pueden enviarse como código o como {"codigo": código}
+    codes = [str(p.get('codigo', '')) if isinstance(p, dict) else str(p) for p in data.get('productos', [])]
+    if not codes:
+        return jsonify({'error': 'Se requiere al menos un producto'}), 400
+    
+    assignments = assign_product_clusters(
+        get_transactions(), codes, current.kmeans_model, current.scaler, current.cluster_type, current.cluster_products
+    )
     return jsonify({
-        'summary': cluster_summary.to_dict('records'),
-        'clusters': clusters_detail,
-        'total_clusters': len(cluster_data['Cluster'].unique())
+        'tipo': current.cluster_type,
+        'version': current.artifact_version,
+        'productos': [
+            {'codigo': code, **assignments[code]} if code in assignments
+            else {'codigo': code, 'error': 'Producto no encontrado'}
+            for code in codes
+        ]
     })
 
 @app.route('/api/clusters/products')
 def get_cluster_products():
-    """Obtiene productos agrupados por cluster"""
-    global cluster_data
-    
-    if cluster_data is None:
-        load_model()
-    
-    if cluster_data is None:
+    """
+    Obtiene productos agrupados por cluster
+    Acepta cluster, category, offset, limit, sort, order y q para paginar en el servidor
+    """
+    ensure_models_loaded()
+    current = artifacts
+    
+    if current.cluster_data is None:
         return jsonify({'error': 'No hay datos de clusters disponibles.'}), 404
     
-    cluster_id = request.args.get('cluster', type=int)
-    
-    if cluster_id is not None:
-        products = cluster_data[cluster_data['Cluster'] == cluster_id]
-    else:
-        products = cluster_data
-    
-    return jsonify(products.to_dict('records'))
+    try:
+        return response_cache.respond(
+            current.model_version, lambda: page_from_request(current.cluster_products_listing, request.args)
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/clusters/clients/list')
+def get_cluster_clients_list():
+    """
+    Obtiene clientes con su cluster
+    Acepta cluster, offset, limit, sort, order y q para paginar en el servidor
+    """
+    ensure_models_loaded()
+    current = artifacts
+    
+    if current.cluster_clients_data is None:
+        return jsonify({'error': 'No hay datos de clusters de clientes disponibles.'}), 404
+    
+    try:
+        return response_cache.respond(
+            current.model_version, lambda: page_from_request(current.cluster_clients_listing, request.args)
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
 @app.route('/api/clusters/clients')
 def get_clients_clusters():
-    """Obtiene información de los clusters de clientes"""
-    global cluster_clients_data
-    
-    if cluster_clients_data is None:
-        load_model()
-    
-    if cluster_clients_data is None:
+    """
+    Obtiene el resumen de los clusters de clientes (miembros y totales por cluster)
+    Con miembros=true incluye además todos los clientes de cada cluster
+    """
+    ensure_models_loaded()
+    current = artifacts
+    
+    if current.cluster_clients is None:
         return jsonify({'error': 'No hay datos de clusters de clientes disponibles. Ejecuta train_model.py primero.'}), 404
     
-    # Agrupar por cluster
-    # Usar IDCliente para contar si existe, sino usar cualquier columna
-    count_col = 'IDCliente' if 'IDCliente' in cluster_clients_data.columns else cluster_clients_data.columns[0]
-    
-    cluster_summary = cluster_clients_data.groupby('Cluster').agg({
-        count_col: 'count',
-        'Ingresos_Total': 'sum' if 'Ingresos_Total' in cluster_clients_data.columns else lambda x: 0,
-        'Num_Transacciones': 'sum' if 'Num_Transacciones' in cluster_clients_data.columns else lambda x: 0
-    }).reset_index()
-    
-    cluster_summary.columns = ['Cluster', 'Num_Clientes', 'Ingresos_Total', 'Num_Transacciones']
-    
-    # Obtener clientes por cluster
-    clusters_detail = {}
-    available_cols = ['IDCliente', 'Cluster']
-    
-    # Agregar columnas de métricas si existen
-    if 'Ingresos_Total' in cluster_clients_data.columns:
-        available_cols.append('Ingresos_Total')
-    if 'Num_Transacciones' in cluster_clients_data.columns:
-        available_cols.append('Num_Transacciones')
-    if 'Cantidad_Total' in cluster_clients_data.columns:
-        available_cols.append('Cantidad_Total')
-    if 'Productos_Unicos' in cluster_clients_data.columns:
-        available_cols.append('Productos_Unicos')
-    if 'Frecuencia_Compra' in cluster_clients_data.columns:
-        available_cols.append('Frecuencia_Compra')
-    if 'Valor_Promedio_Transaccion' in cluster_clients_data.columns:
-        available_cols.append('Valor_Promedio_Transaccion')
-    
-    for cluster_id in cluster_clients_data['Cluster'].unique():
-        cluster_clients = cluster_clients_data[cluster_clients_data['Cluster'] == cluster_id][
-            available_cols
-        ].to_dict('records')
-        clusters_detail[int(cluster_id)] = cluster_clients
-    
+    view = current.cluster_clients
+    build = view.members if request.args.get('miembros', 'false').lower() == 'true' else view.summary
+    return response_cache.respond(current.model_version, build)
+
+@app.route('/api/clusters/clients/<int:cluster_id>')
+def get_client_cluster_detail(cluster_id):
+    """
+    Obtiene los clientes de un cluster
+    Acepta top (los N de mayores ingresos) u offset, limit, sort, order y q para paginar
+    """
+    ensure_models_loaded()
+    current = artifacts
+    
+    if current.cluster_clients is None:
+        return jsonify({'error': 'No hay datos de clusters de clientes disponibles.'}), 404
+    
+    try:
+        return response_cache.respond(
+            current.model_version, lambda: current.cluster_clients.detail(cluster_id, request.args)
+        )
+    except KeyError:
+        return jsonify({'error': f'Cluster no encontrado: {cluster_id}'}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/clusters/clients/assign', methods=['POST'])
+def assign_clients_to_clusters():
+    """
+    Asigna cluster a clientes nuevos o con transacciones nuevas con el scaler
+    y el modelo de clusters de clientes guardados, sin volver a entrenar
+    
+    Cuerpo esperado:
+        {"clientes": [client_id, ...]}
+    """
+    ensure_models_loaded()
+    current = artifacts
+    
+    if current.kmeans_clients_model is None or current.scaler_clients is None:
+        return jsonify({'error': 'Modelo de clusters de clientes no disponible. Ejecuta train_model.py primero.'}), 500
+    
+    data = request.json or {}
+    # Los clientes pueden enviarse como ID o como {"client_id": ID}
+    clientes = [c.get('client_id') if isinstance(c, dict) else c for c in data.get('clientes', [])]
+    if not clientes:
+        return jsonify({'error': 'Se requiere al menos un cliente'}), 400
+    try:
+        client_ids = [int(client_id) for client_id in clientes]
+    except (TypeError, ValueError):
+        return jsonify({'error': 'ID de cliente no válido'}), 400
+    
+    assignments = assign_client_clusters(
+        get_transactions(), client_ids, current.kmeans_clients_model, current.scaler_clients, current.cluster_clients
+    )
     return jsonify({
-        'summary': cluster_summary.to_dict('records'),
-        'clusters': clusters_detail,
-        'total_clusters': len(cluster_clients_data['Cluster'].unique())
+        'version': current.artifact_version,
+        'clientes': [
+            {'client_id': client_id, **assignments[client_id]} if client_id in assignments
+            else {'client_id': client_id, 'error': 'Cliente no encontrado'}
+            for client_id in client_ids
+        ]
     })
 
 @app.route('/api/clients/list')
 def get_clients_list():
-    """Obtiene lista de clientes únicos"""
-    global df_processed
-    
-    if df_processed is None:
-        load_and_preprocess_data()
-    
-    clients = df_processed.groupby('IDCliente').agg({
-        'Ingresos': 'sum',
-        'Cantidad': 'sum',
-        'NumeroFactura': 'nunique'
-    }).reset_index()
-    
-    clients.columns = ['IDCliente', 'Ingresos_Total', 'Cantidad_Total', 'Num_Compras']
-    clients = clients.sort_values('Ingresos_Total', ascending=False)
+    """
+    Obtiene lista de clientes únicos
+    Acepta offset, limit, sort, order y q para paginar en el servidor, y
+    desde/hasta (AAAA-MM-DD) para calcular las métricas en un rango de fechas
+    """
+    ensure_data_loaded()
+    
+    def build():
+        if 'desde' not in request.args and 'hasta' not in request.args:
+            listing = dashboard_aggregates['clients_list']
+        else:
+            listing = date_index.results('clients_list', *parse_date_range(request.args))
+        return page_from_request(listing, request.args)
     
-    return jsonify(clients.to_dict('records'))
+    try:
+        return response_cache.respond(data_version, build)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/clients/<int:client_id>/similar')
+def get_similar_clients(client_id):
+    """
+    Obtiene los clientes más parecidos a uno en las características del
+    clustering de clientes (índice de vecinos del entrenamiento)
+    Acepta k (cantidad de similares, default: 10)
+    """
+    ensure_models_loaded()
+    current = artifacts
+    
+    if current.similar_clients is None:
+        return jsonify({'error': 'No hay índice de clientes similares. Ejecuta train_model.py primero.'}), 404
+    
+    k = request.args.get('k', DEFAULT_SIMILAR, type=int)
+    try:
+        return response_cache.respond(current.model_version, lambda: current.similar_clients.similar(client_id, k))
+    except KeyError:
+        return jsonify({'error': f'Cliente no encontrado: {client_id}'}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/trends')
+def get_trends():
+    """
+    Serie temporal de ingresos, cantidad, transacciones y facturas
+    Acepta granularidad (dia, semana, mes, hora, dia_semana, hora_dia_semana)
+    y categoria (opcional)
+    """
+    ensure_data_loaded()
+    
+    granularidad = request.args.get('granularidad', 'dia')
+    categoria = request.args.get('categoria') or None
+    
+    def build():
+        return {
+            'granularidad': granularidad,
+            'categoria': categoria,
+            'periodos': trends_cube.trends(granularidad, categoria)
+        }
+    
+    try:
+        return response_cache.respond(data_version, build)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except KeyError:
+        return jsonify({'error': f'Categoría no encontrada: {categoria}'}), 404
+
+def get_feature_tables():
+    """
+    Devuelve las tablas de características por producto y por cliente de la
+    versión actual de los datos (las mismas que usa el entrenamiento)
+    """
+    global feature_tables, feature_listings, feature_tables_version
+    
+    ensure_data_loaded()
+    if feature_tables_version != data_version:
+        with phase(PHASE_DATA), init_lock:
+            if feature_tables_version != data_version:
+                start = time.perf_counter()
+                version = data_version
+                # La caché en disco solo vale si los datos son exactamente los del CSV
+                tables = load_feature_tables(get_transactions(), None if data_ingested else DATA_PATH)
+                
+                # La desviación de un producto con una sola venta es NaN (no es JSON válido)
+                products = tables['productos'].fillna({'Ingresos_Std': 0, 'Cantidad_Std': 0})
+                clients = tables['clientes'].copy()
+                for col in ('Primera_Compra', 'Ultima_Compra'):
+                    clients[col] = clients[col].dt.strftime('%Y-%m-%d')
+                feature_listings = {
+                    'productos': Listing(
+                        products.sort_values('Ingresos_Total', ascending=False),
+                        sort_columns=list(products.columns),
+                        search_columns=['CodigoStock', 'Descripcion_Ingles', 'Descripcion_Español'],
+                        filter_columns={'category': 'Categoria'}
+                    ),
+                    'clientes': Listing(
+                        clients.sort_values('Ingresos_Total', ascending=False),
+                        sort_columns=list(clients.columns),
+                        search_columns=['IDCliente']
+                    )
+                }
+                feature_tables = tables
+                feature_tables_version = version
+                request_metrics.observe_load('caracteristicas', time.perf_counter() - start)
+    return feature_tables
+
+@app.route('/api/features/products')
+def get_product_features():
+    """
+    Métricas por producto de la tabla de características (paginada)
+    Acepta offset, limit, sort, order, q y category
+    """
+    get_feature_tables()
+    
+    try:
+        return response_cache.respond(
+            feature_tables_version, lambda: page_from_request(feature_listings['productos'], request.args)
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/features/clients')
+def get_client_features():
+    """
+    Métricas por cliente de la tabla de características (paginada)
+    Acepta offset, limit, sort, order y q
+    """
+    get_feature_tables()
+    
+    try:
+        return response_cache.respond(
+            feature_tables_version, lambda: page_from_request(feature_listings['clientes'], request.args)
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+def encode_categories(categorias, encoders):
+    """Codifica una lista de categorías; las desconocidas se codifican como 0"""
+    categorias = np.asarray(categorias, dtype=object)
+    encoded = np.zeros(len(categorias), dtype=np.int64)
+    if 'Categoria' in encoders:
+        known = np.isin(categorias, encoders['Categoria'].classes_)
+        if known.any():
+            encoded[known] = encoders['Categoria'].transform(categorias[known])
+    return encoded
+
+def build_features(cantidades, precios, categorias_encoded, now):
+    """Construye la matriz de características del modelo para varias filas"""
+    n = len(cantidades)
+    return np.column_stack([
+        np.asarray(cantidades, dtype=float),
+        np.asarray(precios, dtype=float),
+        categorias_encoded,
+        np.full(n, now.month),
+        np.full(n, now.weekday()),
+        np.full(n, now.hour)
+    ])
+
+def parse_number(value, field, index):
+    """Convierte un valor numérico de la petición (ValueError con la posición si no es válido)"""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        number = None
+    if number is None or isinstance(value, bool) or not np.isfinite(number):
+        raise ValueError(f"Valor de {field} no válido en el elemento {index}: {value!r}")
+    return number
+
+def parse_client_ids(clientes):
+    """
+    Valida los IDs de cliente de una petición
+
+    Raises:
+        ValueError: Si algún ID falta o no es un entero (indica su posición)
+    """
+    client_ids = []
+    for i, client_id in enumerate(clientes):
+        # Los clientes pueden enviarse como ID o como {"client_id": ID}
+        if isinstance(client_id, dict):
+            client_id = client_id.get('client_id')
+        if client_id in (None, ''):
+            raise ValueError(f"ID de cliente requerido en el elemento {i}")
+        try:
+            if isinstance(client_id, bool) or (isinstance(client_id, float) and not client_id.is_integer()):
+                raise ValueError
+            client_id = int(client_id)
+            if not np.iinfo(np.int64).min <= client_id <= np.iinfo(np.int64).max:
+                raise ValueError
+            client_ids.append(client_id)
+        except (TypeError, ValueError, OverflowError):
+            raise ValueError(f"ID de cliente no válido en el elemento {i}: {client_id!r}") from None
+    return client_ids
+
+def predict_products(items, current):
+    """
+    Predice los ingresos de varios productos con una sola llamada al modelo
+    
+    Args:
+        items: Lista de diccionarios con producto, categoria, cantidad y precio_unitario
+        current: Artefactos con los que se predice (los publicados al empezar la petición)
+    
+    Returns:
+        Lista de resultados con el mismo formato que /api/predict
+    
+    Raises:
+        ValueError: Si algún elemento no es un objeto o tiene cantidad o precio no numéricos
+    """
+    productos, categorias, cantidades, precios = [], [], [], []
+    
+    for i, data in enumerate(items):
+        if not isinstance(data, dict):
+            raise ValueError(f"El elemento {i} debe ser un objeto con los datos del producto")
+        
+        # Obtener valores del request
+        producto = data.get('producto') or ''
+        categoria = data.get('categoria') or ''
+        if not isinstance(producto, str) or not isinstance(categoria, str):
+            raise ValueError(f"producto y categoria deben ser texto en el elemento {i}")
+        cantidad = parse_number(data.get('cantidad', 1), 'cantidad', i)
+        precio_unitario = parse_number(data.get('precio_unitario', 0), 'precio_unitario', i)
+        
+        productos.append(producto)
+        categorias.append(categoria)
+        cantidades.append(cantidad)
+        precios.append(precio_unitario)
+    
+    productos = np.array(productos, dtype=object)
+    categorias = np.array(categorias, dtype=object)
+    precios = np.array(precios, dtype=float)
+    
+    # Buscar todos los productos en el índice a la vez (por inglés, español o código de stock)
+    con_producto = productos != ''
+    encontrado, precio_producto, categoria_producto = product_index.lookup_many(productos)
+    encontrado &= con_producto
+    
+    # Si no se proporciona precio, usar el promedio del producto
+    # (o el precio promedio general si no se encuentra el producto)
+    precios = np.where(
+        (precios == 0) & con_producto,
+        np.where(encontrado, precio_producto, product_index.precio_promedio),
+        precios
+    )
+    
+    # Si no se proporciona categoría, usar la del producto
+    categorias = np.where((categorias == '') & encontrado, categoria_producto, categorias)
+    
+    # Predecir todas las filas en una sola llamada (las repetidas salen de la caché)
+    now = datetime.now()
+    features = build_features(cantidades, precios, encode_categories(categorias, current.label_encoders), now)
+    predicciones = prediction_cache.predict(current.model, features, current.model_version, now)
+    
+    results = []
+    for producto, categoria, cantidad, precio_unitario, prediccion in zip(
+        productos.tolist(), categorias.tolist(), cantidades, precios.tolist(), predicciones
+    ):
+        # Calcular ingresos esperados
+        ingresos_esperados = cantidad * precio_unitario
+        
+        # Calcular margen de rentabilidad (basado en predicción vs esperado)
+        if ingresos_esperados > 0:
+            rentabilidad_score = (prediccion / ingresos_esperados) * 100
+        else:
+            rentabilidad_score = 0
+        
+        results.append({
+            'prediccion_ingresos': float(prediccion),
+            'ingresos_esperados': float(ingresos_esperados),
+            'rentabilidad_score': float(rentabilidad_score),
+            'cantidad': cantidad,
+            'precio_unitario': precio_unitario,
+            'categoria': categoria,
+            'producto': producto
+        })
+    
+    return results
+
+def predict_clients(client_ids, current):
+    """
+    Predice el comportamiento futuro de varios clientes con una sola llamada al modelo
+    
+    Args:
+        client_ids: Lista de IDs de cliente ya validados (parse_client_ids)
+        current: Artefactos con los que se predice (los publicados al empezar la petición)
+    
+    Returns:
+        Lista con el resultado de cada cliente (mismo formato que /api/predict/client)
+        o None si el cliente no existe
+    """
+    client_ids = np.array(client_ids, dtype=np.int64)
+    # Posiciones y métricas de la misma versión del índice (puede haber ingestas en curso)
+    positions, summary = client_index.locate(client_ids)
+    found = positions >= 0
+    pos = positions[found]
+    
+    results = [None] * len(client_ids)
+    if len(pos) == 0:
+        return results
+    
+    # Usar promedio de cantidad y precio y la categoría más común de cada cliente
+    categorias = summary['categoria_mas_comun'][pos]
+    now = datetime.now()
+    features = build_features(
+        summary['cantidad_promedio'][pos],
+        summary['precio_promedio'][pos],
+        encode_categories(categorias, current.label_encoders),
+        now
+    )
+    predicciones = prediction_cache.predict(current.model, features, current.model_version, now)
+    
+    for i, p, categoria, prediccion in zip(np.flatnonzero(found), pos, categorias, predicciones):
+        client_metrics = {
+            'total_compras': int(summary['total_compras'][p]),
+            'ingresos_totales': float(summary['ingresos_totales'][p]),
+            'cantidad_total': int(summary['cantidad_total'][p]),
+            'productos_unicos': int(summary['productos_unicos'][p]),
+            'categorias_unicas': int(summary['categorias_unicas'][p]),
+            'precio_promedio': float(summary['precio_promedio'][p]),
+            'ingreso_promedio': float(summary['ingreso_promedio'][p])
+        }
+        
+        # Calcular proyección mensual
+        proyeccion_mensual = prediccion * 30
+        
+        results[i] = {
+            'client_id': int(client_ids[i]),
+            'metricas': client_metrics,
+            'prediccion_ingresos_diarios': float(prediccion),
+            'proyeccion_mensual': float(proyeccion_mensual),
+            'categoria_preferida': categoria
+        }
+    
+    return results
 
 @app.route('/api/predict/client', methods=['POST'])
 def predict_client():
     """Predice el comportamiento futuro de un cliente"""
-    global model, df_processed
+    ensure_models_loaded()
+    current = artifacts
     
-    if model is None:
-        load_model()
-    
-    if model is None:
+    if current.model is None:
         return jsonify({'error': 'Modelo no disponible. Ejecuta train_model.py primero.'}), 500
     
-    if df_processed is None:
-        load_and_preprocess_data()
+    ensure_data_loaded()
     
     data = request.json
-    client_id = data.get('client_id', '')
+    client_id = data.get('client_id', '') if isinstance(data, dict) else ''
     
     if not client_id:
         return jsonify({'error': 'ID de cliente requerido'}), 400
     
-    # Obtener historial del cliente
-    client_history = df_processed[df_processed['IDCliente'] == int(client_id)]
-    
-    if len(client_history) == 0:
-        return jsonify({'error': 'Cliente no encontrado'}), 404
-    
-    # Calcular métricas del cliente
-    client_metrics = {
-        'total_compras': len(client_history),
-        'ingresos_totales': float(client_history['Ingresos'].sum()),
-        'cantidad_total': int(client_history['Cantidad'].sum()),
-        'productos_unicos': client_history['CodigoStock'].nunique(),
-        'categorias_unicas': client_history['Categoria'].nunique(),
-        'precio_promedio': float(client_history['PrecioUnitario'].mean()),
-        'ingreso_promedio': float(client_history['Ingresos'].mean())
-    }
-    
-    # Predecir ingresos futuros (usando promedio histórico)
-    # Obtener mes y día actual
-    now = datetime.now()
-    mes = now.month
-    dia_semana = now.weekday()
-    hora = now.hour
-    
-    # Usar promedio de cantidad y precio del cliente
-    cantidad_promedio = float(client_history['Cantidad'].mean())
-    precio_promedio = float(client_history['PrecioUnitario'].mean())
-    
-    # Obtener categoría más común del cliente
-    categoria_mas_comun = client_history['Categoria'].mode()[0] if len(client_history['Categoria'].mode()) > 0 else client_history['Categoria'].iloc[0]
-    
-    if categoria_mas_comun in label_encoders.get('Categoria', {}).classes_:
-        categoria_encoded = label_encoders['Categoria'].transform([categoria_mas_comun])[0]
-    else:
-        categoria_encoded = 0
+    try:
+        client_ids = parse_client_ids([client_id])
+    except ValueError:
+        return jsonify({'error': 'ID de cliente no válido'}), 400
     
-    # Preparar características para predicción
-    features = np.array([[cantidad_promedio, precio_promedio, categoria_encoded, mes, dia_semana, hora]])
+    result = predict_clients(client_ids, current)[0]
     
-    # Predecir
-    prediccion_ingresos = model.predict(features)[0]
-    
-    # Calcular proyección mensual
-    proyeccion_mensual = prediccion_ingresos * 30
+    if result is None:
+        return jsonify({'error': 'Cliente no encontrado'}), 404
     
-    return jsonify({
-        'client_id': int(client_id),
-        'metricas': client_metrics,
-        'prediccion_ingresos_diarios': float(prediccion_ingresos),
-        'proyeccion_mensual': float(proyeccion_mensual),
-        'categoria_preferida': categoria_mas_comun
-    })
+    return jsonify(result)
 
 @app.route('/api/predict', methods=['POST'])
 def predict():
     """Predice los ingresos para un producto"""
-    global model, label_encoders, df_processed
+    ensure_models_loaded()
+    current = artifacts
     
-    if model is None:
-        load_model()
-    
-    if model is None:
+    if current.model is None:
         return jsonify({'error': 'Modelo no disponible. Ejecuta train_model.py primero.'}), 500
     
-    if df_processed is None:
-        load_and_preprocess_data()
-    
-    data = request.json
+    ensure_data_loaded()
     
-    # Obtener valores del request
-    producto = data.get('producto', '')
-    categoria = data.get('categoria', '')
-    cantidad = float(data.get('cantidad', 1))
-    precio_unitario = float(data.get('precio_unitario', 0))
-    
-    # Si no se proporciona precio, buscar el promedio del producto (por inglés o español)
-    if precio_unitario == 0 and producto:
-        producto_data = df_processed[
-            (df_processed['Descripcion_Ingles'] == producto) | 
-            (df_processed['Descripcion_Español'] == producto)
-        ]
-        if len(producto_data) > 0:
-            precio_unitario = float(producto_data['PrecioUnitario'].mean())
-        else:
-            # Si no se encuentra el producto, usar precio promedio general
-            precio_unitario = float(df_processed['PrecioUnitario'].mean())
-    
-    # Si no se proporciona categoría, buscar del producto (por inglés o español)
-    if not categoria and producto:
-        producto_data = df_processed[
-            (df_processed['Descripcion_Ingles'] == producto) | 
-            (df_processed['Descripcion_Español'] == producto)
-        ]
-        if len(producto_data) > 0:
-            categoria = producto_data['Categoria'].iloc[0]
-    
-    # Codificar categoría
-    if categoria in label_encoders['Categoria'].classes_:
-        categoria_encoded = label_encoders['Categoria'].transform([categoria])[0]
-    else:
-        categoria_encoded = 0
+    try:
+        return jsonify(predict_products([request.json], current)[0])
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/predict/batch', methods=['POST'])
+def predict_batch():
+    """
+    Predice varios productos y/o clientes en una sola petición
+    
+    Cuerpo esperado:
+        {"productos": [{"producto": ..., "cantidad": ...}, ...],
+         "clientes": [client_id, ...]}
+    """
+    ensure_models_loaded()
+    current = artifacts
+    
+    if current.model is None:
+        return jsonify({'error': 'Modelo no disponible. Ejecuta train_model.py primero.'}), 500
     
-    # Obtener mes y día actual
-    now = datetime.now()
-    mes = now.month
-    dia_semana = now.weekday()
-    hora = now.hour
+    ensure_data_loaded()
     
-    # Preparar características para predicción
-    features = np.array([[cantidad, precio_unitario, categoria_encoded, mes, dia_semana, hora]])
+    data = request.json or {}
+    if not isinstance(data, dict):
+        return jsonify({'error': 'El cuerpo debe ser un objeto con productos y/o clientes'}), 400
+    productos = data.get('productos') or []
+    clientes = data.get('clientes') or []
+    if not isinstance(productos, list) or not isinstance(clientes, list):
+        return jsonify({'error': 'productos y clientes deben ser listas'}), 400
     
-    # Predecir
-    prediccion = model.predict(features)[0]
+    if not productos and not clientes:
+        return jsonify({'error': 'Se requiere al menos un producto o cliente'}), 400
     
-    # Calcular ingresos esperados
-    ingresos_esperados = cantidad * precio_unitario
+    # Validar todos los elementos antes de llamar al modelo
+    try:
+        client_ids = parse_client_ids(clientes)
+        product_results = predict_products(productos, current) if productos else []
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    # Calcular margen de rentabilidad (basado en predicción vs esperado)
-    if ingresos_esperados > 0:
-        rentabilidad_score = (prediccion / ingresos_esperados) * 100
-    else:
-        rentabilidad_score = 0
+    client_results = predict_clients(client_ids, current) if client_ids else []
+    client_results = [
+        result if result is not None else {'client_id': client_id, 'error': 'Cliente no encontrado'}
+        for client_id, result in zip(client_ids, client_results)
+    ]
     
     return jsonify({
-        'prediccion_ingresos': float(prediccion),
-        'ingresos_esperados': float(ingresos_esperados),
-        'rentabilidad_score': float(rentabilidad_score),
-        'cantidad': cantidad,
-        'precio_unitario': precio_unitario,
-        'categoria': categoria,
-        'producto': producto
+        'productos': product_results,
+        'clientes': client_results
     })
 
+@app.route('/api/predict/cache')
+def get_prediction_cache_stats():
+    """Obtiene los contadores de la caché de predicciones"""
+    return jsonify(prediction_cache.stats())
+
+@app.route('/api/responses/cache')
+def get_response_cache_stats():
+    """Obtiene los contadores de la caché de respuestas serializadas"""
+    return jsonify(response_cache.stats())
+
+def cache_metrics(prefix, stats, counters):
+    """Contadores de una caché (y su tasa de aciertos) para /api/metrics"""
+    metrics = [
+        (f"{prefix}_{name}_total", 'counter', f"{description} de la caché", [({}, stats[name])])
+        for name, description in counters
+    ]
+    total = stats['hits'] + stats['misses']
+    metrics.append((f"{prefix}_hit_ratio", 'gauge', 'Fracción de aciertos de la caché',
+                    [({}, stats['hits'] / total if total else 0.0)]))
+    metrics.append((f"{prefix}_entries", 'gauge', 'Entradas guardadas en la caché', [({}, stats['size'])]))
+    return metrics
+
+@app.route('/api/metrics')
+def get_metrics():
+    """Métricas de latencia por ruta, cargas y cachés en formato de texto de Prometheus"""
+    extra = cache_metrics('response_cache', response_cache.stats(),
+                          [('hits', 'Aciertos'), ('misses', 'Fallos'), ('not_modified', 'Respuestas 304')])
+    extra += cache_metrics('prediction_cache', prediction_cache.stats(),
+                           [('hits', 'Aciertos'), ('misses', 'Fallos'), ('evictions', 'Descartes')])
+    extra += [
+        ('app_data_version', 'gauge', 'Versión de los datos en memoria', [({}, data_version)]),
+        ('app_model_version', 'gauge', 'Versión de los modelos cargados', [({}, model_version)]),
+        ('app_model_loaded', 'gauge', '1 si hay un modelo de predicción cargado',
+         [({}, int(artifacts is not None and artifacts.model is not None))])
+    ]
+    if dashboard_aggregates is not None:
+        extra.append(('app_transactions', 'gauge', 'Transacciones en memoria (incluidas las ingeridas)',
+                      [({}, dashboard_aggregates['stats']['total_transacciones'])]))
+    return request_metrics.response(extra)
+
+def get_transactions():
+    """Devuelve la tabla de transacciones completa, incluidos los lotes ingeridos"""
+    global df_processed
+
+    ensure_data_loaded()
+    if pending_batches:
+        with phase(PHASE_DATA), init_lock:
+            if pending_batches:
+                # Una sola concatenación para todos los lotes pendientes
+                df_processed = concat_batches(df_processed, pending_batches)
+                pending_batches.clear()
+    return df_processed
+
+def encode_new_categories(categorias):
+    """
+    Agrega al encoder las categorías que no conoce, al final de classes_,
+    para que los códigos existentes (y el modelo entrenado) no cambien
+    """
+    encoder = label_encoders.get('Categoria')
+    if encoder is None:
+        return []
+    nuevas = [c for c in pd.unique(categorias.dropna().astype(str)) if c not in set(encoder.classes_)]
+    if nuevas:
+        encoder.classes_ = np.concatenate([encoder.classes_, np.array(nuevas, dtype=encoder.classes_.dtype)])
+    return nuevas
+
+def ingest_transactions(records, persist=False):
+    """
+    Incorpora transacciones nuevas a los datos en memoria: actualiza índices y
+    agregados con un costo proporcional al lote, sin recalcular todo el CSV
+
+    Raises:
+        ValueError: Si las transacciones no tienen el formato esperado
+    """
+    global dashboard_aggregates, data_version, data_ingested
+
+    ensure_data_loaded()
+    with init_lock:
+        batch = prepare_batch(records, df_processed)
+        nuevas = encode_new_categories(batch['Categoria'])
+        if 'Categoria' in label_encoders:
+            batch['Categoria_Encoded'] = label_encoders['Categoria'].transform(batch['Categoria'].astype(str))
+
+        client_index.update(batch)
+        product_index.update(batch)
+        dashboard_state.update(batch)
+        dashboard_aggregates = dashboard_state.results()
+        trends_cube.update(batch)
+        date_index.update(batch)
+        pending_batches.append(batch)
+        data_ingested = True
+        data_version += 1
+
+        if persist:
+            append_to_csv(records, DATA_PATH)
+
+        return {
+            'filas': len(batch),
+            'categorias_nuevas': nuevas,
+            'total_transacciones': dashboard_aggregates['stats']['total_transacciones']
+        }
+
+@app.route('/api/train', methods=['POST'])
+def train():
+    """
+    Encola un entrenamiento en segundo plano con las opciones de train_model.py
+
+    Cuerpo esperado (todas las opciones son opcionales):
+        {"n_clusters": 8, "cluster_type": "rentabilidad", "skip_clustering_clientes": true, ...}
+    """
+    try:
+        status = training_jobs.submit(request.json or {}, DATA_PATH)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except JobLimitError as e:
+        return jsonify({'error': str(e)}), 429
+    return jsonify(status), 202
+
+@app.route('/api/train/<job_id>')
+def get_training_job(job_id):
+    """Estado de un entrenamiento: etapa, progreso, tiempos por etapa y versión de los artefactos"""
+    status = training_jobs.status(job_id)
+    if status is None:
+        return jsonify({'error': 'Trabajo de entrenamiento no encontrado'}), 404
+    return jsonify(status)
+
+@app.route('/api/admin/reload', methods=['POST'])
+def reload_models():
+    """
+    Recarga los modelos de la versión activa sin reiniciar: se cargan y validan
+    en segundo plano y se publican juntos; mientras tanto se sigue usando la
+    versión anterior. Con {"esperar": true} responde cuando termina.
+    """
+    data = request.get_json(silent=True) or {}
+    if not model_reloader.reload(wait=bool(data.get('esperar', False))):
+        return jsonify({'error': 'Ya hay una recarga en curso', **model_reloader.status()}), 409
+    status = model_reloader.status()
+    return jsonify(status), {RELOADING: 202, FAILED: 500}.get(status['estado'], 200)
+
+@app.route('/api/admin/reload')
+def get_reload_status():
+    """Estado de la última recarga de modelos y versión publicada"""
+    return jsonify(model_reloader.status())
+
+@app.route('/api/ingest', methods=['POST'])
+def ingest():
+    """
+    Ingresa un lote de transacciones nuevas sin reiniciar la aplicación
+
+    Cuerpo esperado:
+        {"transacciones": [{"NumeroFactura": ..., "Fecha": "dd/mm/aaaa", ...}, ...],
+         "persistir": false}
+    """
+    data = request.json or {}
+    transacciones = data.get('transacciones', [])
+
+    if not transacciones:
+        return jsonify({'error': 'Se requiere al menos una transacción'}), 400
+
+    start = time.perf_counter()
+    try:
+        result = ingest_transactions(transacciones, persist=bool(data.get('persistir', False)))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    result['tiempo_ms'] = (time.perf_counter() - start) * 1000
+    return jsonify(result)
+
 if __name__ == '__main__':
     print("Inicializando aplicación...")
-    load_and_preprocess_data()
-    load_model()
+    initialize()
     
-    if model is None:
+    if artifacts.model is None:
         print("\n⚠️  ADVERTENCIA: Modelo no encontrado.")
         print("   Ejecuta: python train_model.py --n-clusters 5 --cluster-type rentabilidad")
         print("   para entrenar el modelo primero.\n")
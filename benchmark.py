@@ -0,0 +1,308 @@
+"""
+Suite de benchmarks del pipeline y de la API
+Mide la carga de datos (CSV y caché), las tablas de características, cada
+tipo de clustering, el entrenamiento del modelo de predicción y todos los
+endpoints de Flask (con el cliente de pruebas) sobre un CSV dado, y escribe
+los resultados en un JSON comparable entre ejecuciones.
+
+Los modelos y la caché se escriben en un directorio de trabajo aparte, así
+que los modelos de models/ no se modifican.
+
+Uso:
+    python generate_data.py --filas 1M
+    python benchmark.py --datos datos/supermercado_1M.csv
+    python benchmark.py --datos datos/supermercado_1M.csv --comparar benchmarks/anterior.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import time
+from datetime import datetime
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+import sklearn
+
+import app as app_module
+import train_model
+from features import load_feature_tables
+
+BENCHMARKS_DIR = 'benchmarks'
+WORK_DIR = os.path.join(BENCHMARKS_DIR, 'trabajo')
+CLUSTER_TYPES = ['productos', 'rentabilidad', 'cantidad', 'clientes']
+# Filas de cada lote enviado a /api/ingest
+INGEST_ROWS = 100
+# Rutas que lanzan entrenamientos o recargas en segundo plano: el entrenamiento se mide en run_stages
+UNMEASURED_ROUTES = {'/api/train', '/api/train/<job_id>', '/api/admin/reload'}
+
+
+def timed(results, name, func, *args, **kwargs):
+    """Ejecuta func, agrega su tiempo a results y devuelve su resultado"""
+    print(f"▶ {name}...")
+    start = time.perf_counter()
+    value = func(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    results.append({
+        'etapa': name,
+        'tiempo_s': elapsed,
+        'memoria_pico_mb': train_model.peak_memory_mb()
+    })
+    print(f"  {elapsed:.3f} s")
+    return value
+
+
+def run_stages(data_path, args):
+    """
+    Mide las etapas de entrenamiento y guarda los modelos en el directorio de trabajo
+
+    Returns:
+        (lista de etapas medidas, DataFrame preprocesado)
+    """
+    stages = []
+    train_model.DATA_PATH = data_path
+
+    # Primera carga sin caché (parseo del CSV), luego desde la caché columnar
+    shutil.rmtree('cache', ignore_errors=True)
+    timed(stages, 'carga_csv', train_model.load_and_preprocess_data)
+    df, label_encoders = timed(stages, 'carga_cache', train_model.load_and_preprocess_data)
+
+    # Las tablas se calculan sin caché para medir la agregación
+    tables = timed(stages, 'caracteristicas', load_feature_tables, df)
+
+    os.makedirs(train_model.MODELS_DIR, exist_ok=True)
+    for cluster_type in CLUSTER_TYPES:
+        kmeans, scaler, data = timed(
+            stages, f"clusters_{cluster_type}", train_model.create_clusters,
+            df, n_clusters=args.n_clusters, cluster_type=cluster_type, feature_tables=tables
+        )
+        # Se guardan los clusters de rentabilidad (los de la configuración por defecto) y de clientes
+        if cluster_type == 'clientes':
+            data.to_csv(train_model.CLUSTER_CLIENTS_DATA_PATH, index=False, encoding='utf-8')
+            train_model.save_models(None, None, None, None, 'rentabilidad', kmeans, scaler, clients_data=data)
+        elif cluster_type == 'rentabilidad':
+            data.to_csv(train_model.CLUSTER_DATA_PATH, index=False, encoding='utf-8')
+            train_model.save_models(None, kmeans, scaler, None, cluster_type, product_data=data)
+
+    model = timed(stages, 'prediccion', train_model.train_prediction_model,
+                  df, label_encoders, n_jobs=args.jobs, compact=args.compact_model)
+    train_model.save_models(model, None, None, label_encoders, 'rentabilidad')
+    return stages, df
+
+
+def endpoint_cases(df, raw_records):
+    """Peticiones de ejemplo para cada endpoint: (nombre, método, url, cuerpo JSON)"""
+    product = df.iloc[0]
+    client_id = int(df['IDCliente'].dropna().iloc[0])
+    codes = [str(code) for code in df['CodigoStock'].drop_duplicates().iloc[:50]]
+    client_ids = [int(c) for c in df['IDCliente'].dropna().drop_duplicates().iloc[:50]]
+    # Últimos 30 días de los datos para los filtros desde/hasta
+    hasta = pd.Timestamp(df['Fecha'].max())
+    rango = f"desde={(hasta - pd.Timedelta(days=29)):%Y-%m-%d}&hasta={hasta:%Y-%m-%d}"
+    item = {
+        'producto': str(product['Descripcion_Ingles']),
+        'categoria': str(product['Categoria']),
+        'cantidad': 3,
+        'precio_unitario': float(product['PrecioUnitario'])
+    }
+    return [
+        ('index', 'GET', '/', None),
+        ('dashboard_stats', 'GET', '/api/dashboard/stats', None),
+        ('dashboard_top_products', 'GET', '/api/dashboard/top-products', None),
+        ('dashboard_categories', 'GET', '/api/dashboard/categories', None),
+        ('dashboard_top_clients', 'GET', '/api/dashboard/top-clients', None),
+        ('dashboard_stats_30d', 'GET', f'/api/dashboard/stats?{rango}', None),
+        ('dashboard_top_products_30d', 'GET', f'/api/dashboard/top-products?{rango}', None),
+        ('dashboard_categories_30d', 'GET', f'/api/dashboard/categories?{rango}', None),
+        ('dashboard_top_clients_30d', 'GET', f'/api/dashboard/top-clients?{rango}', None),
+        ('products_list', 'GET', '/api/products/list', None),
+        ('products_list_pagina', 'GET', '/api/products/list?limit=50&sort=Descripcion_Ingles&order=desc', None),
+        ('categories_list', 'GET', '/api/categories/list', None),
+        ('clients_list', 'GET', '/api/clients/list', None),
+        ('clients_list_pagina', 'GET', '/api/clients/list?limit=50&offset=100&sort=Ingresos_Total&order=desc', None),
+        ('clients_list_30d', 'GET', f'/api/clients/list?limit=50&sort=Ingresos_Total&order=desc&{rango}', None),
+        ('clusters', 'GET', '/api/clusters', None),
+        ('clusters_miembros', 'GET', '/api/clusters?miembros=true', None),
+        ('cluster_top', 'GET', '/api/clusters/0?top=10', None),
+        ('cluster_pagina', 'GET', '/api/clusters/0?limit=50&sort=Ingresos_Total&order=desc', None),
+        ('clusters_products', 'GET', '/api/clusters/products?limit=50', None),
+        ('clusters_clients', 'GET', '/api/clusters/clients', None),
+        ('clusters_clients_miembros', 'GET', '/api/clusters/clients?miembros=true', None),
+        ('cluster_clients_pagina', 'GET', '/api/clusters/clients/0?limit=50', None),
+        ('clusters_clients_list', 'GET', '/api/clusters/clients/list?limit=50', None),
+        ('clusters_assign', 'POST', '/api/clusters/assign', {'productos': codes}),
+        ('clusters_clients_assign', 'POST', '/api/clusters/clients/assign', {'clientes': client_ids}),
+        ('products_similar', 'GET', f"/api/products/{quote(codes[0])}/similar?k=10", None),
+        ('clients_similar', 'GET', f'/api/clients/{client_id}/similar?k=10', None),
+        ('features_products', 'GET', '/api/features/products?limit=50', None),
+        ('features_clients', 'GET', '/api/features/clients?limit=50', None),
+        ('predict', 'POST', '/api/predict', item),
+        ('predict_client', 'POST', '/api/predict/client', {'client_id': client_id}),
+        ('predict_batch', 'POST', '/api/predict/batch', {'productos': [item] * 50, 'clientes': [client_id] * 10}),
+        ('predict_cache', 'GET', '/api/predict/cache', None),
+        ('responses_cache', 'GET', '/api/responses/cache', None),
+        ('metrics', 'GET', '/api/metrics', None),
+        ('trends', 'GET', '/api/trends', None),
+        ('trends_semana_categoria', 'GET', f"/api/trends?granularidad=semana&categoria={quote(str(product['Categoria']))}", None),
+        ('trends_hora_dia_semana', 'GET', '/api/trends?granularidad=hora_dia_semana', None),
+        # Modifica los datos en memoria: va al final
+        ('ingest', 'POST', '/api/ingest', {'transacciones': raw_records})
+    ]
+
+
+def measure_endpoint(client, method, url, body, repeats):
+    """
+    Mide una petición: la primera con las cachés vacías (construye la respuesta)
+    y luego `repeats` repeticiones (respuestas en caché cuando aplica)
+    """
+    def send():
+        start = time.perf_counter()
+        response = client.open(url, method=method, json=body)
+        return (time.perf_counter() - start) * 1000, response
+
+    app_module.response_cache.clear()
+    app_module.prediction_cache.clear()
+    first_ms, response = send()
+    times = [send()[0] for _ in range(repeats)]
+    return {
+        'metodo': method,
+        'url': url,
+        'estado': response.status_code,
+        'bytes': len(response.get_data()),
+        'primera_ms': first_ms,
+        'mediana_ms': float(np.median(times)) if times else None,
+        'p95_ms': float(np.percentile(times, 95)) if times else None,
+        'repeticiones': repeats
+    }
+
+
+def run_endpoints(data_path, df, args):
+    """Arranca la aplicación con los modelos del directorio de trabajo y mide cada endpoint"""
+    startup = []
+    app_module.DATA_PATH = data_path
+    timed(startup, 'arranque_app_datos', app_module.load_and_preprocess_data)
+    timed(startup, 'arranque_app_modelos', app_module.load_model)
+
+    raw_records = pd.read_csv(data_path, nrows=INGEST_ROWS, encoding='utf-8').to_dict('records')
+    cases = endpoint_cases(df, raw_records)
+
+    # Avisar de las rutas nuevas que aún no tienen caso en la suite
+    # (por endpoint, para contar las rutas con parámetros como /api/clusters/<id>)
+    adapter = app_module.app.url_map.bind('localhost')
+    covered = {adapter.match(url.split('?')[0], method=method)[0] for _, method, url, _ in cases}
+    missing = sorted(rule.rule for rule in app_module.app.url_map.iter_rules()
+                     if rule.endpoint not in covered and rule.endpoint != 'static'
+                     and rule.rule not in UNMEASURED_ROUTES)
+    if missing:
+        print(f"⚠️  Rutas sin caso de benchmark: {', '.join(missing)}")
+
+    endpoints = []
+    client = app_module.app.test_client()
+    for name, method, url, body in cases:
+        repeats = max(args.repeticiones // 10, 1) if name == 'ingest' else args.repeticiones
+        result = measure_endpoint(client, method, url, body, repeats)
+        result['endpoint'] = name
+        endpoints.append(result)
+        print(f"  {name:<28}{result['estado']:>5}{result['primera_ms']:>12.2f} ms{result['mediana_ms']:>12.3f} ms")
+    return startup, endpoints
+
+
+def environment():
+    """Versiones y hardware, para saber si dos resultados son comparables"""
+    return {
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'sklearn': sklearn.__version__,
+        'plataforma': platform.platform(),
+        'nucleos': os.cpu_count()
+    }
+
+
+def print_comparison(previous, current):
+    """Imprime los tiempos de dos resultados lado a lado (relación = actual / anterior)"""
+    print(f"\n{'Medición':<32}{'Anterior':>12}{'Actual':>12}{'Relación':>10}")
+    for section, key, unit in (('etapas', 'tiempo_s', 's'), ('endpoints', 'mediana_ms', 'ms')):
+        name_key = 'etapa' if section == 'etapas' else 'endpoint'
+        before = {item[name_key]: item.get(key) for item in previous.get(section, [])}
+        for item in current[section]:
+            old, new = before.get(item[name_key]), item.get(key)
+            if old is None or new is None:
+                continue
+            ratio = f"{new / old:.2f}x" if old > 0 else '-'
+            print(f"{item[name_key]:<32}{old:>10.3f}{unit:<2}{new:>10.3f}{unit:<2}{ratio:>10}")
+    if previous.get('filas') != current['filas']:
+        print(f"⚠️  Los datasets son distintos ({previous.get('filas')} y {current['filas']} filas)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Mide el pipeline de entrenamiento y los endpoints de la API')
+    parser.add_argument('--datos', type=str, default=train_model.DATA_PATH,
+                        help='CSV a medir (default: el dataset de la aplicación)')
+    parser.add_argument('--salida', type=str, default=None,
+                        help=f'JSON de resultados (default: {BENCHMARKS_DIR}/benchmark_<csv>_<fecha>.json)')
+    parser.add_argument('--comparar', type=str, default=None, help='JSON de una ejecución anterior para comparar')
+    parser.add_argument('--dir-trabajo', type=str, default=WORK_DIR,
+                        help=f'Directorio para modelos y caché del benchmark (default: {WORK_DIR})')
+    parser.add_argument('--n-clusters', type=int, default=5, help='Clusters de cada tipo (default: 5)')
+    parser.add_argument('--jobs', type=int, default=-1, help='Núcleos del Random Forest (default: todos)')
+    parser.add_argument('--compact-model', action='store_true', help='Entrenar el modelo compacto')
+    parser.add_argument('--repeticiones', type=int, default=20,
+                        help='Repeticiones por endpoint después de la primera petición (default: 20)')
+    args = parser.parse_args()
+
+    data_path = os.path.abspath(args.datos)
+    if not os.path.exists(data_path):
+        print(f"No existe {args.datos}; genera uno con: python generate_data.py --filas 1M")
+        return
+    name = os.path.splitext(os.path.basename(data_path))[0]
+    output = os.path.abspath(args.salida or os.path.join(
+        BENCHMARKS_DIR, f"benchmark_{name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"))
+    previous = None
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            previous = json.load(f)
+
+    # Rutas relativas (models/, cache/) dentro del directorio de trabajo
+    os.makedirs(args.dir_trabajo, exist_ok=True)
+    os.chdir(args.dir_trabajo)
+
+    start = time.perf_counter()
+    stages, df = run_stages(data_path, args)
+    startup, endpoints = run_endpoints(data_path, df, args)
+
+    results = {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'datos': os.path.basename(data_path),
+        'filas': len(df),
+        'tamano_csv_mb': os.path.getsize(data_path) / (1024 * 1024),
+        'entorno': environment(),
+        'parametros': {
+            'n_clusters': args.n_clusters,
+            'jobs': args.jobs,
+            'compact_model': args.compact_model,
+            'repeticiones': args.repeticiones
+        },
+        'tiempo_total_s': time.perf_counter() - start,
+        'etapas': stages + startup,
+        'endpoints': endpoints
+    }
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+
+    print(f"\n{'Etapa':<32}{'Tiempo (s)':>12}")
+    for stage in results['etapas']:
+        print(f"{stage['etapa']:<32}{stage['tiempo_s']:>12.3f}")
+    print(f"Tiempo total: {results['tiempo_total_s']:.1f} s")
+    print(f"Resultados guardados en: {output}")
+
+    if previous:
+        print_comparison(previous, results)
+
+
+if __name__ == '__main__':
+    main()
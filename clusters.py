@@ -0,0 +1,189 @@
+"""
+Resumen y detalle por cluster para /api/clusters y /api/clusters/clients
+Al cargar los artefactos los registros de cada clustering se particionan por
+cluster una sola vez: el resumen queda calculado y el detalle de un cluster
+(los N primeros o una página) cuesta lo que mide la respuesta, sin volver a
+filtrar todos los registros por cada cluster.
+
+También asigna cluster en línea a productos y clientes nuevos o con
+transacciones nuevas, con el scaler y el modelo de clusters guardados.
+"""
+
+import numpy as np
+import pandas as pd
+
+from features import cluster_features, compute_client_features, compute_product_features
+from listings import DEFAULT_PAGE_SIZE
+
+# Columna por la que se eligen los N primeros de un cluster (?top=N)
+TOP_COLUMN = 'Ingresos_Total'
+# Columnas de cada miembro en la respuesta con ?miembros=true (las que existan)
+PRODUCT_MEMBER_COLUMNS = ['CodigoStock', 'Descripcion_Ingles', 'Descripcion_Español', 'Categoria', 'Cluster',
+                          'Ingresos_Total', 'Cantidad_Total', 'Precio_Promedio']
+CLIENT_MEMBER_COLUMNS = ['IDCliente', 'Cluster', 'Ingresos_Total', 'Num_Transacciones', 'Cantidad_Total',
+                         'Productos_Unicos', 'Frecuencia_Compra', 'Valor_Promedio_Transaccion']
+
+
+class ClusterView:
+    """
+    Resumen por cluster y acceso al detalle de cada uno
+
+    Args:
+        frame: DataFrame con la columna Cluster (el de los artefactos)
+        listing: Listing del mismo DataFrame con el filtro 'cluster'
+        count_column: Columna cuyos valores no nulos se cuentan por cluster
+        count_name: Nombre de la columna con los miembros por cluster en el resumen
+        sum_columns: Columnas que se suman por cluster en el resumen (0 si no existen)
+        member_columns: Columnas de cada miembro en la respuesta completa
+        key_column: Columna que identifica a cada miembro (para cluster_of)
+    """
+
+    def __init__(self, frame, listing, count_column, count_name, sum_columns, member_columns, key_column=None):
+        self.listing = listing
+        # El listado ya tiene las posiciones de cada cluster en todos sus órdenes
+        self.member_columns = [col for col in member_columns if col in frame.columns]
+
+        grouped = frame.groupby('Cluster')
+        counts = grouped[count_column].count()
+        sums = {
+            col: grouped[col].sum().tolist() if col in frame.columns else [0] * len(counts)
+            for col in sum_columns
+        }
+        self.summary_rows = {}
+        for i, (cluster_id, count) in enumerate(zip(counts.index.tolist(), counts.tolist())):
+            row = {'Cluster': cluster_id, count_name: count}
+            row.update({col: sums[col][i] for col in sum_columns})
+            self.summary_rows[cluster_id] = row
+        self._members = None
+
+        # Cluster de cada miembro según el entrenamiento
+        self._clusters = None
+        if key_column in frame.columns:
+            clusters = frame.set_index(key_column)['Cluster']
+            self._clusters = clusters[~clusters.index.duplicated()]
+
+    def cluster_of(self, keys):
+        """Cluster asignado al entrenar a cada clave (None si no estaba en el entrenamiento)"""
+        if self._clusters is None:
+            return [None] * len(keys)
+        return [None if pd.isna(c) else int(c) for c in self._clusters.reindex(keys).tolist()]
+
+    def summary(self):
+        """Resumen de todos los clusters (sin sus miembros)"""
+        return {'summary': list(self.summary_rows.values()), 'total_clusters': len(self.summary_rows)}
+
+    def detail(self, cluster_id, args):
+        """
+        Resumen y miembros de un cluster, paginados
+
+        Args:
+            cluster_id: Número de cluster
+            args: Parámetros de la query string: top (los N de mayores
+                ingresos) u offset, limit, sort, order y q
+
+        Raises:
+            KeyError: Si el cluster no existe
+            ValueError: Si la columna de orden o el sentido no son válidos
+        """
+        row = self.summary_rows[cluster_id]
+        top = args.get('top', type=int)
+        if top is not None:
+            sort = TOP_COLUMN if TOP_COLUMN in self.listing.orders else None
+            page = self.listing.page(limit=top, sort=sort, order='desc' if sort else 'asc', cluster=cluster_id)
+        else:
+            page = self.listing.page(
+                offset=args.get('offset', 0, type=int),
+                limit=args.get('limit', DEFAULT_PAGE_SIZE, type=int),
+                sort=args.get('sort') or None,
+                order=args.get('order', 'asc'),
+                q=args.get('q'),
+                cluster=cluster_id
+            )
+        return {'resumen': row, **page}
+
+    def members(self):
+        """
+        Resumen y todos los miembros de cada cluster (la respuesta anterior
+        de /api/clusters, que ahora se pide con ?miembros=true)
+        """
+        if self._members is None:
+            self._members = {
+                cluster_id: [
+                    {col: record[col] for col in self.member_columns}
+                    for record in self.listing.page(limit=None, cluster=cluster_id)['items']
+                ]
+                for cluster_id in self.summary_rows
+            }
+        return {**self.summary(), 'clusters': self._members}
+
+
+def product_cluster_view(frame, listing):
+    """Vista de los clusters de productos"""
+    return ClusterView(frame, listing, 'Producto', 'Num_Productos', ['Ingresos_Total', 'Cantidad_Total'],
+                       PRODUCT_MEMBER_COLUMNS, key_column='CodigoStock')
+
+
+def client_cluster_view(frame, listing):
+    """Vista de los clusters de clientes"""
+    # Usar IDCliente para contar si existe, sino usar cualquier columna
+    count_column = 'IDCliente' if 'IDCliente' in frame.columns else frame.columns[0]
+    return ClusterView(frame, listing, count_column, 'Num_Clientes', ['Ingresos_Total', 'Num_Transacciones'],
+                       CLIENT_MEMBER_COLUMNS, key_column='IDCliente')
+
+
+def assign_clusters(kmeans, scaler, X):
+    """
+    Asigna a cada fila el centroide más cercano: un solo transform del scaler y
+    uno del modelo para todo el lote
+
+    Returns:
+        (clusters, distancia de cada fila a su centroide)
+    """
+    if not len(X):
+        return np.empty(0, dtype=np.int64), np.empty(0)
+    distances = kmeans.transform(scaler.transform(X))
+    clusters = distances.argmin(axis=1)
+    return clusters, distances[np.arange(len(clusters)), clusters]
+
+
+def _assign(table, key_column, X, kmeans, scaler, view):
+    clusters, distances = assign_clusters(kmeans, scaler, X)
+    keys = table[key_column].tolist()
+    previous = view.cluster_of(keys) if view is not None else [None] * len(keys)
+    return {
+        key: {'cluster': cluster, 'distancia': distance, 'cluster_entrenamiento': before, 'caracteristicas': features}
+        for key, cluster, distance, before, features in zip(
+            keys, clusters.tolist(), distances.tolist(), previous, X.to_dict('records')
+        )
+    }
+
+
+def assign_product_clusters(transactions, codes, kmeans, scaler, cluster_type, view=None):
+    """
+    Calcula las características de los productos indicados con sus
+    transacciones (las mismas que usa create_clusters) y les asigna cluster
+
+    Args:
+        transactions: Tabla de transacciones, incluidos los lotes ingeridos
+        codes: Códigos de stock de los productos
+        kmeans, scaler: Modelo de clusters de productos y su scaler
+        cluster_type: Tipo de clustering con que se entrenó el modelo
+        view: ClusterView de productos, para informar el cluster del entrenamiento
+
+    Returns:
+        Diccionario {CodigoStock: asignación} de los productos con transacciones
+    """
+    table = compute_product_features(transactions[transactions['CodigoStock'].isin(codes)])
+    return _assign(table, 'CodigoStock', cluster_features(table, cluster_type), kmeans, scaler, view)
+
+
+def assign_client_clusters(transactions, client_ids, kmeans, scaler, view=None):
+    """
+    Calcula las características de los clientes indicados con sus
+    transacciones y les asigna cluster (ver assign_product_clusters)
+
+    Returns:
+        Diccionario {IDCliente: asignación} de los clientes con transacciones
+    """
+    table = compute_client_features(transactions[transactions['IDCliente'].isin(client_ids)])
+    return _assign(table, 'IDCliente', cluster_features(table, 'clientes'), kmeans, scaler, view)
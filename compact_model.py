@@ -0,0 +1,117 @@
+"""
+Modelo de predicción compacto
+Representa un bosque de árboles de regresión como arreglos planos (un .npy
+por arreglo) que se cargan con memoria mapeada: la carga es casi inmediata y
+varios workers comparten las mismas páginas del sistema operativo.
+"""
+
+import json
+import os
+import shutil
+
+import numpy as np
+
+META_FILE = 'meta.json'
+ARRAYS = ('feature', 'threshold', 'left', 'right', 'value', 'roots')
+
+
+class FlatForest:
+    """
+    Bosque de árboles de regresión en arreglos planos
+
+    Todos los nodos de todos los árboles comparten los mismos arreglos; las
+    hojas apuntan a sí mismas, así que recorrer max_depth niveles deja cada
+    fila en su hoja sin condiciones adicionales.
+    """
+
+    def __init__(self, feature, threshold, left, right, value, roots, max_depth, n_features):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.n_features_in_ = int(n_features)
+
+    @classmethod
+    def from_forest(cls, forest):
+        """Convierte un RandomForestRegressor (o ExtraTrees) entrenado"""
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for estimator in forest.estimators_:
+            tree = estimator.tree_
+            n = tree.node_count
+            nodes = np.arange(offset, offset + n, dtype=np.int32)
+            leaf = tree.children_left == -1
+
+            features.append(np.where(leaf, 0, tree.feature).astype(np.int32))
+            thresholds.append(np.where(leaf, np.inf, tree.threshold))
+            lefts.append(np.where(leaf, nodes, tree.children_left + offset).astype(np.int32))
+            rights.append(np.where(leaf, nodes, tree.children_right + offset).astype(np.int32))
+            values.append(tree.value[:, 0, 0])
+            roots.append(offset)
+
+            offset += n
+            max_depth = max(max_depth, tree.max_depth)
+
+        return cls(
+            np.concatenate(features), np.concatenate(thresholds),
+            np.concatenate(lefts), np.concatenate(rights),
+            np.concatenate(values).astype(np.float64), np.array(roots, dtype=np.int32),
+            max_depth, forest.n_features_in_
+        )
+
+    def predict(self, X):
+        """Promedio de las hojas de todos los árboles para cada fila"""
+        # scikit-learn compara en float32; convertir igual para obtener las mismas hojas
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        rows = np.arange(len(X))[:, None]
+        node = np.broadcast_to(self.roots, (len(X), len(self.roots)))
+        for _ in range(self.max_depth):
+            # Mismo criterio que scikit-learn: izquierda si x <= umbral
+            go_left = X[rows, self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+        return self.value[node].mean(axis=1)
+
+    @property
+    def n_nodes(self):
+        return len(self.feature)
+
+    def save(self, path):
+        """Guarda los arreglos en un directorio (reemplazo atómico)"""
+        tmp_path = path.rstrip(os.sep) + '.tmp'
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        for name in ARRAYS:
+            np.save(os.path.join(tmp_path, f"{name}.npy"), getattr(self, name), allow_pickle=False)
+        with open(os.path.join(tmp_path, META_FILE), 'w', encoding='utf-8') as f:
+            json.dump({
+                'max_depth': self.max_depth,
+                'n_features': self.n_features_in_,
+                'n_trees': len(self.roots),
+                'n_nodes': self.n_nodes
+            }, f)
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Carga el modelo; con mmap los arreglos no se copian a memoria del proceso"""
+        with open(os.path.join(path, META_FILE), encoding='utf-8') as f:
+            meta = json.load(f)
+        arrays = {
+            name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r' if mmap else None)
+            for name in ARRAYS
+        }
+        return cls(max_depth=meta['max_depth'], n_features=meta['n_features'], **arrays)
+
+
+def artifact_size(path):
+    """Tamaño en bytes de un archivo o de todos los archivos de un directorio"""
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+    return os.path.getsize(path)
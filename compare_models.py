@@ -0,0 +1,101 @@
+"""
+Comparación del modelo de predicción actual con el modelo compacto
+Informa tamaño del artefacto, tiempo de carga, latencia de predicción de una
+fila y de un lote, y R² sobre la misma partición de prueba del entrenamiento.
+
+Uso:
+    python train_model.py --skip-clustering                   # modelo actual (.pkl)
+    python train_model.py --skip-clustering --compact-model   # modelo compacto
+    python compare_models.py --output models/model_comparison.json
+"""
+
+import argparse
+import json
+import os
+import time
+
+import joblib
+import numpy as np
+from sklearn.metrics import r2_score
+
+from compact_model import FlatForest, artifact_size
+from train_model import artifact_path, current_artifact_dir, load_and_preprocess_data, prediction_split
+
+
+def median_latency_ms(predict, X, repeats):
+    """Mediana del tiempo de predict(X) en milisegundos"""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        predict(X)
+        times.append((time.perf_counter() - start) * 1000)
+    return float(np.median(times))
+
+
+def measure(name, path, load, X_test, y_test, batch_size, repeats):
+    """Mide un modelo guardado"""
+    start = time.perf_counter()
+    model = load(path)
+    load_time = time.perf_counter() - start
+
+    X_row = X_test[:1]
+    X_batch = X_test[:batch_size]
+    # Una predicción previa para no medir la primera llamada (cachés, hilos)
+    model.predict(X_row)
+
+    return {
+        'modelo': name,
+        'ruta': path,
+        'tamano_mb': artifact_size(path) / (1024 * 1024),
+        'carga_s': load_time,
+        'latencia_fila_ms': median_latency_ms(model.predict, X_row, repeats),
+        'latencia_lote_ms': median_latency_ms(model.predict, X_batch, max(repeats // 10, 3)),
+        'filas_lote': len(X_batch),
+        'r2_test': float(r2_score(y_test, model.predict(X_test)))
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compara el modelo de predicción actual con el compacto')
+    parser.add_argument('--batch-size', type=int, default=1000, help='Filas del lote de predicción (default: 1000)')
+    parser.add_argument('--repeats', type=int, default=50, help='Repeticiones por medición (default: 50)')
+    parser.add_argument('--output', type=str, default=None, help='Guardar los resultados en un JSON')
+    args = parser.parse_args()
+
+    df, _ = load_and_preprocess_data()
+    _, X_test, _, y_test = prediction_split(df)
+    X_test = X_test.to_numpy(dtype=np.float64)
+    y_test = y_test.to_numpy()
+
+    # Modelos de la versión activa de los artefactos
+    directory = current_artifact_dir()
+    candidates = [
+        ('random_forest', artifact_path('MODEL_PATH', directory), joblib.load),
+        ('compacto', artifact_path('COMPACT_MODEL_DIR', directory), FlatForest.load)
+    ]
+    results = []
+    for name, path, load in candidates:
+        if not os.path.exists(path):
+            print(f"⚠️  {name}: no existe {path}; entrénalo con train_model.py"
+                  f"{' --compact-model' if name == 'compacto' else ''}")
+            continue
+        print(f"Midiendo {name}...")
+        results.append(measure(name, path, load, X_test, y_test, args.batch_size, args.repeats))
+
+    if not results:
+        return
+
+    print(f"\n{'Modelo':<15}{'Tamaño (MB)':>13}{'Carga (s)':>11}{'1 fila (ms)':>13}"
+          f"{f'{args.batch_size} filas (ms)':>18}{'R² test':>10}")
+    for r in results:
+        print(f"{r['modelo']:<15}{r['tamano_mb']:>13.1f}{r['carga_s']:>11.3f}{r['latencia_fila_ms']:>13.3f}"
+              f"{r['latencia_lote_ms']:>18.2f}{r['r2_test']:>10.4f}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\nResultados guardados en: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+"""
+Caché binaria columnar del DataFrame preprocesado
+Guarda cada columna como un archivo .npy (mapeable en memoria) dentro de un
+directorio identificado por el hash del CSV de origen, de modo que los
+arranques posteriores no necesiten volver a parsear el CSV.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+CACHE_DIR = 'cache'
+# Incrementar cuando cambie el preprocesamiento para invalidar cachés antiguas
+CACHE_VERSION = 2
+META_FILE = 'meta.json'
+STAMP_FILE = 'source.json'
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """Calcula el hash SHA-256 de un archivo leyéndolo por bloques"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _source_key(source_path):
+    """
+    Obtiene la clave de caché del archivo de origen.
+    Reutiliza el hash guardado si el tamaño y la fecha de modificación no cambiaron.
+    """
+    stat = os.stat(source_path)
+    stamp_path = os.path.join(CACHE_DIR, STAMP_FILE)
+    stamp = {}
+    if os.path.exists(stamp_path):
+        try:
+            with open(stamp_path, encoding='utf-8') as f:
+                stamp = json.load(f)
+        except (OSError, ValueError):
+            stamp = {}
+
+    entry = stamp.get(os.path.abspath(source_path))
+    if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+        digest = entry['sha256']
+    else:
+        digest = file_hash(source_path)
+        stamp[os.path.abspath(source_path)] = {
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'sha256': digest
+        }
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_path = stamp_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(stamp, f)
+        os.replace(tmp_path, stamp_path)
+
+    return f"{digest[:16]}-v{CACHE_VERSION}"
+
+
+def _cache_prefix(source_path, table=None):
+    # Las tablas derivadas (p. ej. características) usan "<csv>.<tabla>-"
+    name = os.path.splitext(os.path.basename(source_path))[0]
+    return f"{name}.{table}-" if table else f"{name}-"
+
+
+def _cache_path(source_path, table=None):
+    return os.path.join(CACHE_DIR, _cache_prefix(source_path, table) + _source_key(source_path))
+
+
+def load_frame(source_path, table=None):
+    """
+    Carga el DataFrame desde la caché si existe para la versión actual del CSV.
+    Devuelve None si no hay caché válida.
+
+    Args:
+        source_path: CSV de origen (su hash identifica la caché)
+        table: Nombre de una tabla derivada del CSV; None para la tabla principal
+    """
+    if not os.path.exists(source_path):
+        return None
+
+    path = _cache_path(source_path, table)
+    meta_path = os.path.join(path, META_FILE)
+    if not os.path.exists(meta_path):
+        return None
+
+    try:
+        with open(meta_path, encoding='utf-8') as f:
+            meta = json.load(f)
+
+        columns = {}
+        for i, col in enumerate(meta['columns']):
+            values = np.load(os.path.join(path, f"{i}.npy"), mmap_mode='r')
+            if col['kind'] == 'object':
+                # Columnas de texto: códigos enteros + diccionario de valores.
+                # El código -1 (valor nulo) toma el último elemento, que es NaN
+                uniques = np.empty(len(col['categories']) + 1, dtype=object)
+                uniques[:-1] = col['categories']
+                uniques[-1] = np.nan
+                columns[col['name']] = uniques.take(values)
+            elif col['kind'] == 'category':
+                columns[col['name']] = pd.Categorical.from_codes(
+                    np.asarray(values), categories=col['categories'], ordered=col.get('ordered', False)
+                )
+            else:
+                columns[col['name']] = values
+
+        return pd.DataFrame(columns)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Caché inválida, se reconstruirá: {e}")
+        return None
+
+
+def save_frame(df, source_path, table=None):
+    """Guarda el DataFrame en la caché columnar asociada al CSV de origen"""
+    path = _cache_path(source_path, table)
+    tmp_path = path + '.tmp'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    meta = {'source': os.path.basename(source_path), 'rows': len(df), 'columns': []}
+    for i, name in enumerate(df.columns):
+        series = df[name]
+        col = {'name': name}
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            col['kind'] = 'category'
+            col['categories'] = series.cat.categories.tolist()
+            col['ordered'] = bool(series.cat.ordered)
+            values = series.cat.codes.to_numpy()
+        elif series.dtype == object or pd.api.types.is_string_dtype(series.dtype):
+            codes, uniques = pd.factorize(series)
+            col['kind'] = 'object'
+            col['categories'] = uniques.tolist()
+            values = codes.astype(np.int32)
+        else:
+            col['kind'] = 'array'
+            values = series.to_numpy()
+        np.save(os.path.join(tmp_path, f"{i}.npy"), values, allow_pickle=False)
+        meta['columns'].append(col)
+
+    with open(os.path.join(tmp_path, META_FILE), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+
+    # Reemplazar de forma atómica y eliminar cachés de versiones anteriores del CSV
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+    prefix = _cache_prefix(source_path, table)
+    for entry in os.listdir(CACHE_DIR):
+        entry_path = os.path.join(CACHE_DIR, entry)
+        if entry.startswith(prefix) and entry_path != path and os.path.isdir(entry_path):
+            shutil.rmtree(entry_path, ignore_errors=True)
+
+    print(f"Caché de datos guardada en: {path}")
+    return path
@@ -0,0 +1,295 @@
+"""
+Índice de transacciones por fecha para los filtros desde/hasta del dashboard
+Guarda las columnas que usa el dashboard ordenadas por Fecha, con sumas
+acumuladas de ingresos y cantidad. Un rango se ubica con dos búsquedas
+binarias: los totales salen de las sumas acumuladas y el resto de las
+métricas se calcula solo sobre las filas del rango, así que un rango corto
+no recorre las 500k transacciones. Los lotes nuevos se acumulan sin ordenar
+con update() y se mezclan con las filas ordenadas cuando son suficientes,
+así que ingerir un lote no copia toda la historia.
+"""
+
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+from aggregates import (MERGE_FRACTION, MERGE_MIN_ROWS, PRODUCT_KEYS, category_records, client_results,
+                        top_products_records)
+
+DATE_FORMAT = '%Y-%m-%d'
+# Multiplicador para combinar el hash de la factura con el cliente (Fibonacci, 64 bits)
+_MIX = np.uint64(0x9E3779B97F4A7C15)
+_EPOCH = date(1970, 1, 1)
+
+
+def parse_date_range(args):
+    """
+    Lee los parámetros desde y hasta (AAAA-MM-DD, ambos incluidos)
+
+    Returns:
+        (desde, hasta) en días desde 1970-01-01; None si no se indicó
+
+    Raises:
+        ValueError: Si alguna fecha no es válida o desde es posterior a hasta
+    """
+    bounds = []
+    for name in ('desde', 'hasta'):
+        value = args.get(name)
+        if not value:
+            bounds.append(None)
+            continue
+        try:
+            day = datetime.strptime(value, DATE_FORMAT).date()
+        except ValueError:
+            raise ValueError(f"Fecha no válida en {name}: {value}. Usa el formato AAAA-MM-DD")
+        bounds.append((day - _EPOCH).days)
+    desde, hasta = bounds
+    if desde is not None and hasta is not None and desde > hasta:
+        raise ValueError("La fecha desde no puede ser posterior a hasta")
+    return desde, hasta
+
+
+def _first_positions(keys):
+    """Posición de la primera aparición de cada clave distinta (con hash, sin ordenar)"""
+    return np.flatnonzero(~pd.Series(keys).duplicated().to_numpy())
+
+
+def _cumulative(values):
+    """Sumas acumuladas con un cero inicial: la suma de [lo, hi) es s[hi] - s[lo]"""
+    return np.concatenate([[0], np.cumsum(values)])
+
+
+class DateIndex:
+    """
+    Columnas del dashboard ordenadas por fecha, con códigos enteros para
+    productos, códigos de stock, categorías y clientes
+
+    Args:
+        df: DataFrame preprocesado con las transacciones
+    """
+
+    def __init__(self, df):
+        # Valor de cada código; los valores nuevos reciben el siguiente código
+        self._keys = {'producto': [], 'codigo': [], 'categoria': [], 'cliente': []}
+        self._codes = {name: {} for name in self._keys}
+        self._integer_quantity = df['Cantidad'].dtype.kind in 'iu'
+        self._client_dtype = df['IDCliente'].dtype
+        columns = self._rows(df)
+        order = np.argsort(columns['dia'], kind='stable')
+        self._publish({name: values[order] for name, values in columns.items()})
+
+    def _encode(self, name, frame):
+        """Código de cada fila de `frame` (-1 si tiene nulos); registra los valores nuevos"""
+        groups = frame.groupby(list(frame.columns), sort=False, observed=True).ngroup().to_numpy()
+        valid = ~np.isnan(groups)
+        groups = np.where(valid, groups, -1).astype(np.int64)
+        first = np.flatnonzero(valid)
+        first = first[_first_positions(groups[first])]
+
+        codes, keys = self._codes[name], self._keys[name]
+        lookup = np.full(len(first) + 1, -1, dtype=np.int32)
+        for group, value in zip(groups[first], frame.iloc[first].itertuples(index=False, name=None)):
+            key = value if len(value) > 1 else value[0]
+            code = codes.get(key)
+            if code is None:
+                code = codes[key] = len(keys)
+                keys.append(key)
+            lookup[group] = code
+        # El grupo -1 (filas con nulos) toma el último elemento, que queda en -1
+        return lookup[groups]
+
+    def _rows(self, df):
+        """Columnas del índice para las filas con fecha, en el orden de `df`"""
+        fechas = pd.to_datetime(df['Fecha'])
+        valid = fechas.notna().to_numpy()
+        if not valid.all():
+            df, fechas = df[valid], fechas[valid]
+
+        invoices = pd.Categorical(df['NumeroFactura']).remove_unused_categories()
+        invoice_hashes = pd.util.hash_array(invoices.categories.astype(str).to_numpy(dtype=object))
+        return {
+            'dia': fechas.to_numpy(dtype='datetime64[D]').astype(np.int32),
+            'producto': self._encode('producto', df[PRODUCT_KEYS]),
+            'codigo': self._encode('codigo', df[['CodigoStock']]),
+            'categoria': self._encode('categoria', df[['Categoria']]),
+            'cliente': self._encode('cliente', df[['IDCliente']]),
+            # Hash del número de factura para contar compras distintas (0 = sin factura)
+            'factura': np.append(invoice_hashes, np.uint64(0))[invoices.codes],
+            'ingresos': df['Ingresos'].to_numpy(dtype=float),
+            'cantidad': df['Cantidad'].to_numpy(dtype=float),
+            'precio': df['PrecioUnitario'].to_numpy(dtype=float)
+        }
+
+    def _publish(self, columns):
+        """
+        Calcula las sumas acumuladas y publica columnas, sumas y filas
+        pendientes (ninguna) en una sola asignación
+        """
+        ingresos = columns['ingresos']
+        prefix = {
+            'ingresos': _cumulative(np.nan_to_num(ingresos)),
+            'ingresos_conteo': _cumulative(~np.isnan(ingresos)),
+            'cantidad': _cumulative(np.nan_to_num(columns['cantidad']))
+        }
+        self._view = (columns, prefix, {name: values[:0] for name, values in columns.items()})
+
+    def update(self, batch):
+        """
+        Agrega un lote de transacciones nuevas (ya preprocesadas) a las filas
+        pendientes; el costo depende del lote, no de la historia. Cuando las
+        pendientes superan el umbral se insertan en su posición por fecha,
+        después de las filas existentes del mismo día.
+        """
+        self._integer_quantity = self._integer_quantity and batch['Cantidad'].dtype.kind in 'iu'
+        rows = self._rows(batch)
+        columns, prefix, pending = self._view
+        pending = {name: np.concatenate([pending[name], rows[name]]) for name in columns}
+        if len(pending['dia']) < max(MERGE_MIN_ROWS, MERGE_FRACTION * len(columns['dia'])):
+            self._view = (columns, prefix, pending)
+            return
+        order = np.argsort(pending['dia'], kind='stable')
+        at = np.searchsorted(columns['dia'], pending['dia'][order], side='right')
+        self._publish({name: np.insert(values, at, pending[name][order]) for name, values in columns.items()})
+
+    def _range(self, desde, hasta):
+        """
+        Filas del rango [desde, hasta] (un corte de las ordenadas más las
+        pendientes del rango) y totales de ingresos, ingresos con valor y cantidad
+        """
+        columns, prefix, pending = self._view
+        days = columns['dia']
+        lo = 0 if desde is None else int(np.searchsorted(days, desde, side='left'))
+        hi = max(len(days) if hasta is None else int(np.searchsorted(days, hasta, side='right')), lo)
+        rows = {name: values[lo:hi] for name, values in columns.items()}
+        totals = {name: values[hi] - values[lo] for name, values in prefix.items()}
+        if len(pending['dia']):
+            selected = np.ones(len(pending['dia']), dtype=bool)
+            if desde is not None:
+                selected &= pending['dia'] >= desde
+            if hasta is not None:
+                selected &= pending['dia'] <= hasta
+            extra = {name: values[selected] for name, values in pending.items()}
+            rows = {name: np.concatenate([rows[name], extra[name]]) for name in rows}
+            totals['ingresos'] += np.nansum(extra['ingresos'])
+            totals['ingresos_conteo'] += np.count_nonzero(~np.isnan(extra['ingresos']))
+            totals['cantidad'] += np.nansum(extra['cantidad'])
+        return rows, totals
+
+    def _quantity(self, value):
+        return int(round(value)) if self._integer_quantity else float(value)
+
+    def stats(self, desde=None, hasta=None):
+        """Estadísticas generales del rango (mismo formato que /api/dashboard/stats)"""
+        rows, totals = self._range(desde, hasta)
+        ventas = float(totals['ingresos'])
+        conteo = int(totals['ingresos_conteo'])
+        ingresos = rows['ingresos']
+        ingresos = ingresos[~np.isnan(ingresos)]
+        codigos = rows['codigo']
+        categorias = rows['categoria']
+        return {
+            'total_ventas': int(ventas),
+            'total_productos': int(totals['cantidad']),
+            'total_transacciones': len(rows['dia']),
+            'productos_unicos': int(np.count_nonzero(np.bincount(codigos[codigos >= 0]))),
+            'categorias_unicas': int(np.count_nonzero(np.bincount(categorias[categorias >= 0]))),
+            # Sin ventas en el rango: null en lugar de NaN (que no es JSON válido)
+            'ingreso_promedio': ventas / conteo if conteo else None,
+            'ingreso_mediano': float(np.median(ingresos)) if len(ingresos) else None
+        }
+
+    def top_products(self, desde=None, hasta=None):
+        """Productos más rentables del rango"""
+        rows, _ = self._range(desde, hasta)
+        products = rows['producto']
+        valid = products >= 0
+        products = products[valid]
+        n = len(self._keys['producto'])
+        precio = rows['precio'][valid]
+        priced = ~np.isnan(precio)
+
+        present = np.flatnonzero(np.bincount(products, minlength=n))
+        table = pd.DataFrame([self._keys['producto'][i] for i in present], columns=PRODUCT_KEYS)
+        table['Ingresos'] = np.bincount(
+            products, weights=np.nan_to_num(rows['ingresos'][valid]), minlength=n
+        )[present]
+        cantidad = np.bincount(products, weights=np.nan_to_num(rows['cantidad'][valid]), minlength=n)
+        table['Cantidad'] = [self._quantity(value) for value in cantidad[present]]
+        table['Precio_Suma'] = np.bincount(products[priced], weights=precio[priced], minlength=n)[present]
+        table['Precio_Conteo'] = np.bincount(products[priced], minlength=n)[present]
+        return top_products_records(table)
+
+    def categories(self, desde=None, hasta=None):
+        """Ingresos, cantidad vendida y productos distintos por categoría en el rango"""
+        rows, _ = self._range(desde, hasta)
+        categories = rows['categoria']
+        codigos = rows['codigo']
+        valid = categories >= 0
+        n = len(self._keys['categoria'])
+
+        ingresos = np.bincount(categories[valid], weights=np.nan_to_num(rows['ingresos'][valid]), minlength=n)
+        cantidad = np.bincount(categories[valid], weights=np.nan_to_num(rows['cantidad'][valid]), minlength=n)
+        # Pares (categoría, código de stock) distintos
+        paired = valid & (codigos >= 0)
+        pairs = categories[paired].astype(np.int64) * len(self._keys['codigo']) + codigos[paired]
+        productos = np.bincount(categories[paired][_first_positions(pairs)], minlength=n)
+
+        present = np.flatnonzero(np.bincount(categories[valid], minlength=n))
+        table = pd.DataFrame({
+            'Ingresos': ingresos[present],
+            'Cantidad_Vendida': [self._quantity(value) for value in cantidad[present]],
+            'Productos_Unicos': productos[present]
+        }, index=pd.Index([self._keys['categoria'][i] for i in present], dtype=object))
+        return category_records(table)
+
+    def clients(self, desde=None, hasta=None):
+        """
+        Top de clientes y listado de clientes del rango
+
+        Returns:
+            (lista de los clientes más frecuentes, Listing de clientes)
+        """
+        rows, _ = self._range(desde, hasta)
+        clients = rows['cliente']
+        valid = clients >= 0
+        n = len(self._keys['cliente'])
+        ingresos = np.bincount(clients[valid], weights=np.nan_to_num(rows['ingresos'][valid]), minlength=n)
+        cantidad = np.bincount(clients[valid], weights=np.nan_to_num(rows['cantidad'][valid]), minlength=n)
+
+        # Compras (facturas) y productos distintos por cliente
+        facturas = rows['factura']
+        invoiced = valid & (facturas != 0)
+        keys = facturas[invoiced] ^ (clients[invoiced].astype(np.uint64) * _MIX)
+        compras = np.bincount(clients[invoiced][_first_positions(keys)], minlength=n)
+        codigos = rows['codigo']
+        stocked = valid & (codigos >= 0)
+        keys = clients[stocked].astype(np.int64) * len(self._keys['codigo']) + codigos[stocked]
+        productos = np.bincount(clients[stocked][_first_positions(keys)], minlength=n)
+
+        present = np.flatnonzero(np.bincount(clients[valid], minlength=n))
+        ids = np.asarray(self._keys['cliente'], dtype=self._client_dtype)[present]
+        order = np.argsort(ids, kind='stable')
+        present = present[order]
+        table = pd.DataFrame({
+            'IDCliente': ids[order],
+            'Ingresos_Total': ingresos[present],
+            'Cantidad_Total': [self._quantity(value) for value in cantidad[present]],
+            'Num_Compras': compras[present],
+            'Productos_Unicos': productos[present]
+        })
+        return client_results(table)
+
+    def results(self, section, desde=None, hasta=None):
+        """
+        Resultado de una sección del dashboard para el rango, con las mismas
+        claves que DashboardAggregates.results()
+        """
+        if section == 'stats':
+            return self.stats(desde, hasta)
+        if section == 'top_products':
+            return self.top_products(desde, hasta)
+        if section == 'categories':
+            return self.categories(desde, hasta)
+        top_clients, clients_list = self.clients(desde, hasta)
+        return top_clients if section == 'top_clients' else clients_list
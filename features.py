@@ -0,0 +1,129 @@
+"""
+Tablas de características por producto y por cliente
+Se calculan con una sola agregación por entidad y contienen las columnas que
+usan todos los tipos de clustering, así que entrenar varios tipos no vuelve
+a recorrer la tabla de transacciones. Se guardan en la caché columnar junto
+al dataset preprocesado.
+"""
+
+import numpy as np
+import pandas as pd
+
+from aggregates import PRODUCT_KEYS
+from data_cache import load_frame, save_frame
+
+PRODUCT_FEATURES_TABLE = 'productos'
+CLIENT_FEATURES_TABLE = 'clientes'
+# Columnas que usa cada tipo de clustering (las de rentabilidad las agrega cluster_features)
+CLUSTER_FEATURE_COLUMNS = {
+    'productos': ['Ingresos_Total', 'Ingresos_Promedio', 'Cantidad_Total', 'Cantidad_Promedio',
+                  'Precio_Promedio', 'Clientes_Unicos'],
+    'rentabilidad': ['Rentabilidad_Total', 'Rentabilidad_Promedio', 'Rentabilidad_Estabilidad', 'ROI'],
+    'cantidad': ['Cantidad_Total', 'Cantidad_Promedio', 'Cantidad_Std', 'Cantidad_Max'],
+    'clientes': ['Ingresos_Total', 'Num_Transacciones', 'Cantidad_Total',
+                 'Productos_Unicos', 'Frecuencia_Compra', 'Valor_Promedio_Transaccion']
+}
+
+
+def compute_product_features(df):
+    """Métricas por producto usadas por los clustering de productos, rentabilidad y cantidad"""
+    return df.groupby(PRODUCT_KEYS, observed=True).agg(
+        Ingresos_Total=('Ingresos', 'sum'),
+        Ingresos_Promedio=('Ingresos', 'mean'),
+        Ingresos_Std=('Ingresos', 'std'),
+        Cantidad_Total=('Cantidad', 'sum'),
+        Cantidad_Promedio=('Cantidad', 'mean'),
+        Cantidad_Std=('Cantidad', 'std'),
+        Cantidad_Max=('Cantidad', 'max'),
+        Precio_Promedio=('PrecioUnitario', 'mean'),
+        Clientes_Unicos=('IDCliente', 'nunique')
+    ).reset_index()
+
+
+def compute_client_features(df):
+    """Métricas de comportamiento de compra por cliente"""
+    client_data = df.groupby('IDCliente').agg(
+        Ingresos_Total=('Ingresos', 'sum'),
+        Ingresos_Promedio=('Ingresos', 'mean'),
+        Num_Transacciones=('Ingresos', 'count'),
+        Cantidad_Total=('Cantidad', 'sum'),
+        Cantidad_Promedio=('Cantidad', 'mean'),
+        Precio_Promedio=('PrecioUnitario', 'mean'),
+        Productos_Unicos=('CodigoStock', 'nunique'),
+        Categorias_Unicas=('Categoria', 'nunique'),
+        Primera_Compra=('Fecha', 'min'),
+        Ultima_Compra=('Fecha', 'max')
+    ).reset_index()
+
+    # Calcular días desde primera compra
+    client_data['Primera_Compra'] = pd.to_datetime(client_data['Primera_Compra'])
+    client_data['Ultima_Compra'] = pd.to_datetime(client_data['Ultima_Compra'])
+    client_data['Dias_Activo'] = (client_data['Ultima_Compra'] - client_data['Primera_Compra']).dt.days
+    client_data['Dias_Activo'] = client_data['Dias_Activo'].fillna(0)
+
+    # Calcular frecuencia de compra
+    client_data['Frecuencia_Compra'] = np.where(
+        client_data['Dias_Activo'] > 0,
+        client_data['Num_Transacciones'] / (client_data['Dias_Activo'] + 1),
+        client_data['Num_Transacciones']
+    )
+
+    # Calcular valor promedio por transacción
+    client_data['Valor_Promedio_Transaccion'] = client_data['Ingresos_Total'] / client_data['Num_Transacciones']
+    client_data['Valor_Promedio_Transaccion'] = client_data['Valor_Promedio_Transaccion'].fillna(0)
+    return client_data
+
+
+def cluster_features(data, cluster_type):
+    """
+    Matriz de características de un tipo de clustering, la misma al entrenar
+    y al asignar clusters en línea
+
+    Args:
+        data: Tabla de características de productos o de clientes; con
+            'rentabilidad' se le agregan las columnas Rentabilidad_* y ROI
+        cluster_type: 'productos', 'rentabilidad', 'cantidad' o 'clientes'
+
+    Raises:
+        ValueError: Si el tipo de clustering no es válido
+    """
+    if cluster_type not in CLUSTER_FEATURE_COLUMNS:
+        raise ValueError(f"Tipo de clustering no válido: {cluster_type}")
+
+    if cluster_type == 'rentabilidad':
+        # Calcular métricas de rentabilidad
+        data['Rentabilidad_Total'] = data['Ingresos_Total']
+        data['Rentabilidad_Promedio'] = data['Ingresos_Promedio']
+        data['Rentabilidad_Estabilidad'] = data['Ingresos_Std'].fillna(0)
+
+        # Calcular ROI con protección contra división por cero
+        denominator = data['Cantidad_Total'] * data['Precio_Promedio']
+        data['ROI'] = np.where(denominator != 0, data['Ingresos_Total'] / denominator, 0)
+        # Reemplazar cualquier infinito o NaN que pueda quedar
+        data['ROI'] = data['ROI'].replace([np.inf, -np.inf], 0).fillna(0)
+
+    # Reemplazar NaN e infinitos con valores finitos
+    return data[CLUSTER_FEATURE_COLUMNS[cluster_type]].fillna(0).replace([np.inf, -np.inf], 0)
+
+
+def load_feature_tables(df, source_path=None):
+    """
+    Devuelve las tablas de características {'productos': ..., 'clientes': ...}
+
+    Args:
+        df: DataFrame preprocesado con las transacciones
+        source_path: CSV de origen de df; si se indica, las tablas se leen y
+            guardan en la caché (solo cuando df corresponde exactamente al CSV)
+    """
+    tables = {}
+    for table, compute in ((PRODUCT_FEATURES_TABLE, compute_product_features),
+                           (CLIENT_FEATURES_TABLE, compute_client_features)):
+        frame = load_frame(source_path, table=table) if source_path else None
+        if frame is None:
+            frame = compute(df)
+            if source_path:
+                save_frame(frame, source_path, table=table)
+        else:
+            print(f"Características de {table} cargadas desde caché ({len(frame)} filas)")
+        tables[table] = frame
+    return tables
@@ -0,0 +1,209 @@
+"""
+Generador de datasets sintéticos con el esquema del CSV del supermercado
+Escribe CSVs reproducibles (misma semilla, mismo archivo) de cualquier tamaño,
+por bloques, para medir el rendimiento con 100k, 1M o 10M filas.
+
+Uso:
+    python generate_data.py --filas 1M
+    python generate_data.py --filas 10M --salida datos/supermercado_10M.csv --semilla 7
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from schema import USED_COLUMNS
+
+DATA_DIR = 'datos'
+# Filas por bloque escrito; fijo para que el archivo no dependa de la memoria disponible
+BLOCK_ROWS = 200_000
+START_DATE = '2023-01-01'
+DAYS = 730
+# Productos por categoría: (categoría, nombre en inglés, nombre en español)
+CATEGORIES = [
+    ('Bebidas', 'DRINK', 'BEBIDA'),
+    ('Lácteos', 'DAIRY', 'LÁCTEO'),
+    ('Panadería', 'BREAD', 'PAN'),
+    ('Carnes', 'MEAT', 'CARNE'),
+    ('Frutas y Verduras', 'PRODUCE', 'FRUTA/VERDURA'),
+    ('Limpieza', 'CLEANER', 'LIMPIADOR'),
+    ('Cuidado Personal', 'PERSONAL CARE', 'CUIDADO PERSONAL'),
+    ('Snacks', 'SNACK', 'SNACK'),
+    ('Congelados', 'FROZEN', 'CONGELADO'),
+    ('Despensa', 'PANTRY', 'DESPENSA')
+]
+VARIANTS_EN = ['SMALL', 'LARGE', 'CLASSIC', 'LIGHT', 'FAMILY', 'PREMIUM', 'ORGANIC', 'VALUE']
+VARIANTS_ES = ['PEQUEÑO', 'GRANDE', 'CLÁSICO', 'LIGERO', 'FAMILIAR', 'PREMIUM', 'ORGÁNICO', 'ECONÓMICO']
+# Horas de apertura y peso relativo de cada una (más ventas al mediodía y por la tarde)
+HOURS = np.arange(7, 22)
+HOUR_WEIGHTS = np.array([1, 2, 3, 4, 5, 7, 7, 5, 4, 4, 5, 7, 6, 4, 2], dtype=float)
+
+
+def parse_rows(value):
+    """Convierte '100k', '1M', '2.5M' o '500000' en un número de filas"""
+    text = str(value).strip().lower().replace('_', '')
+    factor = 1
+    if text.endswith('k'):
+        factor, text = 1_000, text[:-1]
+    elif text.endswith('m'):
+        factor, text = 1_000_000, text[:-1]
+    try:
+        rows = int(float(text) * factor)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Número de filas no válido: {value}")
+    if rows <= 0:
+        raise argparse.ArgumentTypeError(f"El número de filas debe ser positivo: {value}")
+    return rows
+
+
+def format_rows(rows):
+    """Etiqueta corta del tamaño (100k, 1M, 10M) para nombres de archivo"""
+    if rows % 1_000_000 == 0:
+        return f"{rows // 1_000_000}M"
+    if rows % 1_000 == 0:
+        return f"{rows // 1_000}k"
+    return str(rows)
+
+
+def build_catalog(rng, n_products):
+    """
+    Catálogo de productos: código, descripciones, categoría, precio base y
+    popularidad (tipo Zipf: pocos productos concentran la mayoría de las ventas)
+    """
+    category = rng.integers(0, len(CATEGORIES), n_products)
+    variant = rng.integers(0, len(VARIANTS_EN), n_products)
+    ids = np.arange(n_products)
+    suffix = np.array(list('ABCDEFGH'))[ids % 8]
+
+    popularity = 1.0 / np.arange(1, n_products + 1) ** 0.9
+    popularity = rng.permutation(popularity)
+    return pd.DataFrame({
+        'CodigoStock': [f"{10000 + i}{s}" for i, s in zip(ids, suffix)],
+        'Descripcion_Ingles': [f"{CATEGORIES[c][1]} {VARIANTS_EN[v]} {i}" for i, c, v in zip(ids, category, variant)],
+        'Descripcion_Español': [f"{CATEGORIES[c][2]} {VARIANTS_ES[v]} {i}" for i, c, v in zip(ids, category, variant)],
+        'Categoria': [CATEGORIES[c][0] for c in category],
+        'Precio': np.round(rng.lognormal(mean=1.0, sigma=0.8, size=n_products) + 0.2, 2),
+        'Peso': popularity / popularity.sum()
+    })
+
+
+def generate_block(rng, catalog, client_weights, n_rows, first_invoice, missing_clients):
+    """
+    Genera n_rows transacciones agrupadas en facturas (mismo cliente, fecha y
+    hora en todas las líneas de una factura)
+
+    Returns:
+        (DataFrame con las columnas de USED_COLUMNS, número de la siguiente factura)
+    """
+    # Líneas por factura: geométrica con media ~8; se recorta la última al tamaño del bloque
+    lines = rng.geometric(1 / 8, size=n_rows // 4 + 16)
+    ends = np.cumsum(lines)
+    n_invoices = int(np.searchsorted(ends, n_rows) + 1)
+    lines = lines[:n_invoices]
+    lines[-1] -= ends[n_invoices - 1] - n_rows
+    invoice = np.repeat(np.arange(n_invoices), lines)
+
+    # Atributos por factura
+    clients = rng.choice(len(client_weights), size=n_invoices, p=client_weights).astype(float) + 12000
+    clients[rng.random(n_invoices) < missing_clients] = np.nan
+    days = rng.integers(0, DAYS, n_invoices)
+    hours = rng.choice(HOURS, size=n_invoices, p=HOUR_WEIGHTS / HOUR_WEIGHTS.sum())
+
+    # Atributos por línea
+    product = rng.choice(len(catalog), size=n_rows, p=catalog['Peso'].to_numpy())
+    quantity = np.minimum(rng.geometric(0.35, size=n_rows), 48)
+    # Los pedidos grandes (mayoristas) son poco frecuentes
+    bulk = rng.random(n_rows) < 0.02
+    quantity[bulk] *= rng.integers(5, 25, bulk.sum())
+    price = np.round(catalog['Precio'].to_numpy()[product] * rng.uniform(0.9, 1.1, n_rows), 2)
+    dates = pd.Timestamp(START_DATE) + pd.to_timedelta(days[invoice], unit='D')
+
+    items = catalog.iloc[product]
+    block = pd.DataFrame({
+        'NumeroFactura': (first_invoice + invoice).astype(str),
+        'CodigoStock': items['CodigoStock'].to_numpy(),
+        'Descripcion_Ingles': items['Descripcion_Ingles'].to_numpy(),
+        'Descripcion_Español': items['Descripcion_Español'].to_numpy(),
+        'Cantidad': quantity,
+        'Fecha': dates.strftime('%d/%m/%Y'),
+        'PrecioUnitario': price,
+        'IDCliente': clients[invoice],
+        'Categoria': items['Categoria'].to_numpy(),
+        'Hora_24h': hours[invoice]
+    })
+    return block[USED_COLUMNS], first_invoice + n_invoices
+
+
+def generate_dataset(path, n_rows, n_products=4000, n_clients=None, seed=42, missing_clients=0.0):
+    """
+    Escribe un CSV sintético de n_rows filas por bloques (reemplazo atómico)
+
+    Args:
+        path: Ruta del CSV de salida
+        n_rows: Número de transacciones
+        n_products: Tamaño del catálogo de productos
+        n_clients: Número de clientes (por defecto uno por cada 100 filas, mínimo 500)
+        seed: Semilla; la misma semilla y los mismos parámetros generan el mismo archivo
+        missing_clients: Fracción de facturas sin IDCliente
+
+    Returns:
+        Ruta del CSV escrito
+    """
+    if n_clients is None:
+        n_clients = max(n_rows // 100, 500)
+    start = time.perf_counter()
+    seeds = np.random.SeedSequence(seed)
+    catalog_rng = np.random.default_rng(seeds.spawn(1)[0])
+    catalog = build_catalog(catalog_rng, n_products)
+    # Clientes con actividad desigual (Pareto): pocos concentran muchas facturas
+    client_weights = catalog_rng.pareto(1.5, n_clients) + 1
+    client_weights /= client_weights.sum()
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = path + '.tmp'
+    invoice = 500000
+    n_blocks = (n_rows + BLOCK_ROWS - 1) // BLOCK_ROWS
+    # Una semilla independiente por bloque: el contenido no depende del orden de escritura
+    block_seeds = seeds.spawn(n_blocks)
+    with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+        for i in range(n_blocks):
+            rows = min(BLOCK_ROWS, n_rows - i * BLOCK_ROWS)
+            block, invoice = generate_block(
+                np.random.default_rng(block_seeds[i]), catalog, client_weights, rows, invoice, missing_clients
+            )
+            block.to_csv(f, index=False, header=(i == 0), float_format='%.15g')
+            print(f"  Bloque {i + 1}/{n_blocks}: {min((i + 1) * BLOCK_ROWS, n_rows):,} filas")
+    os.replace(tmp_path, path)
+
+    size_mb = os.path.getsize(path) / (1024 * 1024)
+    print(f"✓ {n_rows:,} filas ({n_products} productos, {n_clients} clientes) escritas en {path} "
+          f"({size_mb:.1f} MB, {time.perf_counter() - start:.1f} s)")
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Genera un CSV sintético con el esquema del supermercado')
+    parser.add_argument('--filas', type=parse_rows, default=parse_rows('100k'),
+                        help='Número de filas, admite k y M: 100k, 1M, 10M (default: 100k)')
+    parser.add_argument('--salida', type=str, default=None,
+                        help=f'Ruta del CSV (default: {DATA_DIR}/supermercado_<filas>.csv)')
+    parser.add_argument('--productos', type=int, default=4000, help='Productos del catálogo (default: 4000)')
+    parser.add_argument('--clientes', type=int, default=None,
+                        help='Clientes distintos (default: filas/100, mínimo 500)')
+    parser.add_argument('--sin-cliente', type=float, default=0.0,
+                        help='Fracción de facturas sin IDCliente (default: 0)')
+    parser.add_argument('--semilla', type=int, default=42, help='Semilla aleatoria (default: 42)')
+    args = parser.parse_args()
+
+    path = args.salida or os.path.join(DATA_DIR, f"supermercado_{format_rows(args.filas)}.csv")
+    generate_dataset(path, args.filas, n_products=args.productos, n_clients=args.clientes,
+                     seed=args.semilla, missing_clients=args.sin_cliente)
+
+
+if __name__ == '__main__':
+    main()
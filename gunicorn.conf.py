@@ -0,0 +1,27 @@
+"""
+Configuración de gunicorn para producción
+
+Variables de entorno:
+    PORT: Puerto de escucha (default: 5000)
+    WEB_CONCURRENCY: Número de procesos worker (default: núcleos disponibles)
+    GUNICORN_THREADS: Hilos por worker (default: 2)
+    GUNICORN_TIMEOUT: Segundos antes de reiniciar un worker bloqueado (default: 120)
+"""
+
+import multiprocessing
+import os
+
+wsgi_app = 'wsgi:app'
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+threads = int(os.environ.get('GUNICORN_THREADS', 2))
+worker_class = 'gthread' if threads > 1 else 'sync'
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+
+# Cargar la aplicación (datos y modelos) en el maestro antes de hacer fork,
+# así los workers comparten las páginas de memoria copy-on-write
+preload_app = True
+
+accesslog = '-'
+errorlog = '-'
@@ -0,0 +1,328 @@
+"""
+Índices en memoria sobre la tabla de transacciones
+Se construyen una vez al cargar los datos para que las búsquedas por
+cliente o producto no recorran todas las filas en cada petición. Guardan
+sumas y conteos, así que un lote de transacciones nuevas se incorpora con
+update() sin recalcular desde cero.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Acumuladores por cliente: (columna, suma, conteo de valores no nulos)
+_CLIENT_SUMS = [('Ingresos', 'ingresos_suma', 'ingresos_conteo'),
+                ('Cantidad', 'cantidad_suma', 'cantidad_conteo'),
+                ('PrecioUnitario', 'precio_suma', 'precio_conteo')]
+
+
+class ClientIndex:
+    """
+    Índice por IDCliente: filas ordenadas por cliente + arreglo de offsets,
+    junto con las métricas de cada cliente ya calculadas.
+    """
+
+    def __init__(self, df):
+        df = df[df['IDCliente'].notna()]
+        ids = df['IDCliente'].to_numpy()
+        self._ids = np.unique(ids)
+        self._build_order(ids)
+
+        grouped = df.groupby('IDCliente')
+        acc = grouped.agg(
+            total_compras=('Ingresos', 'size'),
+            ingresos_suma=('Ingresos', 'sum'),
+            ingresos_conteo=('Ingresos', 'count'),
+            cantidad_suma=('Cantidad', 'sum'),
+            cantidad_conteo=('Cantidad', 'count'),
+            precio_suma=('PrecioUnitario', 'sum'),
+            precio_conteo=('PrecioUnitario', 'count'),
+            num_compras=('NumeroFactura', 'nunique'),
+            productos_unicos=('CodigoStock', 'nunique')
+        ).reindex(self._ids)
+        self._acc = {col: acc[col].to_numpy(copy=True) for col in acc.columns}
+
+        # Pares ya vistos para contar facturas y productos distintos por cliente
+        self._invoices = set(_pairs(df, 'NumeroFactura'))
+        self._products = set(_pairs(df, 'CodigoStock'))
+
+        # Transacciones por cliente (filas) y categoría (columnas)
+        counts = df.groupby(['IDCliente', 'Categoria'], observed=True).size().unstack(fill_value=0)
+        counts = counts.reindex(self._ids, fill_value=0)
+        self._categories = [str(c) for c in counts.columns]
+        self._category_counts = counts.to_numpy(dtype=np.int64, copy=True)
+
+        self._publish()
+
+    def _build_order(self, ids):
+        # Orden estable para conservar el orden original dentro de cada cliente
+        self._order = np.argsort(ids, kind='stable')
+        self._offsets = np.append(np.searchsorted(ids[self._order], self._ids), len(ids))
+
+    def _publish(self):
+        """Calcula las métricas y las publica junto con los IDs en un solo paso"""
+        acc = self._acc
+        with np.errstate(invalid='ignore', divide='ignore'):
+            summary = {
+                'total_compras': acc['total_compras'].copy(),
+                'ingresos_totales': acc['ingresos_suma'].copy(),
+                'cantidad_total': acc['cantidad_suma'].copy(),
+                'productos_unicos': acc['productos_unicos'].copy(),
+                'categorias_unicas': (self._category_counts > 0).sum(axis=1),
+                'precio_promedio': acc['precio_suma'] / acc['precio_conteo'],
+                'ingreso_promedio': acc['ingresos_suma'] / acc['ingresos_conteo'],
+                'cantidad_promedio': acc['cantidad_suma'] / acc['cantidad_conteo'],
+                'num_compras': acc['num_compras'].copy()
+            }
+
+        # Categoría más común (moda); en caso de empate la menor alfabéticamente
+        if self._categories:
+            alphabetical = np.argsort(np.array(self._categories, dtype=object), kind='stable')
+            counts = self._category_counts[:, alphabetical]
+            names = np.array(self._categories, dtype=object)[alphabetical]
+            mode = names[np.argmax(counts, axis=1)]
+            mode[counts.max(axis=1) == 0] = np.nan
+        else:
+            mode = np.full(len(self._ids), np.nan, dtype=object)
+        summary['categoria_mas_comun'] = mode
+
+        # Una sola asignación: los lectores ven IDs y métricas de la misma versión
+        self._view = (self._ids.copy(), summary)
+
+    @property
+    def ids(self):
+        return self._view[0]
+
+    @property
+    def summary(self):
+        return self._view[1]
+
+    def _position(self, client_id):
+        ids = self.ids
+        pos = np.searchsorted(ids, client_id)
+        if pos < len(ids) and ids[pos] == client_id:
+            return pos
+        return None
+
+    def locate(self, client_ids):
+        """
+        Posición de cada cliente (-1 si no existe) y las métricas de la
+        misma versión del índice, vectorizado
+        """
+        ids, summary = self._view
+        client_ids = np.asarray(client_ids)
+        if len(ids) == 0:
+            return np.full(len(client_ids), -1), summary
+        pos = np.searchsorted(ids, client_ids)
+        pos_clipped = np.minimum(pos, len(ids) - 1)
+        found = (pos < len(ids)) & (ids[pos_clipped] == client_ids)
+        return np.where(found, pos_clipped, -1), summary
+
+    def positions(self, client_ids):
+        """Posición de cada cliente en el índice (-1 si no existe), vectorizado"""
+        return self.locate(client_ids)[0]
+
+    def __contains__(self, client_id):
+        return self._position(client_id) is not None
+
+    def rows(self, df, client_id):
+        """Devuelve las transacciones del cliente (vacío si no existe)"""
+        if self._order is None:
+            # Tras una ingesta el orden de filas se reconstruye solo si se pide
+            ids = df['IDCliente'].to_numpy()
+            order = np.argsort(ids, kind='stable')
+            sorted_ids = ids[order]
+            self._offsets = np.append(np.searchsorted(sorted_ids, self._ids), len(ids))
+            self._order = order
+        pos = self._position(client_id)
+        if pos is None:
+            return df.iloc[0:0]
+        return df.iloc[self._order[self._offsets[pos]:self._offsets[pos + 1]]]
+
+    def metrics(self, client_id):
+        """Devuelve las métricas precalculadas del cliente o None si no existe"""
+        ids, summary = self._view
+        pos = np.searchsorted(ids, client_id)
+        if pos >= len(ids) or ids[pos] != client_id:
+            return None
+        return {col: values[pos] for col, values in summary.items()}
+
+    def table(self):
+        """Métricas por cliente usadas por el top de clientes y la lista de clientes"""
+        ids, summary = self._view
+        return pd.DataFrame({
+            'IDCliente': ids,
+            'Ingresos_Total': summary['ingresos_totales'],
+            'Cantidad_Total': summary['cantidad_total'],
+            'Num_Compras': summary['num_compras'],
+            'Productos_Unicos': summary['productos_unicos']
+        })
+
+    def update(self, batch):
+        """
+        Incorpora un lote de transacciones nuevas (ya preprocesadas).
+        No es seguro llamarlo desde varios hilos a la vez; las lecturas sí.
+        """
+        batch = batch[batch['IDCliente'].notna()]
+        if batch.empty:
+            return
+        batch_ids = batch['IDCliente'].to_numpy()
+
+        # Insertar los clientes nuevos manteniendo los IDs ordenados
+        new_ids = np.setdiff1d(np.unique(batch_ids), self._ids)
+        if len(new_ids):
+            at = np.searchsorted(self._ids, new_ids)
+            self._ids = np.insert(self._ids, at, new_ids.astype(self._ids.dtype, copy=False))
+            for col, values in self._acc.items():
+                self._acc[col] = np.insert(values, at, 0)
+            self._category_counts = np.insert(self._category_counts, at, 0, axis=0)
+        pos = np.searchsorted(self._ids, batch_ids)
+
+        np.add.at(self._acc['total_compras'], pos, 1)
+        for column, suma, conteo in _CLIENT_SUMS:
+            values = batch[column].to_numpy(dtype=float)
+            valid = ~np.isnan(values)
+            if self._acc[suma].dtype.kind in 'iu' and not np.all(values[valid] == np.floor(values[valid])):
+                self._acc[suma] = self._acc[suma].astype(float)
+            np.add.at(self._acc[suma], pos[valid], values[valid].astype(self._acc[suma].dtype))
+            np.add.at(self._acc[conteo], pos[valid], 1)
+
+        for pairs, col, counter in ((self._invoices, 'NumeroFactura', 'num_compras'),
+                                    (self._products, 'CodigoStock', 'productos_unicos')):
+            for client_id, value in _pairs(batch, col):
+                if (client_id, value) not in pairs:
+                    pairs.add((client_id, value))
+                    self._acc[counter][np.searchsorted(self._ids, client_id)] += 1
+
+        categories = batch['Categoria'].to_numpy(dtype=object)
+        valid = pd.notna(categories)
+        for category in pd.unique(categories[valid]):
+            if str(category) not in self._categories:
+                self._categories.append(str(category))
+                self._category_counts = np.pad(self._category_counts, ((0, 0), (0, 1)))
+        column_of = {name: i for i, name in enumerate(self._categories)}
+        columns = np.array([column_of[str(c)] for c in categories[valid]], dtype=np.int64)
+        np.add.at(self._category_counts, (pos[valid], columns), 1)
+
+        self._order = None
+        self._offsets = None
+        self._publish()
+
+
+def _pairs(df, column):
+    """Pares (IDCliente, valor) distintos, sin valores nulos"""
+    pairs = df[['IDCliente', column]].dropna().drop_duplicates()
+    return zip(pairs['IDCliente'].tolist(), pairs[column].astype(object).tolist())
+
+
+class ProductIndex:
+    """
+    Índice de productos por descripción en inglés, descripción en español y
+    CodigoStock, con el precio promedio y la categoría de cada producto.
+    """
+
+    def __init__(self, df):
+        self.products = {}
+        # Claves que se indexan por CodigoStock (no coinciden con una descripción)
+        self._code_keys = set()
+        # Claves, precios y categorías en arreglos para buscar muchos productos a la vez
+        self._version = 0
+        self._table = None
+        self._add_rows(df)
+
+        prices = df['PrecioUnitario']
+        self._precio_suma = float(prices.sum())
+        self._precio_conteo = int(prices.count())
+        self.precio_promedio = float(prices.mean())
+
+    def _add_rows(self, df):
+        ingles = df['Descripcion_Ingles'].to_numpy(dtype=object)
+        espanol = df['Descripcion_Español'].to_numpy(dtype=object)
+        positions = np.arange(len(df))
+
+        # Cada fila cuenta una sola vez por clave aunque ambas descripciones coincidan
+        extra = espanol != ingles
+        rows = np.concatenate([positions, positions[extra]])
+        keys = np.concatenate([ingles, espanol[extra]])
+
+        self._add(keys, rows, df, by_code=False)
+        # Los códigos de stock solo se usan si no coinciden con una descripción
+        self._add(df['CodigoStock'].to_numpy(dtype=object), positions, df, by_code=True)
+
+    def _add(self, keys, rows, df, by_code):
+        prices = df['PrecioUnitario'].to_numpy()[rows]
+        stats = pd.DataFrame({'key': keys, 'row': rows, 'precio': prices}).groupby('key').agg(
+            suma=('precio', 'sum'),
+            conteo=('precio', 'count'),
+            row=('row', 'min')
+        )
+        # Categoría de la primera transacción del producto
+        categories = df['Categoria'].to_numpy(dtype=object)[stats['row'].to_numpy()]
+        for key, suma, conteo, categoria in zip(
+            stats.index, stats['suma'].to_numpy(), stats['conteo'].to_numpy(), categories
+        ):
+            entry = self.products.get(key)
+            if entry is None:
+                if by_code:
+                    self._code_keys.add(key)
+                self.products[key] = {
+                    'precio_promedio': suma / conteo if conteo else np.nan,
+                    'categoria': categoria,
+                    'suma': float(suma),
+                    'conteo': int(conteo)
+                }
+            elif not by_code or key in self._code_keys:
+                # Nueva entrada en lugar de modificar la existente (lecturas sin bloqueo)
+                suma = entry['suma'] + float(suma)
+                conteo = entry['conteo'] + int(conteo)
+                self.products[key] = {
+                    'precio_promedio': suma / conteo if conteo else entry['precio_promedio'],
+                    'categoria': entry['categoria'],
+                    'suma': suma,
+                    'conteo': conteo
+                }
+
+    def lookup(self, producto):
+        """Devuelve precio promedio y categoría del producto, o None si no existe"""
+        return self.products.get(producto)
+
+    def _arrays(self):
+        table = self._table
+        if table is None or table[0] != self._version:
+            version = self._version
+            # Copia en una sola operación: una ingesta puede estar agregando claves
+            products = self.products.copy()
+            table = (
+                version,
+                pd.Index(list(products), dtype=object),
+                np.array([entry['precio_promedio'] for entry in products.values()], dtype=float),
+                np.array([entry['categoria'] for entry in products.values()], dtype=object)
+            )
+            self._table = table
+        return table[1:]
+
+    def lookup_many(self, productos):
+        """
+        Busca varios productos con un solo get_indexer sobre las claves del índice
+
+        Returns:
+            (encontrado, precio promedio, categoría) por producto; precio NaN y
+            categoría None en los que no existen
+        """
+        keys, prices, categories = self._arrays()
+        positions = keys.get_indexer(pd.Index(productos, dtype=object))
+        found = positions >= 0
+        return (
+            found,
+            np.where(found, prices[positions], np.nan),
+            np.where(found, categories[positions], None)
+        )
+
+    def update(self, batch):
+        """Incorpora un lote de transacciones nuevas (ya preprocesadas)"""
+        self._add_rows(batch.reset_index(drop=True))
+        self._version += 1
+        prices = batch['PrecioUnitario']
+        self._precio_suma += float(prices.sum())
+        self._precio_conteo += int(prices.count())
+        if self._precio_conteo:
+            self.precio_promedio = self._precio_suma / self._precio_conteo
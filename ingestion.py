@@ -0,0 +1,171 @@
+"""
+Ingesta incremental de transacciones
+Prepara lotes de transacciones nuevas con el mismo preprocesamiento que la
+carga inicial y los envía a una instancia en ejecución (POST /api/ingest),
+sin volver a leer ni recalcular el CSV completo.
+
+Uso:
+    python ingestion.py nuevas.csv --url http://localhost:5000 --lote 5000 --persistir
+"""
+
+import argparse
+import csv
+import json
+import math
+import os
+import urllib.request
+
+import pandas as pd
+
+from schema import USED_COLUMNS
+
+# Columnas obligatorias en cada transacción nueva
+REQUIRED_COLUMNS = ['NumeroFactura', 'CodigoStock', 'Cantidad', 'PrecioUnitario', 'IDCliente', 'Categoria', 'Fecha']
+
+
+def prepare_batch(records, reference):
+    """
+    Convierte transacciones en el formato del CSV a un DataFrame preprocesado
+    con los mismos tipos que la tabla ya cargada
+
+    Args:
+        records: Lista de diccionarios (una transacción por elemento)
+        reference: DataFrame preprocesado en memoria
+
+    Returns:
+        DataFrame con Ingresos, Fecha, Mes y DiaSemana calculados
+
+    Raises:
+        ValueError: Si faltan columnas obligatorias o hay valores no válidos
+    """
+    batch = pd.DataFrame.from_records(records)
+    missing = [col for col in REQUIRED_COLUMNS if col not in batch.columns]
+    if missing:
+        raise ValueError(f"Faltan columnas obligatorias: {', '.join(missing)}")
+    batch = batch[[col for col in USED_COLUMNS if col in batch.columns]].copy()
+
+    for col in ('Descripcion_Ingles', 'Descripcion_Español'):
+        if col not in batch.columns:
+            batch[col] = batch['CodigoStock']
+    if 'Hora_24h' not in batch.columns:
+        batch['Hora_24h'] = 0
+
+    for col in ('Cantidad', 'PrecioUnitario', 'IDCliente', 'Hora_24h'):
+        batch[col] = pd.to_numeric(batch[col], errors='coerce')
+    if batch['IDCliente'].isna().any():
+        raise ValueError("IDCliente debe ser numérico en todas las transacciones")
+    batch['Fecha'] = pd.to_datetime(batch['Fecha'], format='%d/%m/%Y', errors='coerce')
+
+    # Rechazar el lote completo si alguna fecha, cantidad o precio no se pudo convertir
+    for col, expected in (('Fecha', 'una fecha dd/mm/aaaa'), ('Cantidad', 'numérico'), ('PrecioUnitario', 'numérico')):
+        invalid = batch.index[batch[col].isna()]
+        if len(invalid):
+            rows = ', '.join(str(i) for i in invalid[:20])
+            more = f" y {len(invalid) - 20} más" if len(invalid) > 20 else ''
+            raise ValueError(f"{col} debe ser {expected}; filas no válidas: {rows}{more}")
+
+    # Mismo preprocesamiento que la carga inicial
+    batch['Ingresos'] = batch['Cantidad'] * batch['PrecioUnitario']
+    batch['Mes'] = batch['Fecha'].dt.month
+    batch['DiaSemana'] = batch['Fecha'].dt.dayofweek
+
+    return align_types(batch, reference)
+
+
+def align_types(batch, reference):
+    """Convierte las columnas del lote a los tipos de la tabla en memoria"""
+    for col in batch.columns:
+        if col not in reference.columns:
+            continue
+        dtype = reference[col].dtype
+        if isinstance(dtype, pd.CategoricalDtype):
+            # Los valores nuevos deben ser del mismo tipo que las categorías existentes
+            if pd.api.types.is_numeric_dtype(dtype.categories.dtype):
+                batch[col] = _to_number(batch[col])
+            else:
+                batch[col] = batch[col].where(batch[col].isna(), batch[col].astype(str))
+        elif pd.api.types.is_integer_dtype(dtype) and not batch[col].isna().any():
+            batch[col] = batch[col].astype(dtype)
+    return batch
+
+
+def _to_number(series):
+    values = pd.to_numeric(series, errors='coerce')
+    # Con textos en el lote los números llegan como float: volver a enteros para
+    # que 500123 no se convierta en "500123.0" al calcular los hashes de factura
+    if pd.api.types.is_float_dtype(values) and (values.dropna() % 1 == 0).all():
+        values = values.astype('Int64')
+    # Conservar el texto original si no es un número (p. ej. facturas canceladas "C536379")
+    return series.where(values.isna(), values.astype(object))
+
+
+def concat_batches(df, batches):
+    """
+    Une los lotes ingeridos a la tabla en memoria conservando las columnas
+    categóricas (se agregan las categorías nuevas; los códigos no cambian)
+    """
+    frames = [df] + list(batches)
+    for col in df.columns:
+        dtype = df[col].dtype
+        if not isinstance(dtype, pd.CategoricalDtype):
+            continue
+        known = set(dtype.categories)
+        new = []
+        for batch in batches:
+            for value in (batch[col].dropna().unique() if col in batch.columns else ()):
+                if value not in known:
+                    known.add(value)
+                    new.append(value)
+        categories = dtype.categories.append(pd.Index(new, dtype=object)) if new else dtype.categories
+        frames = [
+            frame.assign(**{col: pd.Categorical(frame[col], categories=categories)}) if col in frame.columns else frame
+            for frame in frames
+        ]
+    return pd.concat(frames, ignore_index=True)
+
+
+def append_to_csv(records, path):
+    """Agrega las transacciones al final del CSV respetando su encabezado"""
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        header = next(csv.reader(f))
+    with open(path, 'a', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=header, extrasaction='ignore')
+        for record in records:
+            writer.writerow({col: record.get(col, '') for col in header})
+
+
+def send_batches(path, url, batch_size, persist):
+    """Lee un CSV y lo envía por lotes a /api/ingest de una instancia en ejecución"""
+    total = 0
+    for chunk in pd.read_csv(path, encoding='utf-8', chunksize=batch_size, dtype=str, keep_default_na=False):
+        records = chunk.to_dict('records')
+        body = json.dumps({'transacciones': records, 'persistir': persist}).encode('utf-8')
+        req = urllib.request.Request(
+            f"{url.rstrip('/')}/api/ingest", data=body, headers={'Content-Type': 'application/json'}
+        )
+        with urllib.request.urlopen(req) as response:
+            result = json.loads(response.read())
+        total += result['filas']
+        print(f"Lote de {result['filas']} filas ingerido ({result['tiempo_ms']:.1f} ms); "
+              f"total en memoria: {result['total_transacciones']:,}")
+        if result['categorias_nuevas']:
+            print(f"  Categorías nuevas: {', '.join(result['categorias_nuevas'])}")
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Envía transacciones nuevas a la aplicación en ejecución')
+    parser.add_argument('archivo', help='CSV con las transacciones nuevas (mismo formato que el original)')
+    parser.add_argument('--url', default=os.environ.get('APP_URL', 'http://localhost:5000'),
+                        help='URL de la aplicación (por defecto http://localhost:5000)')
+    parser.add_argument('--lote', type=int, default=5000, help='Transacciones por petición')
+    parser.add_argument('--persistir', action='store_true',
+                        help='Agregar también las transacciones al CSV del servidor')
+    args = parser.parse_args()
+
+    total = send_batches(args.archivo, args.url, max(args.lote, 1), args.persistir)
+    print(f"\n✓ {total:,} transacciones ingeridas en {math.ceil(total / max(args.lote, 1))} lotes")
+
+
+if __name__ == '__main__':
+    main()
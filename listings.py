@@ -0,0 +1,160 @@
+"""
+Listados paginados del lado del servidor
+Cada listado guarda sus registros ya serializables y un orden precalculado
+por cada columna ordenable, de modo que servir una página solo cuesta el
+tamaño de la página.
+"""
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 1000
+# Parámetros que activan la respuesta paginada ({items, total, offset, limit})
+PAGE_PARAMS = ('offset', 'limit', 'sort', 'order', 'q')
+
+
+class Listing:
+    """
+    Registros de un listado con órdenes y filtros precalculados
+
+    Args:
+        frame: DataFrame en el orden por defecto del listado
+        sort_columns: Columnas por las que se puede ordenar
+        search_columns: Columnas en las que se busca el texto de `q`
+        filter_columns: Diccionario {parámetro: columna} de filtros exactos
+    """
+
+    def __init__(self, frame, sort_columns=(), search_columns=(), filter_columns=None):
+        self.records = frame.to_dict('records')
+        self.size = len(self.records)
+        self.sort_columns = [col for col in sort_columns if col in frame.columns]
+        self.filter_columns = {
+            param: col for param, col in (filter_columns or {}).items() if col in frame.columns
+        }
+
+        # Orden ascendente estable por cada columna (el texto sin distinguir mayúsculas)
+        self.orders = {}
+        for col in self.sort_columns:
+            values = frame[col]
+            if not pd.api.types.is_numeric_dtype(values.dtype):
+                values = values.fillna('').astype(str).str.lower()
+            self.orders[col] = np.argsort(values.to_numpy(), kind='stable')
+        self.orders[None] = np.arange(self.size)
+
+        self.filter_values = {
+            param: frame[col].to_numpy() for param, col in self.filter_columns.items()
+        }
+
+        search = [
+            frame[col].fillna('').astype(str).str.lower().to_numpy()
+            for col in search_columns if col in frame.columns
+        ]
+        self.search_text = None
+        if search:
+            self.search_text = search[0]
+            for values in search[1:]:
+                self.search_text = self.search_text + '\n' + values
+
+        # Posiciones ordenadas de cada valor de cada filtro, calculadas una sola
+        # vez; solo se guardan los valores de los datos (un valor desconocido o
+        # una combinación de filtros se calcula en cada petición), así que el
+        # tamaño no depende de lo que pidan los clientes
+        self._ordered = {}
+        for param in self.filter_values:
+            self._partition(param)
+
+    def _partition(self, param):
+        """
+        Precalcula las posiciones de cada valor de un filtro (p. ej. cada
+        cluster) en todos los órdenes: un ordenamiento por orden en lugar de
+        recorrer todos los registros con una máscara por cada valor
+        """
+        values = self.filter_values[param]
+        known = ~pd.isna(values)
+        for sort, positions in self.orders.items():
+            positions = positions[known[positions]]
+            # Orden estable: dentro de cada valor se conserva el orden `sort`
+            grouped = positions[np.argsort(values[positions], kind='stable')]
+            keys = values[grouped]
+            if not len(keys):
+                continue
+            starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+            for start, end in zip(starts, np.r_[starts[1:], len(keys)]):
+                value = keys[start]
+                value = value.item() if isinstance(value, np.generic) else value
+                self._ordered[(sort, ((param, value),))] = grouped[start:end]
+
+    def _positions(self, sort, filters):
+        if not filters:
+            return self.orders[sort]
+        positions = self._ordered.get((sort, tuple(sorted(filters.items()))))
+        if positions is None:
+            # Sin partición: se filtra sin guardar el resultado
+            mask = np.ones(self.size, dtype=bool)
+            for param, value in filters.items():
+                mask &= self.filter_values[param] == value
+            positions = self.orders[sort]
+            positions = positions[mask[positions]]
+        return positions
+
+    def page(self, offset=0, limit=DEFAULT_PAGE_SIZE, sort=None, order='asc', q=None, **filters):
+        """
+        Devuelve una página del listado (limit=None devuelve todos los registros)
+
+        Raises:
+            ValueError: Si la columna de orden o el sentido no son válidos
+        """
+        if sort is not None and sort not in self.orders:
+            raise ValueError(f"No se puede ordenar por: {sort}")
+        if order not in ('asc', 'desc'):
+            raise ValueError(f"Orden no válido: {order}")
+
+        filters = {
+            param: value for param, value in filters.items()
+            if value not in (None, '') and param in self.filter_values
+        }
+        positions = self._positions(sort, filters)
+
+        if q and self.search_text is not None:
+            q = q.lower()
+            text = self.search_text[positions]
+            positions = positions[np.fromiter((q in t for t in text), dtype=bool, count=len(text))]
+
+        total = len(positions)
+        offset = max(offset, 0)
+        limit = total if limit is None else min(max(limit, 0), MAX_PAGE_SIZE)
+        if order == 'asc' and positions is self.orders[None] and offset == 0 and limit >= total:
+            # Listado completo en el orden por defecto
+            return {'items': self.records, 'total': total, 'offset': 0, 'limit': limit}
+        if order == 'desc':
+            start = max(total - offset - limit, 0)
+            selected = positions[start:max(total - offset, 0)][::-1]
+        else:
+            selected = positions[offset:offset + limit]
+
+        return {
+            'items': [self.records[i] for i in selected],
+            'total': total,
+            'offset': offset,
+            'limit': limit
+        }
+
+
+def page_from_request(listing, args):
+    """
+    Responde a una petición de listado con los parámetros de la query string.
+    Sin parámetros de paginación devuelve la lista completa (filtrada si se
+    indica category/cluster), igual que antes de existir la paginación.
+    """
+    paged = any(param in args for param in PAGE_PARAMS)
+    page = listing.page(
+        offset=args.get('offset', 0, type=int),
+        limit=args.get('limit', DEFAULT_PAGE_SIZE, type=int) if paged else None,
+        sort=args.get('sort') or None,
+        order=args.get('order', 'asc'),
+        q=args.get('q'),
+        category=args.get('category'),
+        cluster=args.get('cluster', type=int)
+    )
+    return page if paged else page['items']
@@ -0,0 +1,219 @@
+"""
+Métricas de latencia por endpoint en formato Prometheus
+Registra, por ruta, un histograma de latencia y de tamaño de respuesta, los
+códigos de estado y el tiempo de cada fase (acceso a datos, cálculo y
+serialización). Cada respuesta incluye un encabezado Server-Timing con esas
+fases. El costo por petición es un par de lecturas del reloj y una
+actualización de contadores bajo un lock.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from flask import Response, g, has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+
+# Límites de los histogramas (segundos y bytes)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1000, 10_000, 100_000, 1_000_000, 10_000_000)
+# Fases del encabezado Server-Timing; "calculo" es el resto del tiempo de la petición
+PHASE_DATA = 'datos'
+PHASE_COMPUTE = 'calculo'
+PHASE_SERIALIZATION = 'serializacion'
+# Etiqueta de las peticiones que no coinciden con ninguna ruta (404)
+UNKNOWN_ROUTE = 'desconocida'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+@contextmanager
+def phase(name):
+    """
+    Suma la duración del bloque a la fase `name` de la petición actual
+    (fuera de una petición no hace nada; las fases anidadas se cuentan una vez)
+    """
+    if not has_request_context() or name in g.setdefault('active_phases', set()):
+        yield
+        return
+    g.active_phases.add(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        times = g.setdefault('phase_times', {})
+        times[name] = times.get(name, 0.0) + time.perf_counter() - start
+        g.active_phases.discard(name)
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """Proveedor JSON de Flask que cuenta la serialización como fase de la petición"""
+
+    def dumps(self, obj, **kwargs):
+        with phase(PHASE_SERIALIZATION):
+            return super().dumps(obj, **kwargs)
+
+
+class Histogram:
+    """Histograma acumulativo con límites fijos"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _escape(value):
+    # Escapes del formato de texto de Prometheus para valores de etiquetas
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class RequestMetrics:
+    """
+    Registro de métricas de las peticiones y de las cargas de datos y modelos
+
+    Uso:
+        request_metrics = RequestMetrics()
+        request_metrics.init_app(app)
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._requests = {}
+        self._latency = {}
+        self._sizes = {}
+        self._phases = {}
+        self._loads = {}
+
+    def init_app(self, app):
+        """Registra los hooks de la aplicación y el proveedor JSON con medición"""
+        app.json = TimedJSONProvider(app)
+        app.before_request(self._start)
+        app.after_request(self._finish)
+
+    def _start(self):
+        g.request_start = time.perf_counter()
+
+    def _finish(self, response):
+        start = g.pop('request_start', None)
+        if start is None:
+            return response
+        total = time.perf_counter() - start
+
+        times = g.pop('phase_times', {})
+        data = times.get(PHASE_DATA, 0.0)
+        serialization = times.get(PHASE_SERIALIZATION, 0.0)
+        compute = max(total - data - serialization, 0.0)
+
+        route = request.url_rule.rule if request.url_rule is not None else UNKNOWN_ROUTE
+        self.observe_request(route, request.method, response.status_code, total,
+                             response.content_length or 0,
+                             {PHASE_DATA: data, PHASE_COMPUTE: compute, PHASE_SERIALIZATION: serialization})
+        response.headers['Server-Timing'] = (
+            f"{PHASE_DATA};dur={data * 1000:.3f}, {PHASE_COMPUTE};dur={compute * 1000:.3f}, "
+            f"{PHASE_SERIALIZATION};dur={serialization * 1000:.3f}, total;dur={total * 1000:.3f}"
+        )
+        return response
+
+    def observe_request(self, route, method, status, seconds, size, phases):
+        """Registra una petición terminada"""
+        key = (route, method)
+        with self._lock:
+            status_key = (route, method, status)
+            self._requests[status_key] = self._requests.get(status_key, 0) + 1
+            latency = self._latency.get(key)
+            if latency is None:
+                latency = self._latency[key] = Histogram(LATENCY_BUCKETS)
+                self._sizes[key] = Histogram(SIZE_BUCKETS)
+            latency.observe(seconds)
+            self._sizes[key].observe(size)
+            for name, value in phases.items():
+                phase_key = (route, name)
+                self._phases[phase_key] = self._phases.get(phase_key, 0.0) + value
+
+    def observe_load(self, component, seconds):
+        """Registra la duración de una carga o recarga ('datos', 'modelos', ...)"""
+        with self._lock:
+            count, total, _ = self._loads.get(component, (0, 0.0, 0.0))
+            self._loads[component] = (count + 1, total + seconds, seconds)
+
+    def render(self, extra=()):
+        """
+        Texto en formato de exposición de Prometheus
+
+        Args:
+            extra: Métricas adicionales [(nombre, tipo, ayuda, [(etiquetas, valor), ...]), ...]
+        """
+        with self._lock:
+            requests = sorted(self._requests.items())
+            histograms = [
+                ('http_request_duration_seconds', 'Latencia de las peticiones por ruta', sorted(self._latency.items())),
+                ('http_response_size_bytes', 'Tamaño del cuerpo de las respuestas por ruta', sorted(self._sizes.items()))
+            ]
+            histograms = [
+                (name, help_text, [(key, h.buckets, list(h.counts), h.sum, h.count) for key, h in items])
+                for name, help_text, items in histograms
+            ]
+            phases = sorted(self._phases.items())
+            loads = sorted(self._loads.items())
+
+        lines = [
+            '# HELP http_requests_total Peticiones atendidas por ruta, método y código de estado',
+            '# TYPE http_requests_total counter'
+        ]
+        for (route, method, status), count in requests:
+            lines.append(f"http_requests_total{_labels(route=route, method=method, status=status)} {count}")
+
+        for name, help_text, items in histograms:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for (route, method), buckets, counts, total, count in items:
+                cumulative = 0
+                for bound, bucket_count in zip(list(buckets) + ['+Inf'], counts):
+                    cumulative += bucket_count
+                    labels = _labels(route=route, method=method, le=bound)
+                    lines.append(f"{name}_bucket{labels} {cumulative}")
+                labels = _labels(route=route, method=method)
+                lines.append(f"{name}_sum{labels} {_format_value(total)}")
+                lines.append(f"{name}_count{labels} {count}")
+
+        lines.append('# HELP http_request_phase_seconds_total Tiempo acumulado por fase (datos, calculo, serializacion)')
+        lines.append('# TYPE http_request_phase_seconds_total counter')
+        for (route, name), total in phases:
+            lines.append(f"http_request_phase_seconds_total{_labels(route=route, phase=name)} {_format_value(total)}")
+
+        for name, kind, help_text, index in (
+            ('app_loads_total', 'counter', 'Cargas y recargas por componente', 0),
+            ('app_load_seconds_total', 'counter', 'Tiempo acumulado de carga por componente', 1),
+            ('app_load_last_seconds', 'gauge', 'Duración de la última carga por componente', 2)
+        ):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for component, values in loads:
+                lines.append(f"{name}{_labels(component=component)} {_format_value(values[index])}")
+
+        for name, kind, help_text, samples in extra:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{_labels(**labels) if labels else ''} {_format_value(value)}")
+
+        return '\n'.join(lines) + '\n'
+
+    def response(self, extra=()):
+        """Respuesta HTTP con las métricas en texto de Prometheus"""
+        return Response(self.render(extra), content_type=CONTENT_TYPE)
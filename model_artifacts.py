@@ -0,0 +1,292 @@
+"""
+Conjunto de artefactos entrenados que usa la aplicación
+Modelo de predicción, modelos de clusters, scalers, encoders y datos de
+clusters se cargan juntos desde el directorio de una versión y se publican con
+una sola asignación: una petición usa completo el conjunto anterior o el
+nuevo, nunca piezas de versiones distintas. ArtifactReloader carga una versión
+nueva en segundo plano, la valida y solo entonces la publica.
+"""
+
+import os
+import threading
+import time
+import traceback
+from datetime import datetime
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from clusters import client_cluster_view, product_cluster_view
+from compact_model import FlatForest
+from features import CLUSTER_FEATURE_COLUMNS
+from listings import Listing
+from neighbors import SimilarityIndex, build_neighbors_index
+from train_model import artifact_path, current_artifact_dir, read_artifact_version
+
+# Columnas de build_features() en app.py
+N_FEATURES = 6
+# Estados de una recarga
+IDLE = 'inactivo'
+RELOADING = 'en_curso'
+DONE = 'completado'
+FAILED = 'error'
+
+
+class ModelArtifacts:
+    """
+    Modelos y datos de clusters de una versión de los artefactos
+
+    Args:
+        directory: Directorio de la versión (ver train_model.current_artifact_dir)
+        artifact_version: Versión según models/version.json (None si no está versionado)
+    """
+
+    def __init__(self, directory, artifact_version=None):
+        start = time.perf_counter()
+        self.directory = directory
+        self.artifact_version = artifact_version
+        # Número de carga en este proceso (lo asigna la aplicación al publicarlos);
+        # forma parte de las claves de las cachés
+        self.model_version = 0
+
+        compact_model_dir = artifact_path('COMPACT_MODEL_DIR', directory)
+        model_path = artifact_path('MODEL_PATH', directory)
+        # Cargar modelo de predicción (el compacto, si existe, se mapea en memoria)
+        if os.path.exists(compact_model_dir):
+            print("Cargando modelo de predicción compacto...")
+            self.model = FlatForest.load(compact_model_dir)
+        elif os.path.exists(model_path):
+            print("Cargando modelo de predicción existente...")
+            self.model = joblib.load(model_path)
+        else:
+            print("Modelo de predicción no encontrado. Ejecuta train_model.py primero.")
+            self.model = None
+
+        # Cargar modelo de clustering (y el tipo de clustering con que se entrenó)
+        self.kmeans_model, self.cluster_type = self._load_kmeans('CLUSTER_MODEL_PATH', 'de clustering')
+        self.scaler = self._load('SCALER_PATH')
+
+        # Cargar label encoders
+        self.label_encoders = self._load('LABEL_ENCODER_PATH')
+        if self.label_encoders is None:
+            self.label_encoders = {}
+
+        # Cargar datos de clusters de productos
+        self.cluster_data = self._load_csv('CLUSTER_DATA_PATH', 'productos')
+        self.cluster_products_listing = None
+        self.cluster_products = None
+        if self.cluster_data is not None:
+            self.cluster_products_listing = Listing(
+                self.cluster_data,
+                sort_columns=['Cluster', 'CodigoStock', 'Descripcion_Ingles', 'Descripcion_Español', 'Categoria',
+                              'Ingresos_Total', 'Cantidad_Total', 'Precio_Promedio'],
+                search_columns=['CodigoStock', 'Descripcion_Ingles', 'Descripcion_Español'],
+                filter_columns={'category': 'Categoria', 'cluster': 'Cluster'}
+            )
+            if 'Cluster' in self.cluster_data.columns:
+                # Resumen y particiones por cluster para /api/clusters
+                self.cluster_products = product_cluster_view(self.cluster_data, self.cluster_products_listing)
+        # Productos similares (/api/products/<codigo>/similar)
+        self.similar_products = self._load_neighbors(
+            'NEIGHBORS_PATH', 'productos', self.cluster_data, 'CodigoStock', self.cluster_type, self.scaler,
+            self.cluster_products_listing
+        )
+
+        # Cargar modelo de clustering de clientes y su scaler
+        self.kmeans_clients_model, _ = self._load_kmeans('CLUSTER_CLIENTS_MODEL_PATH', 'de clustering de clientes')
+        self.scaler_clients = self._load('SCALER_CLIENTS_PATH')
+
+        # Cargar datos de clusters de clientes
+        self.cluster_clients_data = self._load_csv('CLUSTER_CLIENTS_DATA_PATH', 'clientes')
+        self.cluster_clients_listing = None
+        self.cluster_clients = None
+        if self.cluster_clients_data is not None:
+            self.cluster_clients_listing = Listing(
+                self.cluster_clients_data,
+                sort_columns=['Cluster', 'IDCliente', 'Ingresos_Total', 'Num_Transacciones', 'Cantidad_Total',
+                              'Productos_Unicos', 'Frecuencia_Compra', 'Valor_Promedio_Transaccion'],
+                search_columns=['IDCliente'],
+                filter_columns={'cluster': 'Cluster'}
+            )
+            if 'Cluster' in self.cluster_clients_data.columns:
+                self.cluster_clients = client_cluster_view(self.cluster_clients_data, self.cluster_clients_listing)
+        self.similar_clients = self._load_neighbors(
+            'NEIGHBORS_CLIENTS_PATH', 'clientes', self.cluster_clients_data, 'IDCliente', 'clientes',
+            self.scaler_clients, self.cluster_clients_listing
+        )
+
+        self.load_seconds = time.perf_counter() - start
+
+    def _load(self, name):
+        path = artifact_path(name, self.directory)
+        return joblib.load(path) if os.path.exists(path) else None
+
+    def _load_kmeans(self, name, description):
+        cluster_info = self._load(name)
+        if cluster_info is None:
+            print(f"Modelo {description} no encontrado. Ejecuta train_model.py primero.")
+            return None, None
+        print(f"Cargando modelo {description} existente...")
+        return cluster_info['kmeans'], cluster_info.get('cluster_type')
+
+    def _load_csv(self, name, description):
+        path = artifact_path(name, self.directory)
+        if not os.path.exists(path):
+            return None
+        data = pd.read_csv(path, encoding='utf-8')
+        print(f"Datos de clusters de {description} cargados: {len(data)} {description}")
+        return data
+
+    def _load_neighbors(self, name, description, data, key_column, cluster_type, scaler, listing):
+        if data is None or key_column not in data.columns:
+            return None
+        index = self._load(name)
+        # Sin índice (modelos anteriores a los índices de vecinos) o con uno que no
+        # corresponde a los datos de clusters: construirlo con el scaler guardado
+        if (index is None or index.get('cluster_type') != cluster_type
+                or not np.array_equal(index['keys'], data[key_column].to_numpy())):
+            if scaler is None or cluster_type is None:
+                return None
+            print(f"Construyendo índice de vecinos de {description}...")
+            index = build_neighbors_index(data, key_column, cluster_type, scaler)
+        return SimilarityIndex(index, listing.records)
+
+    def validate(self):
+        """
+        Comprueba que las piezas del conjunto sean coherentes antes de publicarlo
+
+        Raises:
+            ValueError: Si falta todo el conjunto o alguna pieza no es compatible
+        """
+        if self.model is None and self.cluster_data is None and self.cluster_clients_data is None:
+            raise ValueError(f"No hay artefactos en {self.directory}")
+
+        if self.model is not None:
+            n_features = getattr(self.model, 'n_features_in_', N_FEATURES)
+            if n_features != N_FEATURES:
+                raise ValueError(f"El modelo de predicción espera {n_features} columnas (la aplicación usa {N_FEATURES})")
+            if not np.all(np.isfinite(self.model.predict(np.zeros((1, N_FEATURES))))):
+                raise ValueError("El modelo de predicción devuelve valores no finitos")
+            encoder = self.label_encoders.get('Categoria')
+            if encoder is not None and len(encoder.classes_) == 0:
+                raise ValueError("El encoder de categorías está vacío")
+
+        for description, kmeans, scaler, cluster_type, data in (
+            ('productos', self.kmeans_model, self.scaler, self.cluster_type, self.cluster_data),
+            ('clientes', self.kmeans_clients_model, self.scaler_clients, 'clientes', self.cluster_clients_data)
+        ):
+            if kmeans is not None and scaler is not None and scaler.n_features_in_ != kmeans.n_features_in_:
+                raise ValueError(f"El scaler y el modelo de clusters de {description} no tienen las mismas columnas")
+            # La asignación en línea recalcula las columnas del tipo de clustering
+            columns = CLUSTER_FEATURE_COLUMNS.get(cluster_type)
+            if scaler is not None and columns is not None and scaler.n_features_in_ != len(columns):
+                raise ValueError(f"El scaler de {description} no corresponde al tipo de clustering {cluster_type}")
+            if data is None:
+                continue
+            if 'Cluster' not in data.columns:
+                raise ValueError(f"Los datos de clusters de {description} no tienen la columna Cluster")
+            if kmeans is not None and len(data) and data['Cluster'].max() >= kmeans.n_clusters:
+                raise ValueError(f"Los datos de clusters de {description} no corresponden al modelo de clusters")
+
+
+def load_current_artifacts():
+    """Carga (sin validar) la versión activa de los artefactos"""
+    info = read_artifact_version() or {}
+    return ModelArtifacts(current_artifact_dir(info), info.get('version'))
+
+
+class ArtifactReloader:
+    """
+    Recarga de los artefactos en un hilo aparte: carga la versión activa, la
+    valida y la publica con `install`. Si algo falla, sigue publicada la anterior.
+
+    Con `interval` > 0 cada proceso revisa models/version.json cada `interval`
+    segundos y recarga cuando cambia la versión activa (así todos los workers
+    de gunicorn toman un entrenamiento nuevo, no solo el que recibió la petición).
+
+    Args:
+        install: Función que publica un ModelArtifacts ya validado
+        current: Función que devuelve el ModelArtifacts publicado (o None)
+        interval: Segundos entre revisiones de version.json (0 las desactiva)
+    """
+
+    def __init__(self, install, current, interval=0):
+        self._install = install
+        self._current = current
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._thread = None
+        self._watcher_pid = None
+        # Versión cuya carga falló: la revisión periódica no la reintenta
+        self._failed_version = None
+        self._status = {'estado': IDLE, 'version': None, 'inicio': None, 'fin': None, 'tiempo_s': None, 'error': None}
+
+    def reload(self, wait=False):
+        """
+        Inicia una recarga
+
+        Args:
+            wait: Esperar a que termine antes de volver
+
+        Returns:
+            False si ya había una recarga en curso
+        """
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return False
+            self._status = {'estado': RELOADING, 'version': None, 'inicio': datetime.now().isoformat(timespec='seconds'),
+                            'fin': None, 'tiempo_s': None, 'error': None}
+            self._thread = threading.Thread(target=self._run, name='recarga-modelos', daemon=True)
+            self._thread.start()
+            thread = self._thread
+        if wait:
+            thread.join()
+        return True
+
+    def _run(self):
+        start = time.perf_counter()
+        status = dict(self._status)
+        try:
+            artifacts = load_current_artifacts()
+            status['version'] = artifacts.artifact_version
+            artifacts.validate()
+            self._install(artifacts)
+        except Exception as e:
+            traceback.print_exc()
+            self._failed_version = status['version']
+            status.update({'estado': FAILED, 'error': f'{type(e).__name__}: {e}'})
+        else:
+            print(f"Modelos recargados (versión {artifacts.artifact_version})")
+            status['estado'] = DONE
+        status['tiempo_s'] = time.perf_counter() - start
+        status['fin'] = datetime.now().isoformat(timespec='seconds')
+        self._status = status
+
+    def status(self):
+        """Estado de la última recarga y versión publicada"""
+        status = dict(self._status)
+        current = self._current()
+        status['version_activa'] = current.artifact_version if current is not None else None
+        return status
+
+    def watch(self):
+        """Inicia la revisión periódica de version.json (una vez por proceso)"""
+        if not self.interval or self._watcher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._watcher_pid == os.getpid():
+                return
+            # Los hilos no sobreviven al fork: cada worker inicia el suyo
+            self._watcher_pid = os.getpid()
+            threading.Thread(target=self._watch, name='revision-modelos', daemon=True).start()
+
+    def _watch(self):
+        while True:
+            time.sleep(self.interval)
+            info = read_artifact_version() or {}
+            version = info.get('version')
+            current = self._current()
+            if (version is not None and current is not None and version != current.artifact_version
+                    and version != self._failed_version):
+                self.reload()
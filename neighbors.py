@@ -0,0 +1,74 @@
+"""
+Búsqueda de productos y clientes similares
+Al entrenar se construye un KDTree sobre las características escaladas de
+cada clustering (las mismas que usa KMeans) y se guarda junto al modelo de
+clusters. Buscar los k más parecidos a uno recorre solo algunas hojas del
+árbol en lugar de medir la distancia a todos los registros.
+"""
+
+import numpy as np
+from sklearn.neighbors import KDTree
+
+from features import cluster_features
+
+DEFAULT_SIMILAR = 10
+MAX_SIMILAR = 100
+
+
+def build_neighbors_index(data, key_column, cluster_type, scaler):
+    """
+    Construye el índice de vecinos de los registros de un clustering
+
+    Args:
+        data: Datos de clusters (el CSV de productos o de clientes), en el mismo orden
+        key_column: Columna que identifica a cada registro (CodigoStock o IDCliente)
+        cluster_type: Tipo de clustering con que se ajustó el scaler
+        scaler: Scaler del modelo de clusters
+
+    Returns:
+        Diccionario {'tree', 'keys', 'cluster_type'} que se guarda con joblib
+    """
+    X = scaler.transform(cluster_features(data.copy(), cluster_type))
+    return {
+        'tree': KDTree(np.asarray(X, dtype=float)),
+        'keys': data[key_column].to_numpy(),
+        'cluster_type': cluster_type
+    }
+
+
+class SimilarityIndex:
+    """
+    Consultas de vecinos sobre un índice de build_neighbors_index()
+
+    Args:
+        index: Índice guardado al entrenar
+        records: Registros de los datos de clusters, en el orden del índice
+    """
+
+    def __init__(self, index, records):
+        self.tree = index['tree']
+        self.records = records
+        self.size = len(records)
+        self._points = np.asarray(self.tree.data)
+        self._positions = {key: i for i, key in enumerate(index['keys'].tolist())}
+
+    def similar(self, key, k=DEFAULT_SIMILAR):
+        """
+        Los k registros más cercanos a `key` en el espacio del clustering
+
+        Raises:
+            KeyError: Si la clave no está en el índice
+            ValueError: Si k no está entre 1 y MAX_SIMILAR
+        """
+        if not 1 <= k <= MAX_SIMILAR:
+            raise ValueError(f"k debe estar entre 1 y {MAX_SIMILAR}")
+        pos = self._positions[key]
+        # Un vecino más: el propio registro sale a distancia 0
+        distances, positions = self.tree.query(self._points[pos:pos + 1], k=min(k + 1, self.size))
+        return {
+            'registro': self.records[pos],
+            'similares': [
+                {**self.records[p], 'distancia': d}
+                for p, d in zip(positions[0].tolist(), distances[0].tolist()) if p != pos
+            ][:k]
+        }
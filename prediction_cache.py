@@ -0,0 +1,94 @@
+"""
+Caché LRU/TTL de predicciones del modelo
+Las entradas se identifican por la fila de características y se descartan
+cuando cambia la hora o la versión del modelo.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+class PredictionCache:
+    """
+    Caché acotada de resultados de model.predict por fila de características
+
+    Args:
+        maxsize: Número máximo de filas almacenadas (se descartan las menos usadas)
+        ttl: Segundos de vida de cada entrada
+    """
+
+    def __init__(self, maxsize=10000, ttl=3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._epoch = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _check_epoch(self, epoch):
+        # Vaciar la caché si cambió la versión del modelo o la hora
+        if epoch != self._epoch:
+            self._entries.clear()
+            self._epoch = epoch
+
+    def predict(self, model, features, model_version, now):
+        """
+        Devuelve las predicciones de cada fila usando la caché y llama a
+        model.predict una sola vez para las filas que no están almacenadas
+        """
+        epoch = (model_version, now.strftime('%Y-%m-%d %H'))
+        keys = [tuple(row) for row in features.tolist()]
+        predictions = np.empty(len(keys), dtype=float)
+        missing = []
+        current = time.monotonic()
+
+        with self._lock:
+            self._check_epoch(epoch)
+            for i, key in enumerate(keys):
+                entry = self._entries.get(key)
+                if entry is not None and current - entry[1] < self.ttl:
+                    self._entries.move_to_end(key)
+                    predictions[i] = entry[0]
+                    self.hits += 1
+                else:
+                    missing.append(i)
+                    self.misses += 1
+
+        if missing:
+            computed = model.predict(features[missing])
+            predictions[missing] = computed
+            with self._lock:
+                # Si el modelo se recargó mientras tanto no guardar resultados antiguos
+                if self._epoch == epoch:
+                    for i, value in zip(missing, computed):
+                        self._entries[keys[i]] = (float(value), current)
+                        self._entries.move_to_end(keys[i])
+                    while len(self._entries) > self.maxsize:
+                        self._entries.popitem(last=False)
+                        self.evictions += 1
+
+        return predictions
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._epoch = None
+
+    def stats(self):
+        """Contadores de uso de la caché"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / total if total else 0.0
+            }
@@ -0,0 +1,119 @@
+"""
+Respuestas JSON pre-serializadas y comprimidas
+Cada respuesta se serializa una sola vez por versión de los datos y se guarda
+en bytes junto con sus variantes gzip y brotli y un ETag fuerte.
+"""
+
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+
+from flask import Response, current_app, request
+
+from metrics import PHASE_SERIALIZATION, phase
+
+try:
+    import brotli
+except ImportError:
+    # brotli es opcional; sin él solo se sirve gzip
+    brotli = None
+
+# Por debajo de este tamaño no compensa comprimir
+MIN_COMPRESS_SIZE = 1024
+
+
+class SerializedResponse:
+    """Cuerpo JSON en bytes con sus variantes comprimidas"""
+
+    def __init__(self, body):
+        self.etag = hashlib.sha256(body).hexdigest()[:32]
+        self.variants = {'identity': body}
+        if len(body) >= MIN_COMPRESS_SIZE:
+            self.variants['gzip'] = gzip.compress(body, compresslevel=6, mtime=0)
+            if brotli is not None:
+                self.variants['br'] = brotli.compress(body, quality=5)
+
+    def variant_etag(self, encoding):
+        # Un ETag fuerte distinto por representación
+        return self.etag if encoding == 'identity' else f"{self.etag}-{encoding}"
+
+    def choose_encoding(self, accept_encodings):
+        for encoding in ('br', 'gzip'):
+            if encoding in self.variants and accept_encodings.quality(encoding) > 0:
+                return encoding
+        return 'identity'
+
+
+class ResponseCache:
+    """
+    Caché LRU de respuestas serializadas por ruta y query string
+
+    Args:
+        maxsize: Número máximo de respuestas guardadas
+    """
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def get_or_build(self, key, version, build):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        # Serializar fuera del lock; si dos peticiones coinciden, gana la última
+        body = current_app.json.response(build()).get_data()
+        # La conversión a JSON ya se mide en el proveedor; aquí el hash y la compresión
+        with phase(PHASE_SERIALIZATION):
+            serialized = SerializedResponse(body)
+        with self._lock:
+            self._entries[key] = (version, serialized)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return serialized
+
+    def respond(self, version, build):
+        """
+        Devuelve la respuesta de la petición actual desde la caché, con
+        304 Not Modified si el cliente ya tiene la misma versión
+        """
+        serialized = self.get_or_build(request.full_path, version, build)
+        encoding = serialized.choose_encoding(request.accept_encodings)
+        etag = serialized.variant_etag(encoding)
+
+        if any(request.if_none_match.contains(serialized.variant_etag(e)) for e in serialized.variants):
+            with self._lock:
+                self.not_modified += 1
+            response = Response(status=304)
+        else:
+            response = Response(serialized.variants[encoding], mimetype='application/json')
+            if encoding != 'identity':
+                response.headers['Content-Encoding'] = encoding
+
+        response.set_etag(etag)
+        response.headers['Vary'] = 'Accept-Encoding'
+        return response
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'not_modified': self.not_modified
+            }
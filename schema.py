@@ -0,0 +1,70 @@
+"""
+Esquema compacto de la tabla de transacciones
+Define qué columnas del CSV se usan y con qué tipos se guardan en memoria:
+textos repetidos como categóricos y enteros con el menor tipo suficiente.
+"""
+
+import numpy as np
+
+# Columnas del CSV que usa algún endpoint o el entrenamiento
+USED_COLUMNS = [
+    'NumeroFactura', 'CodigoStock', 'Descripcion_Ingles', 'Descripcion_Español',
+    'Cantidad', 'Fecha', 'PrecioUnitario', 'IDCliente', 'Categoria', 'Hora_24h'
+]
+
+CATEGORICAL_COLUMNS = ['Categoria', 'Descripcion_Ingles', 'Descripcion_Español', 'CodigoStock', 'NumeroFactura']
+
+INTEGER_COLUMNS = {
+    'Cantidad': 'int32',
+    'IDCliente': 'int32',
+    'Hora_24h': 'int8',
+    'Mes': 'int8',
+    'DiaSemana': 'int8'
+}
+
+
+def memory_usage_mb(df):
+    """Memoria ocupada por el DataFrame en MB (incluye el contenido de los textos)"""
+    return df.memory_usage(deep=True).sum() / (1024 * 1024)
+
+
+def _downcast_integer(series, dtype):
+    # Solo si no hay nulos y todos los valores caben en el tipo destino
+    if series.isna().any():
+        return series
+    values = series.to_numpy()
+    if not np.issubdtype(values.dtype, np.number):
+        return series
+    info = np.iinfo(dtype)
+    if len(values) and (values.min() < info.min or values.max() > info.max or not np.all(values == np.floor(values))):
+        return series
+    return series.astype(dtype)
+
+
+def apply_schema(df):
+    """
+    Aplica el esquema compacto: elimina columnas no usadas, convierte los
+    textos en categóricos y reduce los enteros
+
+    Args:
+        df: DataFrame preprocesado (con Ingresos, Fecha, Mes y DiaSemana)
+
+    Returns:
+        DataFrame con los tipos compactos
+    """
+    before = memory_usage_mb(df)
+
+    keep = [col for col in USED_COLUMNS + ['Ingresos', 'Mes', 'DiaSemana'] if col in df.columns]
+    df = df[keep].copy()
+
+    for col in CATEGORICAL_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+
+    for col, dtype in INTEGER_COLUMNS.items():
+        if col in df.columns:
+            df[col] = _downcast_integer(df[col], dtype)
+
+    after = memory_usage_mb(df)
+    print(f"Memoria de los datos: {before:.1f} MB -> {after:.1f} MB")
+    return df
@@ -2,6 +2,42 @@
 let productsList = [];
 let categoriesList = [];
 
+// Server-side pagination
+const PAGE_SIZE = 50;
+// Opciones de los selectores de producto y cliente (una página por búsqueda)
+const SELECT_PAGE_SIZE = 100;
+
+async function fetchPage(url, params) {
+    const query = new URLSearchParams();
+    Object.entries(params).forEach(([key, value]) => {
+        if (value !== undefined && value !== null && value !== '') {
+            query.set(key, value);
+        }
+    });
+    const response = await fetch(`${url}?${query.toString()}`);
+    if (!response.ok) {
+        throw new Error(`Error ${response.status} al cargar ${url}`);
+    }
+    return response.json();
+}
+
+function renderPager(container, page, onPageChange) {
+    if (!container) return;
+    
+    const start = page.total === 0 ? 0 : page.offset + 1;
+    const end = Math.min(page.offset + page.items.length, page.total);
+    
+    container.innerHTML = `
+        <button class="btn-pager" ${page.offset === 0 ? 'disabled' : ''}>Anterior</button>
+        <span class="pager-info">${start}-${end} de ${page.total.toLocaleString()}</span>
+        <button class="btn-pager" ${end >= page.total ? 'disabled' : ''}>Siguiente</button>
+    `;
+    
+    const [prevButton, nextButton] = container.querySelectorAll('button');
+    prevButton.addEventListener('click', () => onPageChange(Math.max(page.offset - page.limit, 0)));
+    nextButton.addEventListener('click', () => onPageChange(page.offset + page.limit));
+}
+
 // Initialize app
 document.addEventListener('DOMContentLoaded', () => {
     initializeNavigation();
@@ -48,7 +84,6 @@ function initializeNavigation() {
 
 // Global variables for PDF export
 let dashboardStats = null;
-let clustersDataExport = null;
 let categoriesData = null;
 let topClientsData = null;
 
@@ -239,10 +274,20 @@ function createClientsChart(clients) {
 }
 
 // Products List
+let productSelectRequest = 0;
+
 async function loadProductsList() {
+    // Solo la página que coincide con la búsqueda, no el catálogo completo
+    const request = ++productSelectRequest;
     try {
-        const response = await fetch('/api/products/list');
-        productsList = await response.json();
+        const page = await fetchPage('/api/products/list', {
+            limit: SELECT_PAGE_SIZE,
+            sort: 'Descripcion_Ingles',
+            q: document.getElementById('producto-search')?.value.trim()
+        });
+        // Ignorar respuestas de búsquedas anteriores que llegan tarde
+        if (request !== productSelectRequest) return;
+        productsList = page.items;
         populateProductSelect();
     } catch (error) {
         console.error('Error loading products list:', error);
@@ -261,11 +306,20 @@ async function loadCategoriesList() {
 
 // Clients List
 let clientsList = [];
+let clientSelectRequest = 0;
 
 async function loadClientsList() {
+    // Clientes cuyo ID coincide con la búsqueda, los de más ingresos primero
+    const request = ++clientSelectRequest;
     try {
-        const response = await fetch('/api/clients/list');
-        clientsList = await response.json();
+        const page = await fetchPage('/api/clients/list', {
+            limit: SELECT_PAGE_SIZE,
+            sort: 'Ingresos_Total',
+            order: 'desc',
+            q: document.getElementById('client-search')?.value.trim()
+        });
+        if (request !== clientSelectRequest) return;
+        clientsList = page.items;
         populateClientSelect();
     } catch (error) {
         console.error('Error loading clients list:', error);
@@ -276,9 +330,11 @@ function populateClientSelect() {
     const select = document.getElementById('client-id-select');
     if (!select) return;
     
-    select.innerHTML = '<option value="">Selecciona un cliente...</option>';
+    select.innerHTML = clientsList.length
+        ? '<option value="">Selecciona un cliente...</option>'
+        : '<option value="">Sin clientes que coincidan</option>';
     
-    clientsList.slice(0, 100).forEach(client => {
+    clientsList.forEach(client => {
         const option = document.createElement('option');
         option.value = client.IDCliente;
         option.textContent = `Cliente ${client.IDCliente} - ${formatCurrency(client.Ingresos_Total)} (${client.Num_Compras} compras)`;
@@ -291,6 +347,14 @@ function setupClientPredictionForm() {
     const form = document.getElementById('client-prediction-form');
     if (!form) return;
     
+    // Buscar en el servidor, esperando a que el usuario deje de escribir
+    const searchInput = document.getElementById('client-search');
+    let searchTimeout = null;
+    searchInput?.addEventListener('input', () => {
+        clearTimeout(searchTimeout);
+        searchTimeout = setTimeout(loadClientsList, 250);
+    });
+    
     form.addEventListener('submit', async (e) => {
         e.preventDefault();
         await predictClient();
@@ -357,11 +421,12 @@ async function loadClientsClustersData() {
         if (!response.ok) {
             throw new Error('No hay datos de clusters de clientes disponibles');
         }
+        // Solo el resumen; los clientes se piden por páginas
         clientsClustersData = await response.json();
         displayClientsClustersSummary(clientsClustersData);
         displayClientsClustersChart(clientsClustersData);
-        displayClientsClustersTable(clientsClustersData);
         setupClientClusterFilter(clientsClustersData);
+        loadClientsClustersTable(0);
     } catch (error) {
         console.error('Error loading clients clusters:', error);
         const summaryDiv = document.getElementById('clients-clusters-summary');
@@ -449,40 +514,37 @@ function displayClientsClustersChart(data) {
     }
 }
 
-function displayClientsClustersTable(data) {
+async function loadClientsClustersTable(offset = 0) {
     const tbody = document.getElementById('table-clients-clusters-body');
     if (!tbody) return;
-    tbody.innerHTML = '';
     
-    if (!data.clusters || Object.keys(data.clusters).length === 0) {
-        tbody.innerHTML = '<tr><td colspan="7" class="loading">No hay datos disponibles</td></tr>';
-        return;
-    }
-    
-    let allClients = [];
-    Object.keys(data.clusters).forEach(clusterId => {
-        data.clusters[clusterId].forEach(client => {
-            allClients.push({
-                ...client,
-                Cluster: clusterId
-            });
+    try {
+        const page = await fetchPage('/api/clusters/clients/list', {
+            cluster: document.getElementById('client-cluster-filter')?.value,
+            offset: offset,
+            limit: PAGE_SIZE
         });
-    });
-    
-    allClients.forEach(client => {
-        const row = document.createElement('tr');
-        row.dataset.cluster = client.Cluster;
-        row.innerHTML = `
-            <td><span class="cluster-badge">${client.Cluster}</span></td>
-            <td>${client.IDCliente}</td>
-            <td>${client.Ingresos_Total ? formatCurrency(client.Ingresos_Total) : '-'}</td>
-            <td>${client.Num_Transacciones ? client.Num_Transacciones.toLocaleString() : '-'}</td>
-            <td>${client.Cantidad_Total ? client.Cantidad_Total.toLocaleString() : '-'}</td>
-            <td>${client.Productos_Unicos || '-'}</td>
-            <td>${client.Frecuencia_Compra ? client.Frecuencia_Compra.toFixed(2) : '-'}</td>
-        `;
-        tbody.appendChild(row);
-    });
+        
+        if (page.items.length === 0) {
+            tbody.innerHTML = '<tr><td colspan="7" class="loading">No hay datos disponibles</td></tr>';
+        } else {
+            tbody.innerHTML = page.items.map(client => `
+                <tr>
+                    <td><span class="cluster-badge">${client.Cluster}</span></td>
+                    <td>${client.IDCliente}</td>
+                    <td>${client.Ingresos_Total ? formatCurrency(client.Ingresos_Total) : '-'}</td>
+                    <td>${client.Num_Transacciones ? client.Num_Transacciones.toLocaleString() : '-'}</td>
+                    <td>${client.Cantidad_Total ? client.Cantidad_Total.toLocaleString() : '-'}</td>
+                    <td>${client.Productos_Unicos || '-'}</td>
+                    <td>${client.Frecuencia_Compra ? client.Frecuencia_Compra.toFixed(2) : '-'}</td>
+                </tr>
+            `).join('');
+        }
+        
+        renderPager(document.getElementById('clients-clusters-pager'), page, loadClientsClustersTable);
+    } catch (error) {
+        console.error('Error loading clients clusters table:', error);
+    }
 }
 
 function setupClientClusterFilter(data) {
@@ -500,25 +562,19 @@ function setupClientClusterFilter(data) {
         });
     }
     
-    filterSelect.addEventListener('change', (e) => {
-        const selectedCluster = e.target.value;
-        const rows = document.querySelectorAll('#table-clients-clusters-body tr');
-        
-        rows.forEach(row => {
-            if (!selectedCluster || row.dataset.cluster === selectedCluster) {
-                row.style.display = '';
-            } else {
-                row.style.display = 'none';
-            }
-        });
-    });
+    // Filtrar en el servidor volviendo a la primera página
+    filterSelect.onchange = () => loadClientsClustersTable(0);
 }
 
+const CLIENT_CLUSTER_SORT = {
+    'id': { sort: 'IDCliente', order: 'asc' },
+    'ingresos-desc': { sort: 'Ingresos_Total', order: 'desc' },
+    'ingresos-asc': { sort: 'Ingresos_Total', order: 'asc' },
+    'transacciones-desc': { sort: 'Num_Transacciones', order: 'desc' },
+    'transacciones-asc': { sort: 'Num_Transacciones', order: 'asc' }
+};
+
 function showClientClusterClients(clusterId) {
-    if (!clientsClustersData) return;
-    
-    const clusterClients = clientsClustersData.clusters[clusterId] || [];
-    
     const modal = document.createElement('div');
     modal.className = 'cluster-products-modal';
     modal.innerHTML = `
@@ -551,76 +607,75 @@ function showClientClusterClients(clusterId) {
                             </tr>
                         </thead>
                         <tbody id="client-cluster-tbody">
-                            ${clusterClients.map(c => `
-                                <tr>
-                                    <td>${c.IDCliente}</td>
-                                    <td>${c.Ingresos_Total ? formatCurrency(c.Ingresos_Total) : '-'}</td>
-                                    <td>${c.Num_Transacciones ? c.Num_Transacciones.toLocaleString() : '-'}</td>
-                                    <td>${c.Cantidad_Total ? c.Cantidad_Total.toLocaleString() : '-'}</td>
-                                    <td>${c.Productos_Unicos || '-'}</td>
-                                    <td>${c.Frecuencia_Compra ? c.Frecuencia_Compra.toFixed(2) : '-'}</td>
-                                </tr>
-                            `).join('')}
+                            <tr><td colspan="6" class="loading">Cargando clientes...</td></tr>
                         </tbody>
                     </table>
                 </div>
+                <div id="client-cluster-pager" class="pager"></div>
             </div>
         </div>
     `;
     
     document.body.appendChild(modal);
-    modal.dataset.clients = JSON.stringify(clusterClients);
+    loadClientClusterPage(clusterId, 0);
 }
 
-function sortClientClusterClients(clusterId) {
-    const modal = document.querySelector('.cluster-products-modal');
-    if (!modal) return;
-    
+async function loadClientClusterPage(clusterId, offset) {
     const sortSelect = document.getElementById('sort-client-cluster');
-    const sortValue = sortSelect.value;
-    const clients = JSON.parse(modal.dataset.clients);
     const tbody = document.getElementById('client-cluster-tbody');
+    if (!sortSelect || !tbody) return;
     
-    let sortedClients = [...clients];
-    
-    switch(sortValue) {
-        case 'ingresos-desc':
-            sortedClients.sort((a, b) => (b.Ingresos_Total || 0) - (a.Ingresos_Total || 0));
-            break;
-        case 'ingresos-asc':
-            sortedClients.sort((a, b) => (a.Ingresos_Total || 0) - (b.Ingresos_Total || 0));
-            break;
-        case 'transacciones-desc':
-            sortedClients.sort((a, b) => (b.Num_Transacciones || 0) - (a.Num_Transacciones || 0));
-            break;
-        case 'transacciones-asc':
-            sortedClients.sort((a, b) => (a.Num_Transacciones || 0) - (b.Num_Transacciones || 0));
-            break;
-        case 'id':
-        default:
-            sortedClients.sort((a, b) => a.IDCliente - b.IDCliente);
-            break;
-    }
-    
-    tbody.innerHTML = sortedClients.map(c => `
-        <tr>
-            <td>${c.IDCliente}</td>
-            <td>${c.Ingresos_Total ? formatCurrency(c.Ingresos_Total) : '-'}</td>
-            <td>${c.Num_Transacciones ? c.Num_Transacciones.toLocaleString() : '-'}</td>
-            <td>${c.Cantidad_Total ? c.Cantidad_Total.toLocaleString() : '-'}</td>
-            <td>${c.Productos_Unicos || '-'}</td>
-            <td>${c.Frecuencia_Compra ? c.Frecuencia_Compra.toFixed(2) : '-'}</td>
-        </tr>
-    `).join('');
+    const sortOption = CLIENT_CLUSTER_SORT[sortSelect.value] || CLIENT_CLUSTER_SORT['id'];
+    
+    try {
+        const page = await fetchPage(`/api/clusters/clients/${clusterId}`, {
+            offset: offset,
+            limit: PAGE_SIZE,
+            sort: sortOption.sort,
+            order: sortOption.order
+        });
+        
+        tbody.innerHTML = page.items.map(c => `
+            <tr>
+                <td>${c.IDCliente}</td>
+                <td>${c.Ingresos_Total ? formatCurrency(c.Ingresos_Total) : '-'}</td>
+                <td>${c.Num_Transacciones ? c.Num_Transacciones.toLocaleString() : '-'}</td>
+                <td>${c.Cantidad_Total ? c.Cantidad_Total.toLocaleString() : '-'}</td>
+                <td>${c.Productos_Unicos || '-'}</td>
+                <td>${c.Frecuencia_Compra ? c.Frecuencia_Compra.toFixed(2) : '-'}</td>
+            </tr>
+        `).join('');
+        
+        renderPager(
+            document.getElementById('client-cluster-pager'),
+            page,
+            newOffset => loadClientClusterPage(clusterId, newOffset)
+        );
+    } catch (error) {
+        console.error('Error loading cluster clients:', error);
+    }
+}
+
+function sortClientClusterClients(clusterId) {
+    // Reordenar en el servidor volviendo a la primera página
+    loadClientClusterPage(clusterId, 0);
 }
 
-function exportClientsClustersPDF() {
+async function exportClientsClustersPDF() {
     if (!window.jspdf) {
         alert('Error: jsPDF no está cargado. Por favor, recarga la página.');
         return;
     }
     
-    if (!clientsClustersData) {
+    // Los clientes de cada cluster se piden solo al exportar
+    let membersData;
+    try {
+        const response = await fetch('/api/clusters/clients?miembros=true');
+        if (!response.ok) {
+            throw new Error('No hay datos de clusters de clientes disponibles');
+        }
+        membersData = await response.json();
+    } catch (error) {
         alert('No hay datos de clusters de clientes disponibles');
         return;
     }
@@ -657,7 +712,7 @@ function exportClientsClustersPDF() {
     doc.text('Resumen de Clusters', 20, yPos);
     yPos += 10;
     
-    const summaryData = clientsClustersData.summary.map(c => [
+    const summaryData = membersData.summary.map(c => [
         `Cluster ${c.Cluster}`,
         c.Num_Clientes,
         formatCurrency(c.Ingresos_Total || 0),
@@ -676,7 +731,7 @@ function exportClientsClustersPDF() {
     yPos = doc.lastAutoTable.finalY + 15;
     
     // Clientes por Cluster
-    Object.keys(clientsClustersData.clusters).forEach((clusterId) => {
+    Object.keys(membersData.clusters).forEach((clusterId) => {
         if (yPos > 180) {
             doc.addPage();
             yPos = 20;
@@ -687,7 +742,7 @@ function exportClientsClustersPDF() {
         doc.text(`Cluster ${clusterId} - Clientes`, 20, yPos);
         yPos += 10;
         
-        const clients = clientsClustersData.clusters[clusterId];
+        const clients = membersData.clusters[clusterId];
         const clientsData = clients.map(c => [
             c.IDCliente || '-',
             c.Ingresos_Total ? formatCurrency(c.Ingresos_Total) : '-',
@@ -722,7 +777,9 @@ function exportClientsClustersPDF() {
 
 function populateProductSelect() {
     const select = document.getElementById('producto-select');
-    select.innerHTML = '<option value="">Selecciona un producto...</option>';
+    select.innerHTML = productsList.length
+        ? '<option value="">Selecciona un producto...</option>'
+        : '<option value="">Sin productos que coincidan</option>';
     
     productsList.forEach(product => {
         const option = document.createElement('option');
@@ -764,6 +821,14 @@ function setupPredictionForm() {
     const productSelect = document.getElementById('producto-select');
     const categorySelect = document.getElementById('categoria-select');
 
+    // Buscar en el servidor, esperando a que el usuario deje de escribir
+    const searchInput = document.getElementById('producto-search');
+    let searchTimeout = null;
+    searchInput.addEventListener('input', () => {
+        clearTimeout(searchTimeout);
+        searchTimeout = setTimeout(loadProductsList, 250);
+    });
+
     // Auto-fill category when product is selected
     productSelect.addEventListener('change', (e) => {
         const selectedOption = e.target.options[e.target.selectedIndex];
@@ -824,11 +889,17 @@ function displayPredictionResult(result) {
 }
 
 // All Products Section
-async function loadAllProducts() {
+async function loadAllProducts(offset = 0) {
     try {
-        const response = await fetch('/api/products/list');
-        const products = await response.json();
-        displayAllProducts(products);
+        const page = await fetchPage('/api/products/list', {
+            offset: offset,
+            limit: PAGE_SIZE,
+            sort: 'Descripcion_Ingles',
+            q: document.getElementById('product-search')?.value.trim(),
+            category: document.getElementById('category-filter')?.value
+        });
+        displayAllProducts(page.items);
+        renderPager(document.getElementById('products-pager'), page, loadAllProducts);
     } catch (error) {
         console.error('Error loading all products:', error);
     }
@@ -860,7 +931,7 @@ function displayAllProducts(products) {
     });
 }
 
-function predictFromProduct(producto, categoria) {
+async function predictFromProduct(producto, categoria) {
     // Switch to prediction tab
     document.querySelectorAll('.nav-link').forEach(link => {
         if (link.getAttribute('href') === '#prediccion') {
@@ -868,12 +939,24 @@ function predictFromProduct(producto, categoria) {
         }
     });
 
+    // Buscar el producto para que esté entre las opciones del selector
+    document.getElementById('producto-search').value = producto;
+    await loadProductsList();
+    const productSelect = document.getElementById('producto-select');
+    if (![...productSelect.options].some(option => option.value === producto)) {
+        const option = document.createElement('option');
+        option.value = producto;
+        option.textContent = producto;
+        option.dataset.categoria = categoria;
+        productSelect.appendChild(option);
+    }
+
     // Fill form
-    document.getElementById('producto-select').value = producto;
+    productSelect.value = producto;
     document.getElementById('categoria-select').value = categoria;
 
     // Trigger change event
-    document.getElementById('producto-select').dispatchEvent(new Event('change'));
+    productSelect.dispatchEvent(new Event('change'));
 }
 
 // Search and Filter
@@ -889,23 +972,12 @@ function setupProductSearch() {
     }
 }
 
-function filterProducts() {
-    const searchTerm = document.getElementById('product-search').value.toLowerCase();
-    const categoryFilter = document.getElementById('category-filter').value;
-
-    const tbody = document.getElementById('table-all-products-body');
-    const rows = tbody.querySelectorAll('tr');
-
-    rows.forEach(row => {
-        const productoIngles = row.cells[1]?.textContent.toLowerCase() || '';
-        const productoEspanol = row.cells[2]?.textContent.toLowerCase() || '';
-        const categoria = row.cells[3]?.textContent || '';
-
-        const matchesSearch = productoIngles.includes(searchTerm) || productoEspanol.includes(searchTerm);
-        const matchesCategory = !categoryFilter || categoria === categoryFilter;
+let productSearchTimeout = null;
 
-        row.style.display = (matchesSearch && matchesCategory) ? '' : 'none';
-    });
+function filterProducts() {
+    // Filtrar en el servidor, esperando a que el usuario deje de escribir
+    clearTimeout(productSearchTimeout);
+    productSearchTimeout = setTimeout(() => loadAllProducts(0), 250);
 }
 
 // Clusters Functions
@@ -917,12 +989,12 @@ async function loadClustersData() {
         if (!response.ok) {
             throw new Error('No hay datos de clusters disponibles');
         }
+        // Solo el resumen; los productos se piden por páginas
         clustersData = await response.json();
-        clustersDataExport = clustersData;
         displayClustersSummary(clustersData);
         displayClustersChart(clustersData);
-        displayClustersTable(clustersData);
         setupClusterFilter(clustersData);
+        loadClustersTable(0);
     } catch (error) {
         console.error('Error loading clusters:', error);
         const summaryDiv = document.getElementById('clusters-summary');
@@ -1004,30 +1076,18 @@ function displayClustersChart(data) {
     Plotly.newPlot('chart-clusters', chartData, layout, { responsive: true });
 }
 
-// Variable global para almacenar todos los productos de clusters
-let allClusterProducts = [];
-
-function displayClustersTable(data) {
-    const tbody = document.getElementById('table-clusters-body');
-    tbody.innerHTML = '';
-    
-    if (!data.clusters || Object.keys(data.clusters).length === 0) {
-        tbody.innerHTML = '<tr><td colspan="6" class="loading">No hay datos disponibles</td></tr>';
-        return;
-    }
-    
-    // Combinar todos los productos de todos los clusters
-    allClusterProducts = [];
-    Object.keys(data.clusters).forEach(clusterId => {
-        data.clusters[clusterId].forEach(product => {
-            allClusterProducts.push({
-                ...product,
-                Cluster: clusterId
-            });
+async function loadClustersTable(offset = 0) {
+    try {
+        const page = await fetchPage('/api/clusters/products', {
+            cluster: document.getElementById('cluster-filter')?.value,
+            offset: offset,
+            limit: PAGE_SIZE
         });
-    });
-    
-    renderClusterProductsTable(allClusterProducts);
+        renderClusterProductsTable(page.items);
+        renderPager(document.getElementById('clusters-pager'), page, loadClustersTable);
+    } catch (error) {
+        console.error('Error loading clusters table:', error);
+    }
 }
 
 function renderClusterProductsTable(products) {
@@ -1055,11 +1115,16 @@ function renderClusterProductsTable(products) {
     });
 }
 
+const CLUSTER_PRODUCTS_SORT = {
+    'nombre': { sort: 'Descripcion_Español', order: 'asc' },
+    'ingresos-desc': { sort: 'Ingresos_Total', order: 'desc' },
+    'ingresos-asc': { sort: 'Ingresos_Total', order: 'asc' },
+    'cantidad-desc': { sort: 'Cantidad_Total', order: 'desc' },
+    'cantidad-asc': { sort: 'Cantidad_Total', order: 'asc' }
+};
+
 function showClusterProducts(clusterId) {
-    // Filtrar productos del cluster seleccionado
-    const clusterProducts = allClusterProducts.filter(p => p.Cluster == clusterId);
-    
-    // Crear modal o actualizar tabla
+    // Crear modal; los productos se piden al servidor por páginas
     const modal = document.createElement('div');
     modal.className = 'cluster-products-modal';
     modal.innerHTML = `
@@ -1092,73 +1157,58 @@ function showClusterProducts(clusterId) {
                             </tr>
                         </thead>
                         <tbody id="cluster-products-tbody">
-                            ${clusterProducts.map(p => `
-                                <tr>
-                                    <td>${p.CodigoStock}</td>
-                                    <td>${p.Descripcion_Ingles || '-'}</td>
-                                    <td>${p.Descripcion_Español || '-'}</td>
-                                    <td>${p.Categoria}</td>
-                                    <td>${p.Ingresos_Total ? formatCurrency(p.Ingresos_Total) : '-'}</td>
-                                    <td>${p.Cantidad_Total ? p.Cantidad_Total.toLocaleString() : '-'}</td>
-                                </tr>
-                            `).join('')}
+                            <tr><td colspan="6" class="loading">Cargando productos...</td></tr>
                         </tbody>
                     </table>
                 </div>
+                <div id="cluster-products-pager" class="pager"></div>
             </div>
         </div>
     `;
     
     document.body.appendChild(modal);
-    
-    // Guardar productos del cluster en el modal para ordenamiento
-    modal.dataset.products = JSON.stringify(clusterProducts);
+    loadClusterProductsPage(clusterId, 0);
 }
 
-function sortClusterProducts(clusterId) {
-    const modal = document.querySelector('.cluster-products-modal');
-    if (!modal) return;
-    
+async function loadClusterProductsPage(clusterId, offset) {
     const sortSelect = document.getElementById('sort-cluster-products');
-    const sortValue = sortSelect.value;
-    const products = JSON.parse(modal.dataset.products);
     const tbody = document.getElementById('cluster-products-tbody');
+    if (!sortSelect || !tbody) return;
     
-    let sortedProducts = [...products];
-    
-    switch(sortValue) {
-        case 'ingresos-desc':
-            sortedProducts.sort((a, b) => (b.Ingresos_Total || 0) - (a.Ingresos_Total || 0));
-            break;
-        case 'ingresos-asc':
-            sortedProducts.sort((a, b) => (a.Ingresos_Total || 0) - (b.Ingresos_Total || 0));
-            break;
-        case 'cantidad-desc':
-            sortedProducts.sort((a, b) => (b.Cantidad_Total || 0) - (a.Cantidad_Total || 0));
-            break;
-        case 'cantidad-asc':
-            sortedProducts.sort((a, b) => (a.Cantidad_Total || 0) - (b.Cantidad_Total || 0));
-            break;
-        case 'nombre':
-        default:
-            sortedProducts.sort((a, b) => {
-                const nameA = (a.Descripcion_Español || a.Descripcion_Ingles || '').toLowerCase();
-                const nameB = (b.Descripcion_Español || b.Descripcion_Ingles || '').toLowerCase();
-                return nameA.localeCompare(nameB);
-            });
-            break;
-    }
-    
-    tbody.innerHTML = sortedProducts.map(p => `
-        <tr>
-            <td>${p.CodigoStock}</td>
-            <td>${p.Descripcion_Ingles || '-'}</td>
-            <td>${p.Descripcion_Español || '-'}</td>
-            <td>${p.Categoria}</td>
-            <td>${p.Ingresos_Total ? formatCurrency(p.Ingresos_Total) : '-'}</td>
-            <td>${p.Cantidad_Total ? p.Cantidad_Total.toLocaleString() : '-'}</td>
-        </tr>
-    `).join('');
+    const sortOption = CLUSTER_PRODUCTS_SORT[sortSelect.value] || CLUSTER_PRODUCTS_SORT['nombre'];
+    
+    try {
+        const page = await fetchPage(`/api/clusters/${clusterId}`, {
+            offset: offset,
+            limit: PAGE_SIZE,
+            sort: sortOption.sort,
+            order: sortOption.order
+        });
+        
+        tbody.innerHTML = page.items.map(p => `
+            <tr>
+                <td>${p.CodigoStock}</td>
+                <td>${p.Descripcion_Ingles || '-'}</td>
+                <td>${p.Descripcion_Español || '-'}</td>
+                <td>${p.Categoria}</td>
+                <td>${p.Ingresos_Total ? formatCurrency(p.Ingresos_Total) : '-'}</td>
+                <td>${p.Cantidad_Total ? p.Cantidad_Total.toLocaleString() : '-'}</td>
+            </tr>
+        `).join('');
+        
+        renderPager(
+            document.getElementById('cluster-products-pager'),
+            page,
+            newOffset => loadClusterProductsPage(clusterId, newOffset)
+        );
+    } catch (error) {
+        console.error('Error loading cluster products:', error);
+    }
+}
+
+function sortClusterProducts(clusterId) {
+    // Reordenar en el servidor volviendo a la primera página
+    loadClusterProductsPage(clusterId, 0);
 }
 
 function setupClusterFilter(data) {
@@ -1174,18 +1224,8 @@ function setupClusterFilter(data) {
         });
     }
     
-    filterSelect.addEventListener('change', (e) => {
-        const selectedCluster = e.target.value;
-        const rows = document.querySelectorAll('#table-clusters-body tr');
-        
-        rows.forEach(row => {
-            if (!selectedCluster || row.dataset.cluster === selectedCluster) {
-                row.style.display = '';
-            } else {
-                row.style.display = 'none';
-            }
-        });
-    });
+    // Filtrar en el servidor volviendo a la primera página
+    filterSelect.onchange = () => loadClustersTable(0);
 }
 
 // Add button style
@@ -1898,13 +1938,21 @@ function exportDashboardPDF() {
         });
 }
 
-function exportClustersPDF() {
+async function exportClustersPDF() {
     if (!window.jspdf) {
         alert('Error: jsPDF no está cargado. Por favor, recarga la página.');
         return;
     }
     
-    if (!clustersDataExport) {
+    // Los productos de cada cluster se piden solo al exportar
+    let clustersDataExport;
+    try {
+        const response = await fetch('/api/clusters?miembros=true');
+        if (!response.ok) {
+            throw new Error('No hay datos de clusters disponibles');
+        }
+        clustersDataExport = await response.json();
+    } catch (error) {
         alert('No hay datos de clusters disponibles');
         return;
     }
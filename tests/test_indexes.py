@@ -0,0 +1,48 @@
+"""
+Pruebas de los índices de productos: buscar varios productos a la vez debe
+dar lo mismo que buscarlos uno por uno, también después de una ingesta
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from indexes import ProductIndex  # noqa: E402
+
+
+def _frame(rows):
+    return pd.DataFrame.from_records(rows, columns=[
+        'CodigoStock', 'Descripcion_Ingles', 'Descripcion_Español', 'PrecioUnitario', 'Categoria'
+    ])
+
+
+def _assert_matches(index, productos):
+    found, prices, categories = index.lookup_many(productos)
+    for producto, f, price, category in zip(productos, found, prices, categories):
+        info = index.lookup(producto)
+        assert f == (info is not None)
+        if info is None:
+            assert np.isnan(price) and category is None
+        else:
+            assert price == info['precio_promedio'] and category == info['categoria']
+
+
+def test_lookup_many_matches_lookup_after_update():
+    index = ProductIndex(_frame([
+        ('S001', 'Milk', 'Leche', 1.0, 'Lácteos'),
+        ('S001', 'Milk', 'Leche', 2.0, 'Lácteos'),
+        ('S002', 'Bread', 'Bread', 3.0, 'Panadería'),
+    ]))
+    productos = ['Milk', 'Leche', 'S001', 'Bread', 'S002', 'Tea', 'Té', '']
+    _assert_matches(index, productos)
+
+    index.update(_frame([
+        ('S001', 'Milk', 'Leche', 6.0, 'Lácteos'),
+        ('S003', 'Tea', 'Té', 4.0, 'Bebidas'),
+    ]))
+    _assert_matches(index, productos)
+    assert index.lookup_many(['Milk'])[1][0] == 3.0
@@ -0,0 +1,44 @@
+"""Pruebas de los listados paginados"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from listings import Listing  # noqa: E402
+
+
+def _listing():
+    frame = pd.DataFrame({
+        'Producto': [f'P{i}' for i in range(12)],
+        'Categoria': ['A', 'B', 'C', None] * 3,
+        'Cluster': [0, 1, 2] * 4,
+        'Ingresos_Total': np.arange(12, 0, -1, dtype=float)
+    })
+    return Listing(frame, sort_columns=['Producto', 'Ingresos_Total'], search_columns=['Producto'],
+                   filter_columns={'category': 'Categoria', 'cluster': 'Cluster'})
+
+
+def test_filters_match_a_full_scan():
+    listing = _listing()
+    for sort in (None, 'Producto', 'Ingresos_Total'):
+        for order in ('asc', 'desc'):
+            for filters in ({'category': 'B'}, {'cluster': 2}, {'category': 'A', 'cluster': 0}, {'category': 'Z'}):
+                page = listing.page(limit=None, sort=sort, order=order, **filters)
+                expected = listing.page(limit=None, sort=sort, order=order)['items']
+                expected = [r for r in expected if all(
+                    r[{'category': 'Categoria', 'cluster': 'Cluster'}[p]] == v for p, v in filters.items()
+                )]
+                assert page['items'] == expected
+
+
+def test_unknown_filter_values_are_not_cached():
+    listing = _listing()
+    cached = len(listing._ordered)
+    for i in range(100):
+        assert listing.page(category=f'desconocida-{i}')['total'] == 0
+        listing.page(category='A', cluster=i % 3)
+    assert len(listing._ordered) == cached
@@ -0,0 +1,69 @@
+"""
+Pruebas del límite de entrenamientos: se cumple entre procesos (como entre
+workers de gunicorn) y los trabajos terminados no cuentan como activos
+"""
+
+import multiprocessing
+import os
+import sys
+from concurrent.futures import Future
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import training_jobs  # noqa: E402
+from training_jobs import ACTIVE_DIR, DONE, JobLimitError, TrainingJobs  # noqa: E402
+
+
+class _PendingExecutor:
+    """Pool que acepta trabajos sin ejecutarlos (quedan en cola)"""
+
+    def submit(self, *args):
+        return Future()
+
+
+def _jobs(jobs_dir, max_jobs=1):
+    jobs = TrainingJobs(max_jobs=max_jobs, jobs_dir=jobs_dir)
+    jobs._executor = _PendingExecutor
+    return jobs
+
+
+def _submit_from_worker(jobs_dir, barrier, results):
+    barrier.wait()
+    try:
+        _jobs(jobs_dir).submit({}, 'datos.csv')
+        results.put('encolado')
+    except JobLimitError:
+        results.put('rechazado')
+    # Seguir vivo hasta que todos cuenten: un worker muerto deja su trabajo como fallido
+    barrier.wait()
+
+
+@pytest.mark.skipif(training_jobs.fcntl is None, reason='usa fork')
+def test_limit_holds_across_processes(tmp_path):
+    context = multiprocessing.get_context('fork')
+    workers = 6
+    barrier = context.Barrier(workers)
+    results = context.Queue()
+    processes = [
+        context.Process(target=_submit_from_worker, args=(str(tmp_path), barrier, results)) for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    outcomes = sorted(results.get(timeout=30) for _ in processes)
+    for process in processes:
+        process.join(timeout=30)
+    assert outcomes == ['encolado'] + ['rechazado'] * (workers - 1)
+
+
+def test_finished_jobs_are_not_counted(tmp_path):
+    jobs = _jobs(str(tmp_path))
+    status = jobs.submit({}, 'datos.csv')
+    with pytest.raises(JobLimitError):
+        jobs.submit({}, 'datos.csv')
+
+    training_jobs._write_status(str(tmp_path), {**status, 'estado': DONE})
+    assert os.listdir(tmp_path / ACTIVE_DIR) == []
+    assert jobs.active() == []
+    assert jobs.submit({}, 'datos.csv')['id'] != status['id']
@@ -7,36 +7,108 @@ import pandas as pd
 import numpy as np
 import joblib
 import os
+import shutil
 import argparse
+import json
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import LabelEncoder, StandardScaler
-from sklearn.cluster import KMeans
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.metrics import davies_bouldin_score, r2_score, silhouette_score
+from threadpoolctl import threadpool_limits
+from data_cache import load_frame, save_frame
+from schema import USED_COLUMNS, apply_schema, memory_usage_mb
+from aggregates import PRODUCT_KEYS
+from features import cluster_features, load_feature_tables
+from neighbors import build_neighbors_index
+from compact_model import FlatForest
 import warnings
 warnings.filterwarnings('ignore')
 
+try:
+    import resource
+except ImportError:
+    # No disponible en Windows: el informe no incluye memoria pico
+    resource = None
+
 # Rutas
 DATA_PATH = 'SUPERMERCADO_500_000_ESPAÑOL.csv'
 MODELS_DIR = 'models'
 MODEL_PATH = os.path.join(MODELS_DIR, 'model_rentabilidad.pkl')
+COMPACT_MODEL_DIR = os.path.join(MODELS_DIR, 'model_rentabilidad_compact')
 CLUSTER_MODEL_PATH = os.path.join(MODELS_DIR, 'model_clusters.pkl')
 CLUSTER_CLIENTS_MODEL_PATH = os.path.join(MODELS_DIR, 'model_clusters_clientes.pkl')
 LABEL_ENCODER_PATH = os.path.join(MODELS_DIR, 'label_encoders.pkl')
 SCALER_PATH = os.path.join(MODELS_DIR, 'scaler.pkl')
 SCALER_CLIENTS_PATH = os.path.join(MODELS_DIR, 'scaler_clientes.pkl')
+K_SCORES_PATH = os.path.join(MODELS_DIR, 'product_k_scores.csv')
+K_SCORES_CLIENTS_PATH = os.path.join(MODELS_DIR, 'client_k_scores.csv')
+CLUSTER_DATA_PATH = os.path.join(MODELS_DIR, 'product_clusters.csv')
+CLUSTER_CLIENTS_DATA_PATH = os.path.join(MODELS_DIR, 'client_clusters.csv')
+# Índices de vecinos sobre las características escaladas de cada clustering
+NEIGHBORS_PATH = os.path.join(MODELS_DIR, 'neighbors_productos.pkl')
+NEIGHBORS_CLIENTS_PATH = os.path.join(MODELS_DIR, 'neighbors_clientes.pkl')
+TRAINING_REPORT_PATH = os.path.join(MODELS_DIR, 'training_report.json')
+# Versión activa de los artefactos (cambia con cada entrenamiento guardado)
+ARTIFACT_VERSION_PATH = os.path.join(MODELS_DIR, 'version.json')
+# Cada entrenamiento escribe sus artefactos en models/versions/<versión>/
+VERSIONS_DIR = os.path.join(MODELS_DIR, 'versions')
+# Versiones anteriores a la activa que se conservan (para volver atrás)
+ARTIFACT_VERSIONS_KEPT = 3
+# Constantes de rutas que set_artifact_dir() apunta al directorio de una versión
+ARTIFACT_PATH_NAMES = ('MODEL_PATH', 'COMPACT_MODEL_DIR', 'CLUSTER_MODEL_PATH', 'CLUSTER_CLIENTS_MODEL_PATH',
+                       'LABEL_ENCODER_PATH', 'SCALER_PATH', 'SCALER_CLIENTS_PATH', 'K_SCORES_PATH',
+                       'K_SCORES_CLIENTS_PATH', 'CLUSTER_DATA_PATH', 'CLUSTER_CLIENTS_DATA_PATH',
+                       'NEIGHBORS_PATH', 'NEIGHBORS_CLIENTS_PATH')
+# Opciones de la línea de comandos que no se pueden pedir por /api/train
+API_EXCLUDED_OPTIONS = ('help', 'pipeline', 'cores', 'report')
+
+# Límites del bosque compacto (--compact-model)
+COMPACT_MAX_DEPTH = 14
+COMPACT_MIN_SAMPLES_LEAF = 20
+
+# Modos de clustering: exacto (KMeans) o por lotes (MiniBatchKMeans con partial_fit)
+CLUSTER_MODES = ['exact', 'minibatch']
+DEFAULT_BATCH_SIZE = 4096
+# Pasadas completas sobre los datos en el modo por lotes
+MINIBATCH_EPOCHS = 5
+# Columnas de la tabla de características que guarda cada tipo de clustering de productos
+PRODUCT_CLUSTER_COLUMNS = {
+    'productos': ['Ingresos_Total', 'Ingresos_Promedio', 'Cantidad_Total', 'Cantidad_Promedio',
+                  'Precio_Promedio', 'Clientes_Unicos'],
+    'rentabilidad': ['Ingresos_Total', 'Ingresos_Promedio', 'Ingresos_Std', 'Cantidad_Total', 'Precio_Promedio'],
+    'cantidad': ['Cantidad_Total', 'Cantidad_Promedio', 'Cantidad_Std', 'Cantidad_Max',
+                 'Ingresos_Total', 'Precio_Promedio']
+}
+# Muestra usada para el silhouette en la búsqueda automática de k
+SILHOUETTE_SAMPLE_SIZE = 10000
 
 def load_and_preprocess_data():
     """Carga y preprocesa los datos"""
     print("Cargando datos...")
-    df = pd.read_csv(DATA_PATH, encoding='utf-8')
-    
-    # Calcular ingresos (rentabilidad)
-    df['Ingresos'] = df['Cantidad'] * df['PrecioUnitario']
-    
-    # Convertir fecha
-    df['Fecha'] = pd.to_datetime(df['Fecha'], format='%d/%m/%Y', errors='coerce')
-    df['Mes'] = df['Fecha'].dt.month
-    df['DiaSemana'] = df['Fecha'].dt.dayofweek
+    # Usar la caché columnar si el CSV no cambió desde la última ejecución
+    df = load_frame(DATA_PATH)
+    if df is not None:
+        print(f"Datos cargados desde caché ({memory_usage_mb(df):.1f} MB)")
+    else:
+        # Leer solo las columnas que se usan
+        df = pd.read_csv(DATA_PATH, encoding='utf-8', usecols=lambda col: col in USED_COLUMNS)
+        
+        # Calcular ingresos (rentabilidad)
+        df['Ingresos'] = df['Cantidad'] * df['PrecioUnitario']
+        
+        # Convertir fecha
+        df['Fecha'] = pd.to_datetime(df['Fecha'], format='%d/%m/%Y', errors='coerce')
+        df['Mes'] = df['Fecha'].dt.month
+        df['DiaSemana'] = df['Fecha'].dt.dayofweek
+        
+        # Tipos compactos: categóricos para textos y enteros reducidos
+        df = apply_schema(df)
+        save_frame(df, DATA_PATH)
     
     # Codificar categorías
     label_encoders = {}
@@ -46,33 +118,205 @@ def load_and_preprocess_data():
     print(f"Datos cargados: {len(df)} registros")
     return df, label_encoders
 
-def train_prediction_model(df, label_encoders):
-    """Entrena el modelo de predicción de rentabilidad"""
-    print("\n=== Entrenando Modelo de Predicción ===")
-    
-    # Preparar características
+def prediction_split(df):
+    """Características y división train/test del modelo de predicción"""
     features = ['Cantidad', 'PrecioUnitario', 'Categoria_Encoded', 'Mes', 'DiaSemana', 'Hora_24h']
     X = df[features].fillna(0)
     y = df['Ingresos']
+    return train_test_split(X, y, test_size=0.2, random_state=42)
+
+def train_prediction_model(df, label_encoders, n_jobs=-1, compact=False):
+    """
+    Entrena el modelo de predicción de rentabilidad
+    
+    Args:
+        n_jobs: Núcleos del Random Forest
+        compact: Bosque con profundidad y hojas limitadas, convertido a arreglos
+            planos (FlatForest) que se cargan con memoria mapeada
+    """
+    print("\n=== Entrenando Modelo de Predicción ===")
     
-    # Dividir datos
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    # Preparar características y dividir datos
+    X_train, X_test, y_train, y_test = prediction_split(df)
     
     # Entrenar modelo
-    print("Entrenando Random Forest Regressor...")
-    model = RandomForestRegressor(n_estimators=100, random_state=42, n_jobs=-1, verbose=1)
+    if compact:
+        print(f"Entrenando Random Forest compacto (max_depth={COMPACT_MAX_DEPTH}, "
+              f"min_samples_leaf={COMPACT_MIN_SAMPLES_LEAF})...")
+        model = RandomForestRegressor(
+            n_estimators=100, max_depth=COMPACT_MAX_DEPTH, min_samples_leaf=COMPACT_MIN_SAMPLES_LEAF,
+            random_state=42, n_jobs=n_jobs, verbose=1
+        )
+    else:
+        print("Entrenando Random Forest Regressor...")
+        model = RandomForestRegressor(n_estimators=100, random_state=42, n_jobs=n_jobs, verbose=1)
     model.fit(X_train, y_train)
     
+    if compact:
+        model = FlatForest.from_forest(model)
+        print(f"Modelo compacto: {model.n_nodes:,} nodos, profundidad máxima {model.max_depth}")
+    
     # Evaluar
-    train_score = model.score(X_train, y_train)
-    test_score = model.score(X_test, y_test)
+    train_score = r2_score(y_train, model.predict(X_train))
+    test_score = r2_score(y_test, model.predict(X_test))
     
     print(f"R² Score (Train): {train_score:.4f}")
     print(f"R² Score (Test): {test_score:.4f}")
     
     return model
 
-def create_clusters(df, n_clusters=5, cluster_type='rentabilidad'):
+def iter_chunks(n_rows, batch_size):
+    """Rangos (inicio, fin) que recorren n_rows filas en bloques de batch_size"""
+    for start in range(0, n_rows, batch_size):
+        yield start, min(start + batch_size, n_rows)
+
+def fit_exact(X, n_clusters):
+    """Ajusta scaler y KMeans completo (n_init=10) sobre toda la matriz"""
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(X)
+    
+    print("Aplicando KMeans clustering...")
+    kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init=10, verbose=1)
+    clusters = kmeans.fit_predict(X_scaled)
+    return kmeans, scaler, clusters, float(kmeans.inertia_)
+
+def fit_minibatch(X, n_clusters, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Ajusta scaler y centroides por bloques con partial_fit, sin escalar ni
+    recorrer toda la matriz de una vez (modo por lotes para muchos registros)
+    """
+    X = np.asarray(X, dtype=np.float64)
+    n_rows = len(X)
+    batch_size = max(batch_size, n_clusters)
+    
+    # Media y varianza del scaler acumuladas bloque a bloque
+    scaler = StandardScaler()
+    for start, end in iter_chunks(n_rows, batch_size):
+        scaler.partial_fit(X[start:end])
+    
+    print(f"Aplicando MiniBatchKMeans clustering (lotes de {batch_size}, {MINIBATCH_EPOCHS} pasadas)...")
+    kmeans = MiniBatchKMeans(n_clusters=n_clusters, random_state=42, batch_size=batch_size, n_init=3)
+    rng = np.random.RandomState(42)
+    for epoch in range(MINIBATCH_EPOCHS):
+        # Bloques en orden aleatorio en cada pasada para no sesgar los centroides
+        order = rng.permutation(n_rows)
+        for start, end in iter_chunks(n_rows, batch_size):
+            kmeans.partial_fit(scaler.transform(X[order[start:end]]))
+    
+    # Asignación e inercia finales también por bloques
+    clusters = np.empty(n_rows, dtype=np.int32)
+    inertia = 0.0
+    for start, end in iter_chunks(n_rows, batch_size):
+        chunk = scaler.transform(X[start:end])
+        clusters[start:end] = kmeans.predict(chunk)
+        inertia -= kmeans.score(chunk)
+    return kmeans, scaler, clusters, inertia
+
+def fit_clusters(X, n_clusters, mode='exact', batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Ajusta el clustering en el modo indicado e informa tiempo e inercia
+    
+    Returns:
+        Tupla (kmeans, scaler, clusters, informe) donde informe tiene
+        modo, tiempo_s e inercia
+    """
+    start = time.perf_counter()
+    if mode == 'minibatch':
+        kmeans, scaler, clusters, inertia = fit_minibatch(X, n_clusters, batch_size)
+    elif mode == 'exact':
+        kmeans, scaler, clusters, inertia = fit_exact(X, n_clusters)
+    else:
+        raise ValueError(f"Modo de clustering no válido: {mode}")
+    elapsed = time.perf_counter() - start
+    
+    print(f"Modo {mode}: {elapsed:.2f} s, inercia {inertia:,.2f}")
+    report = {'modo': mode, 'tiempo_s': elapsed, 'inercia': inertia}
+    return kmeans, scaler, clusters, report
+
+def compare_cluster_modes(X, n_clusters, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Ajusta ambos modos sobre los mismos datos y muestra tiempo e inercia
+    
+    Returns:
+        Diccionario {modo: resultado de fit_clusters}
+    """
+    fits = {mode: fit_clusters(X, n_clusters, mode, batch_size) for mode in CLUSTER_MODES}
+    reports = [fit[3] for fit in fits.values()]
+    exact = fits['exact'][3]
+    
+    print("\nComparación de modos de clustering:")
+    print(f"{'Modo':<12}{'Tiempo (s)':>12}{'Inercia':>20}{'vs exacto':>12}")
+    for report in reports:
+        ratio = report['inercia'] / exact['inercia'] if exact['inercia'] else float('nan')
+        print(f"{report['modo']:<12}{report['tiempo_s']:>12.2f}{report['inercia']:>20,.2f}{ratio:>11.3f}x")
+    return fits
+
+# Matriz escalada compartida por los procesos de la búsqueda de k
+_sweep_data = {}
+
+def _init_k_worker(X_scaled, sample):
+    # Cada proceso recibe la matriz una sola vez y usa un solo hilo para no
+    # competir por los núcleos con los demás procesos
+    _sweep_data['X'] = X_scaled
+    _sweep_data['sample'] = sample
+    threadpool_limits(1)
+
+def _score_k(k, mode, batch_size):
+    """Ajusta k clusters y calcula inercia, silhouette (muestra) y Davies-Bouldin"""
+    X = _sweep_data['X']
+    sample = _sweep_data['sample']
+    start = time.perf_counter()
+    if mode == 'minibatch':
+        kmeans = MiniBatchKMeans(n_clusters=k, random_state=42, batch_size=batch_size, n_init=3)
+    else:
+        kmeans = KMeans(n_clusters=k, random_state=42, n_init=10)
+    labels = kmeans.fit_predict(X)
+    
+    sample_labels = labels[sample]
+    silhouette = (
+        silhouette_score(X[sample], sample_labels) if len(np.unique(sample_labels)) > 1 else float('nan')
+    )
+    return {
+        'k': k,
+        'inercia': float(kmeans.inertia_),
+        'silhouette': float(silhouette),
+        'davies_bouldin': float(davies_bouldin_score(X, labels)),
+        'tiempo_s': time.perf_counter() - start
+    }
+
+def select_n_clusters(X, k_values, mode='exact', batch_size=DEFAULT_BATCH_SIZE, n_jobs=None):
+    """
+    Evalúa varios valores de k en paralelo (un proceso por núcleo) y elige
+    el de mayor silhouette; en empate, el de menor Davies-Bouldin
+    
+    Returns:
+        Tupla (k elegido, DataFrame con los puntajes de cada k)
+    """
+    X_scaled = StandardScaler().fit_transform(X)
+    k_values = [k for k in k_values if 2 <= k < len(X_scaled)]
+    if not k_values:
+        raise ValueError("No hay valores de k válidos para el número de registros")
+    
+    rng = np.random.RandomState(42)
+    sample = np.sort(rng.choice(len(X_scaled), min(SILHOUETTE_SAMPLE_SIZE, len(X_scaled)), replace=False))
+    n_jobs = min(n_jobs or os.cpu_count() or 1, len(k_values))
+    
+    print(f"Buscando k en {k_values[0]}..{k_values[-1]} con {n_jobs} procesos...")
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_k_worker, initargs=(X_scaled, sample)) as pool:
+        # Los k más grandes tardan más: se envían primero para repartir mejor
+        futures = [pool.submit(_score_k, k, mode, batch_size) for k in sorted(k_values, reverse=True)]
+        scores = pd.DataFrame([future.result() for future in futures]).sort_values('k').reset_index(drop=True)
+    
+    best = scores.sort_values(['silhouette', 'davies_bouldin', 'k'], ascending=[False, True, True]).iloc[0]
+    scores['elegido'] = scores['k'] == best['k']
+    print(scores.to_string(index=False))
+    print(f"k elegido: {int(best['k'])} (búsqueda completa en {time.perf_counter() - start:.2f} s)")
+    return int(best['k']), scores
+
+def create_clusters(df, n_clusters=5, cluster_type='rentabilidad', mode='exact',
+                    batch_size=DEFAULT_BATCH_SIZE, compare=False, k_values=None, scores_path=None, n_jobs=None,
+                    feature_tables=None):
     """
     Crea clusters según el tipo especificado
     
@@ -84,131 +328,32 @@ def create_clusters(df, n_clusters=5, cluster_type='rentabilidad'):
             - 'rentabilidad': Agrupa por nivel de rentabilidad
             - 'cantidad': Agrupa por cantidad vendida
             - 'clientes': Agrupa clientes por comportamiento de compra
+        mode: 'exact' (KMeans) o 'minibatch' (MiniBatchKMeans por lotes)
+        batch_size: Filas por lote en el modo minibatch
+        compare: Ajustar también el otro modo y mostrar la comparación
+        k_values: Valores de k a evaluar; si se indica, n_clusters se elige automáticamente
+        scores_path: CSV donde guardar los puntajes de cada k
+        n_jobs: Procesos para la búsqueda de k (default: uno por núcleo)
+        feature_tables: Tablas de load_feature_tables(); si no se indican se calculan desde df
     """
     print(f"\n=== Creando Clusters ({cluster_type}) ===")
-    print(f"Número de clusters: {n_clusters}")
+    print(f"Número de clusters: {'automático' if k_values else n_clusters}")
+    print(f"Modo: {mode}")
+    
+    # Leer las métricas de la tabla de características compartida (una sola agregación)
+    if feature_tables is None:
+        feature_tables = load_feature_tables(df)
     
     # Preparar datos según el tipo de clustering
-    if cluster_type == 'productos':
-        # Agrupar por producto y calcular métricas
-        product_data = df.groupby(['CodigoStock', 'Descripcion_Ingles', 'Descripcion_Español', 'Categoria']).agg({
-            'Ingresos': ['sum', 'mean'],
-            'Cantidad': ['sum', 'mean'],
-            'PrecioUnitario': 'mean',
-            'IDCliente': 'nunique'
-        }).reset_index()
-        
-        product_data.columns = ['CodigoStock', 'Descripcion_Ingles', 'Descripcion_Español', 'Categoria', 
-                               'Ingresos_Total', 'Ingresos_Promedio', 
-                               'Cantidad_Total', 'Cantidad_Promedio', 
-                               'Precio_Promedio', 'Clientes_Unicos']
-        
-        # Características para clustering
-        features_for_clustering = ['Ingresos_Total', 'Ingresos_Promedio', 
-                                  'Cantidad_Total', 'Cantidad_Promedio', 
-                                  'Precio_Promedio', 'Clientes_Unicos']
-        
-        X_cluster = product_data[features_for_clustering].fillna(0)
-        # Reemplazar infinitos con valores finitos
-        X_cluster = X_cluster.replace([np.inf, -np.inf], 0)
-        product_data['Producto'] = product_data['Descripcion_Ingles']
-        
-    elif cluster_type == 'rentabilidad':
-        # Agrupar por producto y calcular rentabilidad
-        product_data = df.groupby(['CodigoStock', 'Descripcion_Ingles', 'Descripcion_Español', 'Categoria']).agg({
-            'Ingresos': ['sum', 'mean', 'std'],
-            'Cantidad': 'sum',
-            'PrecioUnitario': 'mean'
-        }).reset_index()
-        
-        product_data.columns = ['CodigoStock', 'Descripcion_Ingles', 'Descripcion_Español', 'Categoria',
-                               'Ingresos_Total', 'Ingresos_Promedio', 'Ingresos_Std',
-                               'Cantidad_Total', 'Precio_Promedio']
-        
-        # Calcular métricas de rentabilidad
-        product_data['Rentabilidad_Total'] = product_data['Ingresos_Total']
-        product_data['Rentabilidad_Promedio'] = product_data['Ingresos_Promedio']
-        product_data['Rentabilidad_Estabilidad'] = product_data['Ingresos_Std'].fillna(0)
-        
-        # Calcular ROI con protección contra división por cero
-        denominator = product_data['Cantidad_Total'] * product_data['Precio_Promedio']
-        # Evitar división por cero usando np.where
-        product_data['ROI'] = np.where(
-            denominator != 0,
-            product_data['Ingresos_Total'] / denominator,
-            0
-        )
-        # Reemplazar cualquier infinito o NaN que pueda quedar
-        product_data['ROI'] = product_data['ROI'].replace([np.inf, -np.inf], 0).fillna(0)
-        
-        features_for_clustering = ['Rentabilidad_Total', 'Rentabilidad_Promedio', 
-                                  'Rentabilidad_Estabilidad', 'ROI']
-        
-        X_cluster = product_data[features_for_clustering].fillna(0)
-        
-        # Reemplazar infinitos con valores finitos
-        X_cluster = X_cluster.replace([np.inf, -np.inf], 0)
-        product_data['Producto'] = product_data['Descripcion_Ingles']
-        
-    elif cluster_type == 'cantidad':
-        # Agrupar por producto y cantidad
-        product_data = df.groupby(['CodigoStock', 'Descripcion_Ingles', 'Descripcion_Español', 'Categoria']).agg({
-            'Cantidad': ['sum', 'mean', 'std', 'max'],
-            'Ingresos': 'sum',
-            'PrecioUnitario': 'mean'
-        }).reset_index()
-        
-        product_data.columns = ['CodigoStock', 'Descripcion_Ingles', 'Descripcion_Español', 'Categoria',
-                               'Cantidad_Total', 'Cantidad_Promedio', 
-                               'Cantidad_Std', 'Cantidad_Max',
-                               'Ingresos_Total', 'Precio_Promedio']
-        
-        features_for_clustering = ['Cantidad_Total', 'Cantidad_Promedio', 
-                                  'Cantidad_Std', 'Cantidad_Max']
-        
-        X_cluster = product_data[features_for_clustering].fillna(0)
-        # Reemplazar infinitos con valores finitos
-        X_cluster = X_cluster.replace([np.inf, -np.inf], 0)
+    if cluster_type in ('productos', 'rentabilidad', 'cantidad'):
+        product_data = feature_tables['productos'][PRODUCT_KEYS + PRODUCT_CLUSTER_COLUMNS[cluster_type]].copy()
+        X_cluster = cluster_features(product_data, cluster_type)
         product_data['Producto'] = product_data['Descripcion_Ingles']
     
     elif cluster_type == 'clientes':
-        # Agrupar por cliente y calcular métricas de comportamiento
-        client_data = df.groupby('IDCliente').agg({
-            'Ingresos': ['sum', 'mean', 'count'],
-            'Cantidad': ['sum', 'mean'],
-            'PrecioUnitario': 'mean',
-            'CodigoStock': 'nunique',
-            'Categoria': 'nunique',
-            'Fecha': ['min', 'max']
-        }).reset_index()
-        
-        client_data.columns = ['IDCliente', 'Ingresos_Total', 'Ingresos_Promedio', 'Num_Transacciones',
-                              'Cantidad_Total', 'Cantidad_Promedio', 'Precio_Promedio',
-                              'Productos_Unicos', 'Categorias_Unicas', 'Primera_Compra', 'Ultima_Compra']
-        
-        # Calcular días desde primera compra
-        client_data['Primera_Compra'] = pd.to_datetime(client_data['Primera_Compra'])
-        client_data['Ultima_Compra'] = pd.to_datetime(client_data['Ultima_Compra'])
-        client_data['Dias_Activo'] = (client_data['Ultima_Compra'] - client_data['Primera_Compra']).dt.days
-        client_data['Dias_Activo'] = client_data['Dias_Activo'].fillna(0)
-        
-        # Calcular frecuencia de compra
-        client_data['Frecuencia_Compra'] = np.where(
-            client_data['Dias_Activo'] > 0,
-            client_data['Num_Transacciones'] / (client_data['Dias_Activo'] + 1),
-            client_data['Num_Transacciones']
-        )
-        
-        # Calcular valor promedio por transacción
-        client_data['Valor_Promedio_Transaccion'] = client_data['Ingresos_Total'] / client_data['Num_Transacciones']
-        client_data['Valor_Promedio_Transaccion'] = client_data['Valor_Promedio_Transaccion'].fillna(0)
-        
-        features_for_clustering = ['Ingresos_Total', 'Num_Transacciones', 'Cantidad_Total',
-                                  'Productos_Unicos', 'Frecuencia_Compra', 'Valor_Promedio_Transaccion']
-        
-        X_cluster = client_data[features_for_clustering].fillna(0)
-        # Reemplazar infinitos con valores finitos
-        X_cluster = X_cluster.replace([np.inf, -np.inf], 0)
+        # Métricas de comportamiento de compra por cliente
+        client_data = feature_tables['clientes']
+        X_cluster = cluster_features(client_data, cluster_type)
         product_data = client_data.copy()
         product_data['Cliente'] = client_data['IDCliente'].astype(str)
     
@@ -236,14 +381,18 @@ def create_clusters(df, n_clusters=5, cluster_type='rentabilidad'):
     # Verificación final
     assert np.all(np.isfinite(X_cluster.values)), "Error: Aún hay valores no finitos en los datos después de la limpieza"
     
-    # Normalizar características
-    scaler = StandardScaler()
-    X_cluster_scaled = scaler.fit_transform(X_cluster)
+    # Elegir el número de clusters evaluando varios k en paralelo
+    if k_values:
+        n_clusters, scores = select_n_clusters(X_cluster, k_values, mode, batch_size, n_jobs)
+        if scores_path:
+            save_artifact(scores, scores_path)
+            print(f"Puntajes por k guardados en: {scores_path}")
     
-    # Aplicar KMeans
-    print("Aplicando KMeans clustering...")
-    kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init=10, verbose=1)
-    clusters = kmeans.fit_predict(X_cluster_scaled)
+    # Normalizar características y aplicar KMeans en el modo elegido
+    if compare:
+        kmeans, scaler, clusters, _ = compare_cluster_modes(X_cluster, n_clusters, batch_size)[mode]
+    else:
+        kmeans, scaler, clusters, _ = fit_clusters(X_cluster, n_clusters, mode, batch_size)
     
     product_data['Cluster'] = clusters
     
@@ -265,14 +414,37 @@ def create_clusters(df, n_clusters=5, cluster_type='rentabilidad'):
     
     return kmeans, scaler, product_data
 
-def save_models(model, kmeans, scaler, label_encoders, cluster_type, kmeans_clients=None, scaler_clients=None):
-    """Guarda todos los modelos entrenados"""
+def save_artifact(obj, path):
+    """
+    Guarda un DataFrame (CSV) u objeto (joblib) en un temporal y lo renombra:
+    el archivo anterior, que puede ser un enlace duro de otra versión, no se modifica
+    """
+    tmp_path = path + '.tmp'
+    if isinstance(obj, pd.DataFrame):
+        obj.to_csv(tmp_path, index=False, encoding='utf-8')
+    else:
+        joblib.dump(obj, tmp_path)
+    os.replace(tmp_path, path)
+
+def save_models(model, kmeans, scaler, label_encoders, cluster_type, kmeans_clients=None, scaler_clients=None,
+                product_data=None, clients_data=None):
+    """
+    Guarda los modelos entrenados (los que son None no se sobrescriben)
+    Con los datos de clusters (product_data, clients_data) guarda también el
+    índice de vecinos de cada clustering
+    """
     # Crear directorio si no existe
     os.makedirs(MODELS_DIR, exist_ok=True)
     
     # Guardar modelo de predicción
-    joblib.dump(model, MODEL_PATH)
-    print(f"\nModelo de predicción guardado en: {MODEL_PATH}")
+    if isinstance(model, FlatForest):
+        model.save(COMPACT_MODEL_DIR)
+        print(f"\nModelo de predicción compacto guardado en: {COMPACT_MODEL_DIR}")
+    elif model is not None:
+        save_artifact(model, MODEL_PATH)
+        print(f"\nModelo de predicción guardado en: {MODEL_PATH}")
+        # La aplicación prefiere el modelo compacto: quitar uno anterior para usar este
+        shutil.rmtree(COMPACT_MODEL_DIR, ignore_errors=True)
     
     # Guardar modelo de clustering de productos
     if kmeans is not None:
@@ -281,13 +453,17 @@ def save_models(model, kmeans, scaler, label_encoders, cluster_type, kmeans_clie
             'cluster_type': cluster_type,
             'n_clusters': kmeans.n_clusters
         }
-        joblib.dump(cluster_info, CLUSTER_MODEL_PATH)
+        save_artifact(cluster_info, CLUSTER_MODEL_PATH)
         print(f"Modelo de clustering de productos guardado en: {CLUSTER_MODEL_PATH}")
         
         # Guardar scaler de productos
         if scaler is not None:
-            joblib.dump(scaler, SCALER_PATH)
+            save_artifact(scaler, SCALER_PATH)
             print(f"Scaler de productos guardado en: {SCALER_PATH}")
+            
+            if product_data is not None:
+                save_artifact(build_neighbors_index(product_data, 'CodigoStock', cluster_type, scaler), NEIGHBORS_PATH)
+                print(f"Índice de vecinos de productos guardado en: {NEIGHBORS_PATH}")
     
     # Guardar modelo de clustering de clientes
     if kmeans_clients is not None:
@@ -296,19 +472,240 @@ def save_models(model, kmeans, scaler, label_encoders, cluster_type, kmeans_clie
             'cluster_type': 'clientes',
             'n_clusters': kmeans_clients.n_clusters
         }
-        joblib.dump(cluster_clients_info, CLUSTER_CLIENTS_MODEL_PATH)
+        save_artifact(cluster_clients_info, CLUSTER_CLIENTS_MODEL_PATH)
         print(f"Modelo de clustering de clientes guardado en: {CLUSTER_CLIENTS_MODEL_PATH}")
         
         # Guardar scaler de clientes
         if scaler_clients is not None:
-            joblib.dump(scaler_clients, SCALER_CLIENTS_PATH)
+            save_artifact(scaler_clients, SCALER_CLIENTS_PATH)
             print(f"Scaler de clientes guardado en: {SCALER_CLIENTS_PATH}")
+            
+            if clients_data is not None:
+                save_artifact(build_neighbors_index(clients_data, 'IDCliente', 'clientes', scaler_clients),
+                              NEIGHBORS_CLIENTS_PATH)
+                print(f"Índice de vecinos de clientes guardado en: {NEIGHBORS_CLIENTS_PATH}")
     
     # Guardar label encoders
-    joblib.dump(label_encoders, LABEL_ENCODER_PATH)
-    print(f"Label encoders guardados en: {LABEL_ENCODER_PATH}")
+    if label_encoders is not None:
+        save_artifact(label_encoders, LABEL_ENCODER_PATH)
+        print(f"Label encoders guardados en: {LABEL_ENCODER_PATH}")
 
-def main():
+def peak_memory_mb():
+    """Memoria residente pico del proceso actual en MB (None si no se puede medir)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa KB; macOS, bytes
+    return peak / (1024 * 1024) if os.uname().sysname == 'Darwin' else peak / 1024
+
+def artifact_path(name, directory):
+    """Ruta de un artefacto ('MODEL_PATH', 'SCALER_PATH', ...) dentro de `directory`"""
+    return os.path.join(directory, os.path.basename(globals()[name]))
+
+def set_artifact_dir(directory):
+    """Apunta las rutas de los artefactos (MODEL_PATH, ...) a `directory`"""
+    for name in ARTIFACT_PATH_NAMES:
+        globals()[name] = artifact_path(name, directory)
+
+def read_artifact_version():
+    """Contenido de models/version.json (None si todavía no se guardó ninguna versión)"""
+    try:
+        with open(ARTIFACT_VERSION_PATH, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def current_artifact_dir(info=None):
+    """
+    Directorio de la versión activa de los artefactos; models/ si no hay
+    versiones (artefactos guardados antes de versionar los directorios)
+    
+    Args:
+        info: Contenido de version.json ya leído (por defecto se lee)
+    """
+    info = read_artifact_version() if info is None else info
+    if info and info.get('ruta'):
+        directory = os.path.join(MODELS_DIR, info['ruta'])
+        if os.path.isdir(directory):
+            return directory
+    return MODELS_DIR
+
+def _link_or_copy(src, dst):
+    # Enlace duro (no ocupa espacio); copia si el sistema de archivos no lo permite
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+def start_artifact_version():
+    """
+    Crea el directorio de una versión nueva con los artefactos de la versión
+    activa (enlaces duros: save_artifact() reemplaza los que se reentrenan sin
+    tocar los originales) y apunta las rutas de los artefactos a él.
+    La versión no se usa hasta publish_artifact_version().
+    
+    Returns:
+        Versión nueva
+    """
+    version = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+    source = current_artifact_dir()
+    directory = os.path.join(VERSIONS_DIR, version)
+    os.makedirs(directory)
+    for name in ARTIFACT_PATH_NAMES:
+        src = artifact_path(name, source)
+        if os.path.isdir(src):
+            shutil.copytree(src, artifact_path(name, directory), copy_function=_link_or_copy)
+        elif os.path.isfile(src):
+            _link_or_copy(src, artifact_path(name, directory))
+    set_artifact_dir(directory)
+    print(f"Artefactos de la versión {version} en: {directory}")
+    return version
+
+def publish_artifact_version(version):
+    """
+    Marca `version` como la versión activa (reemplazo atómico de version.json)
+    y borra las versiones más antiguas que ARTIFACT_VERSIONS_KEPT
+    """
+    tmp_path = ARTIFACT_VERSION_PATH + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'version': version,
+            'fecha': datetime.now().isoformat(timespec='seconds'),
+            'ruta': os.path.relpath(os.path.join(VERSIONS_DIR, version), MODELS_DIR)
+        }, f)
+    os.replace(tmp_path, ARTIFACT_VERSION_PATH)
+    print(f"Versión activa de los artefactos: {version}")
+    
+    # Los nombres de versión se ordenan por fecha; las más nuevas que la activa
+    # pueden ser entrenamientos en curso
+    older = sorted(name for name in os.listdir(VERSIONS_DIR) if name < version)
+    for name in older[:max(len(older) - ARTIFACT_VERSIONS_KEPT, 0)]:
+        shutil.rmtree(os.path.join(VERSIONS_DIR, name), ignore_errors=True)
+    return version
+
+def run_stage(stage, args, threads, directory):
+    """
+    Ejecuta una etapa del pipeline en su propio proceso y guarda sus artefactos
+    
+    Args:
+        stage: 'prediccion', 'clusters_productos' o 'clusters_clientes'
+        args: Argumentos de la línea de comandos
+        threads: Núcleos asignados a la etapa
+        directory: Directorio de la versión que se está entrenando
+    
+    Returns:
+        Informe de la etapa (tiempos y memoria pico)
+    """
+    started_at = datetime.now().isoformat(timespec='seconds')
+    start = time.perf_counter()
+    set_artifact_dir(directory)
+    # Limitar BLAS/OpenMP a los núcleos asignados para respetar el presupuesto total
+    threadpool_limits(threads)
+    
+    # Cada proceso lee los datos de la caché columnar (el proceso principal ya la generó)
+    df, label_encoders = load_and_preprocess_data()
+    load_time = time.perf_counter() - start
+    k_values = list(range(args.k_min, args.k_max + 1)) if args.auto_k else None
+    
+    if stage == 'prediccion':
+        model = train_prediction_model(df, label_encoders, n_jobs=threads, compact=args.compact_model)
+        save_models(model, None, None, None, args.cluster_type)
+    elif stage == 'clusters_productos':
+        kmeans, scaler, product_data = create_clusters(
+            df, n_clusters=args.n_clusters, cluster_type=args.cluster_type,
+            mode=args.cluster_mode, batch_size=args.batch_size, compare=args.compare_cluster_modes,
+            k_values=k_values, scores_path=K_SCORES_PATH, n_jobs=threads,
+            feature_tables=load_feature_tables(df, DATA_PATH)
+        )
+        save_artifact(product_data, CLUSTER_DATA_PATH)
+        save_models(None, kmeans, scaler, None, args.cluster_type, product_data=product_data)
+    elif stage == 'clusters_clientes':
+        kmeans_clients, scaler_clients, clients_data = create_clusters(
+            df, n_clusters=args.n_clusters_clientes, cluster_type='clientes',
+            mode=args.cluster_mode, batch_size=args.batch_size, compare=args.compare_cluster_modes,
+            k_values=k_values, scores_path=K_SCORES_CLIENTS_PATH, n_jobs=threads,
+            feature_tables=load_feature_tables(df, DATA_PATH)
+        )
+        save_artifact(clients_data, CLUSTER_CLIENTS_DATA_PATH)
+        save_models(None, None, None, None, args.cluster_type, kmeans_clients, scaler_clients,
+                    clients_data=clients_data)
+    else:
+        raise ValueError(f"Etapa no válida: {stage}")
+    
+    return {
+        'etapa': stage,
+        'inicio': started_at,
+        'tiempo_s': time.perf_counter() - start,
+        'tiempo_carga_s': load_time,
+        'memoria_pico_mb': peak_memory_mb(),
+        'nucleos': threads,
+        'pid': os.getpid()
+    }
+
+def plan_cores(stages, cores):
+    """
+    Reparte el presupuesto de núcleos entre las etapas: cada clustering usa
+    un núcleo y el Random Forest el resto (siempre al menos uno por etapa)
+    """
+    plan = {stage: 1 for stage in stages}
+    if 'prediccion' in plan:
+        plan['prediccion'] = max(cores - (len(stages) - 1), 1)
+    return plan
+
+def run_pipeline(args, stages, cores):
+    """
+    Ejecuta las etapas independientes en paralelo (un proceso por etapa) sin
+    superar el presupuesto de núcleos y escribe el informe JSON de tiempos
+    """
+    start = time.perf_counter()
+    plan = plan_cores(stages, cores)
+    print(f"Pipeline: {len(stages)} etapas, presupuesto de {cores} núcleos {plan}")
+    
+    # Preparar las cachés una sola vez antes de crear los procesos
+    df, label_encoders = load_and_preprocess_data()
+    if any(stage.startswith('clusters') for stage in stages):
+        load_feature_tables(df, DATA_PATH)
+    version = start_artifact_version()
+    directory = os.path.join(VERSIONS_DIR, version)
+    save_models(None, None, None, label_encoders, args.cluster_type)
+    del df
+    
+    # Procesos nuevos por etapa (spawn) para medir la memoria pico de cada una
+    context = multiprocessing.get_context('spawn')
+    reports = []
+    with ProcessPoolExecutor(max_workers=min(len(stages), cores), mp_context=context,
+                             max_tasks_per_child=1) as pool:
+        # La etapa más larga (Random Forest) primero
+        futures = {pool.submit(run_stage, stage, args, plan[stage], directory): stage for stage in stages}
+        for future in as_completed(futures):
+            report = future.result()
+            print(f"✓ Etapa {report['etapa']} completada en {report['tiempo_s']:.2f} s")
+            reports.append(report)
+    
+    reports.sort(key=lambda report: stages.index(report['etapa']))
+    summary = {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'version': publish_artifact_version(version),
+        'modo': 'pipeline',
+        'nucleos': cores,
+        'tiempo_total_s': time.perf_counter() - start,
+        'memoria_pico_principal_mb': peak_memory_mb(),
+        'etapas': reports
+    }
+    report_path = args.report or TRAINING_REPORT_PATH
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    
+    print(f"\n{'Etapa':<22}{'Núcleos':>8}{'Tiempo (s)':>12}{'Memoria pico (MB)':>20}")
+    for report in reports:
+        memory = f"{report['memoria_pico_mb']:.1f}" if report['memoria_pico_mb'] is not None else '-'
+        print(f"{report['etapa']:<22}{report['nucleos']:>8}{report['tiempo_s']:>12.2f}{memory:>20}")
+    print(f"Tiempo total: {summary['tiempo_total_s']:.2f} s")
+    print(f"Informe guardado en: {report_path}")
+    return summary
+
+def build_parser():
+    """Opciones de la línea de comandos (también las usa /api/train)"""
     parser = argparse.ArgumentParser(description='Entrena modelo de predicción y clustering')
     parser.add_argument('--n-clusters', type=int, default=5, 
                        help='Número de clusters de productos a crear (default: 5)')
@@ -317,6 +714,28 @@ def main():
     parser.add_argument('--cluster-type', type=str, default='rentabilidad',
                        choices=['productos', 'rentabilidad', 'cantidad', 'clientes'],
                        help='Tipo de clustering para productos (default: rentabilidad)')
+    parser.add_argument('--cluster-mode', type=str, default='exact', choices=CLUSTER_MODES,
+                       help='exact: KMeans completo; minibatch: MiniBatchKMeans por lotes para muchos registros (default: exact)')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                       help=f'Filas por lote en el modo minibatch (default: {DEFAULT_BATCH_SIZE})')
+    parser.add_argument('--compare-cluster-modes', action='store_true',
+                       help='Ajustar ambos modos y mostrar tiempo e inercia de cada uno')
+    parser.add_argument('--auto-k', action='store_true',
+                       help='Elegir el número de clusters evaluando varios k en paralelo (ignora --n-clusters)')
+    parser.add_argument('--k-min', type=int, default=2,
+                       help='Menor k a evaluar con --auto-k (default: 2)')
+    parser.add_argument('--k-max', type=int, default=12,
+                       help='Mayor k a evaluar con --auto-k (default: 12)')
+    parser.add_argument('--jobs', type=int, default=None,
+                       help='Procesos para --auto-k (default: uno por núcleo)')
+    parser.add_argument('--compact-model', action='store_true',
+                       help='Guardar un bosque compacto (profundidad/hojas limitadas, arreglos planos con mmap)')
+    parser.add_argument('--pipeline', action='store_true',
+                       help='Ejecutar las etapas independientes en paralelo y guardar un informe JSON de tiempos')
+    parser.add_argument('--cores', type=int, default=None,
+                       help='Presupuesto total de núcleos para --pipeline (default: todos)')
+    parser.add_argument('--report', type=str, default=None,
+                       help=f'Ruta del informe JSON de --pipeline (default: {TRAINING_REPORT_PATH})')
     parser.add_argument('--skip-prediction', action='store_true',
                        help='Saltar entrenamiento del modelo de predicción')
     parser.add_argument('--skip-clustering', action='store_true',
@@ -325,19 +744,82 @@ def main():
                        help='Saltar clustering de productos (solo crear clusters de clientes)')
     parser.add_argument('--skip-clustering-clientes', action='store_true',
                        help='Saltar clustering de clientes (solo crear clusters de productos)')
-    
-    args = parser.parse_args()
-    
+    return parser
+
+def complete_args(args):
+    """Completa los valores por defecto que dependen de otras opciones"""
     # Si no se especifica número de clusters de clientes, usar el mismo que productos
     if args.n_clusters_clientes is None:
         args.n_clusters_clientes = args.n_clusters
+    return args
+
+def training_options(options):
+    """
+    Argumentos de entrenamiento a partir de un diccionario con los nombres de
+    las opciones de la línea de comandos, p. ej. {'n_clusters': 8, 'auto_k': true}
     
-    print("=" * 60)
-    print("ENTRENAMIENTO DE MODELOS")
-    print("=" * 60)
+    Raises:
+        ValueError: Si una opción no existe o su valor no es válido
+    """
+    if not isinstance(options, dict):
+        raise ValueError("Las opciones de entrenamiento deben ser un objeto JSON")
+    parser = build_parser()
+    args = parser.parse_args([])
+    actions = {action.dest: action for action in parser._actions if action.dest not in API_EXCLUDED_OPTIONS}
+    for name, value in options.items():
+        name = name.replace('-', '_')
+        action = actions.get(name)
+        if action is None:
+            raise ValueError(f"Opción de entrenamiento no válida: {name}")
+        if action.nargs == 0:
+            # Opciones sin valor en la línea de comandos (store_true)
+            if not isinstance(value, bool):
+                raise ValueError(f"{name} debe ser true o false")
+        elif value is not None:
+            try:
+                if isinstance(value, bool):
+                    raise ValueError
+                value = action.type(value) if action.type else value
+            except (TypeError, ValueError):
+                raise ValueError(f"Valor no válido para {name}: {value}")
+            if action.choices and value not in action.choices:
+                raise ValueError(f"{name} debe ser uno de: {', '.join(map(str, action.choices))}")
+            if isinstance(value, int) and value < 1:
+                raise ValueError(f"{name} debe ser un entero positivo")
+        setattr(args, name, value)
+    return complete_args(args)
+
+def planned_stages(args):
+    """Etapas de entrenamiento que piden los argumentos, en orden de ejecución"""
+    stages = []
+    if not args.skip_prediction:
+        stages.append('prediccion')
+    if not args.skip_clustering:
+        if not args.skip_clustering_productos and args.cluster_type != 'clientes':
+            stages.append('clusters_productos')
+        if not args.skip_clustering_clientes:
+            stages.append('clusters_clientes')
+    return stages
+
+def run_training(args, on_stage=None):
+    """
+    Entrenamiento secuencial con las opciones de la línea de comandos
+    
+    Args:
+        args: Argumentos de build_parser()
+        on_stage: Función opcional que recibe el nombre de cada etapa al empezarla
+            ('datos', 'prediccion', 'clusters_productos', 'clusters_clientes', 'guardado')
+    
+    Returns:
+        Versión de los artefactos guardados (None si no se guardó nada)
+    """
+    notify = on_stage or (lambda stage: None)
     
     # Cargar y preprocesar datos
+    notify('datos')
     df, label_encoders = load_and_preprocess_data()
+    # Los artefactos nuevos se escriben en el directorio de una versión nueva
+    version = start_artifact_version() if planned_stages(args) else None
     
     model = None
     kmeans = None
@@ -346,7 +828,8 @@ def main():
     
     # Entrenar modelo de predicción
     if not args.skip_prediction:
-        model = train_prediction_model(df, label_encoders)
+        notify('prediccion')
+        model = train_prediction_model(df, label_encoders, compact=args.compact_model)
     
     # Crear clusters de productos
     kmeans = None
@@ -356,61 +839,87 @@ def main():
     scaler_clients = None
     clients_data = None
     
+    # Valores de k a evaluar si se pide la selección automática
+    k_values = list(range(args.k_min, args.k_max + 1)) if args.auto_k else None
+    
     if not args.skip_clustering:
+        # Métricas por producto y por cliente calculadas una sola vez para todos los tipos
+        feature_tables = load_feature_tables(df, DATA_PATH)
+        
         # Crear clusters de productos
         if not args.skip_clustering_productos and args.cluster_type != 'clientes':
+            notify('clusters_productos')
             print("\n" + "=" * 60)
             print(f"CREANDO CLUSTERS DE PRODUCTOS ({args.cluster_type})")
-            print(f"Número de clusters: {args.n_clusters}")
+            print(f"Número de clusters: {'automático' if args.auto_k else args.n_clusters}")
             print("=" * 60)
             kmeans, scaler, product_data = create_clusters(
                 df, 
                 n_clusters=args.n_clusters, 
-                cluster_type=args.cluster_type
+                cluster_type=args.cluster_type,
+                mode=args.cluster_mode,
+                batch_size=args.batch_size,
+                compare=args.compare_cluster_modes,
+                k_values=k_values,
+                scores_path=K_SCORES_PATH,
+                n_jobs=args.jobs,
+                feature_tables=feature_tables
             )
             
             # Guardar datos de productos con clusters
-            cluster_data_path = os.path.join(MODELS_DIR, 'product_clusters.csv')
-            product_data.to_csv(cluster_data_path, index=False, encoding='utf-8')
+            cluster_data_path = CLUSTER_DATA_PATH
+            save_artifact(product_data, cluster_data_path)
             print(f"\nDatos de clusters de productos guardados en: {cluster_data_path}")
         
         # Crear clusters de clientes
         if not args.skip_clustering_clientes:
+            notify('clusters_clientes')
             print("\n" + "=" * 60)
             print("CREANDO CLUSTERS DE CLIENTES")
-            print(f"Número de clusters: {args.n_clusters_clientes}")
+            print(f"Número de clusters: {'automático' if args.auto_k else args.n_clusters_clientes}")
             print("=" * 60)
             kmeans_clients, scaler_clients, clients_data = create_clusters(
                 df,
                 n_clusters=args.n_clusters_clientes,
-                cluster_type='clientes'
+                cluster_type='clientes',
+                mode=args.cluster_mode,
+                batch_size=args.batch_size,
+                compare=args.compare_cluster_modes,
+                k_values=k_values,
+                scores_path=K_SCORES_CLIENTS_PATH,
+                n_jobs=args.jobs,
+                feature_tables=feature_tables
             )
             
             # Guardar datos de clientes con clusters
-            clients_cluster_data_path = os.path.join(MODELS_DIR, 'client_clusters.csv')
-            clients_data.to_csv(clients_cluster_data_path, index=False, encoding='utf-8')
+            clients_cluster_data_path = CLUSTER_CLIENTS_DATA_PATH
+            save_artifact(clients_data, clients_cluster_data_path)
             print(f"\nDatos de clusters de clientes guardados en: {clients_cluster_data_path}")
     
-    # Guardar modelos
+    # Guardar modelos: los que no se entrenaron ya están en la versión nueva
+    # (copiados de la activa al crearla)
+    if version is None:
+        return None
     if model is not None or kmeans is not None:
-        if model is None:
-            # Cargar modelo existente si no se entrenó
-            if os.path.exists(MODEL_PATH):
-                model = joblib.load(MODEL_PATH)
-            else:
-                print("Advertencia: No se puede guardar sin modelo de predicción")
-                return
-        
-        if kmeans is None:
-            # Cargar modelos existentes si no se entrenaron
-            if os.path.exists(CLUSTER_MODEL_PATH):
-                cluster_info = joblib.load(CLUSTER_MODEL_PATH)
-                kmeans = cluster_info['kmeans']
-                args.cluster_type = cluster_info['cluster_type']
-            if os.path.exists(SCALER_PATH):
-                scaler = joblib.load(SCALER_PATH)
-        
-        save_models(model, kmeans, scaler, label_encoders, args.cluster_type, kmeans_clients, scaler_clients)
+        notify('guardado')
+    save_models(model, kmeans, scaler, label_encoders, args.cluster_type, kmeans_clients, scaler_clients,
+                product_data, clients_data)
+    return publish_artifact_version(version)
+
+def main():
+    args = complete_args(build_parser().parse_args())
+    
+    print("=" * 60)
+    print("ENTRENAMIENTO DE MODELOS")
+    print("=" * 60)
+    
+    if args.pipeline:
+        stages = planned_stages(args)
+        if stages:
+            os.makedirs(MODELS_DIR, exist_ok=True)
+            run_pipeline(args, stages, max(args.cores or os.cpu_count() or 1, 1))
+    else:
+        run_training(args)
     
     print("\n" + "=" * 60)
     print("ENTRENAMIENTO COMPLETADO")
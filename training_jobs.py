@@ -0,0 +1,289 @@
+"""
+Trabajos de entrenamiento en segundo plano para /api/train
+Cada trabajo ejecuta run_training() de train_model.py con las mismas opciones
+que la línea de comandos, en un pool de procesos aparte: las peticiones web
+nunca esperan al entrenamiento. El estado (etapa, progreso, tiempos y versión
+de los artefactos) se guarda en un JSON por trabajo, así cualquier worker de
+gunicorn puede responder por un trabajo que encoló otro.
+"""
+
+import json
+import multiprocessing
+import os
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+import train_model
+from train_model import MODELS_DIR, planned_stages, run_training, training_options
+
+JOBS_DIR = os.path.join(MODELS_DIR, 'jobs')
+# Estados de un trabajo
+QUEUED = 'en_cola'
+RUNNING = 'en_ejecucion'
+DONE = 'completado'
+FAILED = 'error'
+ACTIVE_STATES = (QUEUED, RUNNING)
+# Subcarpeta con un archivo vacío por trabajo activo: contar los activos no
+# requiere leer los estados de todos los trabajos terminados
+ACTIVE_DIR = 'activos'
+# Archivo que bloquea submit() entre procesos
+LOCK_NAME = 'submit.lock'
+
+
+class JobLimitError(RuntimeError):
+    """Ya hay tantos trabajos activos como permite el límite"""
+
+
+def _now():
+    return datetime.now().isoformat(timespec='seconds')
+
+
+def _job_path(jobs_dir, job_id):
+    return os.path.join(jobs_dir, f'{job_id}.json')
+
+
+def _active_path(jobs_dir, job_id):
+    return os.path.join(jobs_dir, ACTIVE_DIR, job_id)
+
+
+def _clear_active(jobs_dir, job_id):
+    try:
+        os.remove(_active_path(jobs_dir, job_id))
+    except FileNotFoundError:
+        pass
+
+
+def _write_status(jobs_dir, status):
+    # Reemplazo atómico: los lectores nunca ven un JSON a medio escribir
+    path = _job_path(jobs_dir, status['id'])
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(status, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+    # La marca de activo sigue al estado (se crea después y se borra después)
+    if status['estado'] in ACTIVE_STATES:
+        os.makedirs(os.path.join(jobs_dir, ACTIVE_DIR), exist_ok=True)
+        open(_active_path(jobs_dir, status['id']), 'a').close()
+    else:
+        _clear_active(jobs_dir, status['id'])
+
+
+def _read_status(jobs_dir, job_id):
+    try:
+        with open(_job_path(jobs_dir, job_id), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+@contextmanager
+def _jobs_lock(jobs_dir):
+    """
+    Bloqueo exclusivo entre procesos sobre un archivo de jobs_dir: los workers
+    de gunicorn no comparten el threading.Lock de cada TrainingJobs. El sistema
+    operativo lo libera aunque el proceso muera con el bloqueo tomado.
+    """
+    os.makedirs(jobs_dir, exist_ok=True)
+    with open(os.path.join(jobs_dir, LOCK_NAME), 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _job_stages(args):
+    """Etapas que se informan en el progreso del trabajo"""
+    stages = planned_stages(args)
+    saved = [stage for stage in stages if stage in ('prediccion', 'clusters_productos')]
+    return ['datos'] + stages + (['guardado'] if saved else [])
+
+
+def _process_alive(pid):
+    if pid is None:
+        return False
+    if os.name == 'nt':
+        # En Windows os.kill(pid, 0) termina el proceso: se asume que sigue vivo
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def run_job(jobs_dir, job_id, options, data_path):
+    """
+    Ejecuta un trabajo en el proceso del pool y actualiza su estado en cada etapa
+
+    Returns:
+        Estado final del trabajo
+    """
+    # El mismo CSV que usa la aplicación
+    train_model.DATA_PATH = data_path
+    status = _read_status(jobs_dir, job_id)
+    args = training_options(options)
+    stages = _job_stages(args)
+    status.update({
+        'estado': RUNNING,
+        'inicio': _now(),
+        'pid': os.getpid(),
+        'etapas': stages,
+        'progreso': 0.0
+    })
+    start = stage_start = time.perf_counter()
+
+    def on_stage(stage):
+        nonlocal stage_start
+        now = time.perf_counter()
+        if status['etapa'] is not None:
+            status['tiempos'][status['etapa']] = now - stage_start
+        stage_start = now
+        status['etapa'] = stage
+        status['progreso'] = stages.index(stage) / len(stages)
+        _write_status(jobs_dir, status)
+
+    try:
+        version = run_training(args, on_stage=on_stage)
+    except Exception as e:
+        traceback.print_exc()
+        status.update({'estado': FAILED, 'error': f'{type(e).__name__}: {e}'})
+    else:
+        status.update({'estado': DONE, 'progreso': 1.0, 'version': version})
+    if status['etapa'] is not None:
+        status['tiempos'][status['etapa']] = time.perf_counter() - stage_start
+    status['tiempo_total_s'] = time.perf_counter() - start
+    status['fin'] = _now()
+    _write_status(jobs_dir, status)
+    return status
+
+
+class TrainingJobs:
+    """
+    Cola de trabajos de entrenamiento con un límite de trabajos activos
+
+    Args:
+        max_jobs: Trabajos en cola o en ejecución permitidos a la vez (en todos
+            los workers: se cuentan las marcas de activo con un bloqueo de archivo)
+        jobs_dir: Carpeta de los archivos de estado
+    """
+
+    def __init__(self, max_jobs=1, jobs_dir=JOBS_DIR):
+        self.max_jobs = max_jobs
+        self.jobs_dir = jobs_dir
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _executor(self):
+        # Procesos nuevos (spawn): no heredan los hilos ni los datos del worker web
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_jobs,
+                mp_context=multiprocessing.get_context('spawn'),
+                max_tasks_per_child=1
+            )
+        return self._pool
+
+    def _refresh(self, status):
+        """Marca como fallido un trabajo activo cuyo proceso ya no existe"""
+        if status['estado'] not in ACTIVE_STATES:
+            return status
+        owner = status['pid'] if status['estado'] == RUNNING else status['worker_pid']
+        if not _process_alive(owner):
+            status.update({'estado': FAILED, 'error': 'El proceso del trabajo terminó sin informar el resultado',
+                           'fin': _now()})
+            _write_status(self.jobs_dir, status)
+        return status
+
+    def active(self):
+        """Trabajos en cola o en ejecución (solo se leen los que tienen marca de activo)"""
+        active_dir = os.path.join(self.jobs_dir, ACTIVE_DIR)
+        if not os.path.isdir(active_dir):
+            return []
+        jobs = []
+        for job_id in os.listdir(active_dir):
+            status = _read_status(self.jobs_dir, job_id)
+            if status is not None and self._refresh(status)['estado'] in ACTIVE_STATES:
+                jobs.append(status)
+            else:
+                # Marca que quedó de un trabajo ya terminado
+                _clear_active(self.jobs_dir, job_id)
+        return jobs
+
+    def submit(self, options, data_path):
+        """
+        Encola un entrenamiento
+
+        Args:
+            options: Opciones con los nombres de la línea de comandos ({'n_clusters': 8, ...})
+            data_path: CSV de transacciones con el que se entrena
+
+        Returns:
+            Estado inicial del trabajo
+
+        Raises:
+            ValueError: Si las opciones no son válidas
+            JobLimitError: Si ya se alcanzó el límite de trabajos activos
+        """
+        args = training_options(options)
+        # Contar y encolar con el bloqueo tomado: otro worker no puede encolar entre medio
+        with self._lock, _jobs_lock(self.jobs_dir):
+            if len(self.active()) >= self.max_jobs:
+                raise JobLimitError(f"Ya hay {self.max_jobs} entrenamiento(s) en curso; intenta más tarde")
+            status = {
+                'id': uuid.uuid4().hex[:12],
+                'estado': QUEUED,
+                'opciones': options,
+                'creado': _now(),
+                'inicio': None,
+                'fin': None,
+                'etapa': None,
+                'etapas': _job_stages(args),
+                'progreso': 0.0,
+                'tiempos': {},
+                'tiempo_total_s': None,
+                'version': None,
+                'error': None,
+                'pid': None,
+                'worker_pid': os.getpid()
+            }
+            _write_status(self.jobs_dir, status)
+            future = self._executor().submit(run_job, self.jobs_dir, status['id'], options, data_path)
+        future.add_done_callback(lambda f: self._finished(status['id'], f))
+        return status
+
+    def _finished(self, job_id, future):
+        # Si el proceso murió (p. ej. sin memoria) el trabajo no pudo escribir su estado final
+        if future.exception() is not None:
+            status = _read_status(self.jobs_dir, job_id)
+            if status is not None and status['estado'] in ACTIVE_STATES:
+                status.update({'estado': FAILED, 'error': str(future.exception()), 'fin': _now()})
+                _write_status(self.jobs_dir, status)
+
+    def status(self, job_id):
+        """Estado de un trabajo o None si no existe"""
+        if not job_id.isalnum():
+            return None
+        status = _read_status(self.jobs_dir, job_id)
+        return self._refresh(status) if status is not None else None
@@ -0,0 +1,241 @@
+"""
+Cubo de tendencias temporales
+Acumula ingresos, cantidad, transacciones y facturas distintas por día ×
+categoría y por hora del día × día de la semana × categoría al cargar los
+datos. /api/trends responde sumando celdas del cubo, sin recorrer las
+transacciones. Los lotes nuevos se suman con update().
+"""
+
+import numpy as np
+import pandas as pd
+
+# Granularidades de /api/trends
+GRANULARITIES = ['dia', 'semana', 'mes', 'hora', 'dia_semana', 'hora_dia_semana']
+DAY_NAMES = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo']
+METRICS = ['ingresos', 'cantidad', 'transacciones', 'facturas']
+HOURS = 24
+WEEKDAYS = 7
+# Multiplicador para combinar el hash de la factura con la celda (Fibonacci, 64 bits)
+_MIX = np.uint64(0x9E3779B97F4A7C15)
+# Separación entre días (u horas) en el identificador estable de una celda con categoría
+_CELL_STRIDE = 1 << 16
+
+
+def _cube_rows(df):
+    """
+    Columnas del cubo por transacción. Las filas sin fecha o sin categoría no
+    entran al cubo; las que no tienen hora válida solo entran al cubo diario.
+    """
+    fechas = pd.to_datetime(df['Fecha'])
+    valid = fechas.notna().to_numpy() & df['Categoria'].notna().to_numpy()
+    hours = pd.to_numeric(df['Hora_24h'], errors='coerce').to_numpy(dtype=float)[valid]
+    weekdays = fechas.dt.dayofweek.to_numpy(dtype=float)[valid]
+    timed = (hours >= 0) & (hours < HOURS) & ~np.isnan(weekdays)
+
+    # Hash estable del número de factura (no depende de los códigos del categórico)
+    invoices = pd.Categorical(df['NumeroFactura'])[valid].remove_unused_categories()
+    invoice_hashes = pd.util.hash_array(invoices.categories.astype(str).to_numpy(dtype=object))
+    return {
+        'dia': fechas.to_numpy(dtype='datetime64[D]').astype(np.int64)[valid],
+        'hora': np.where(timed, hours, 0).astype(np.int64),
+        'dia_semana': np.where(timed, weekdays, 0).astype(np.int64),
+        'con_hora': timed,
+        'categoria': pd.Categorical(df['Categoria'])[valid],
+        'factura': np.append(invoice_hashes, np.uint64(0))[invoices.codes],
+        'con_factura': invoices.codes >= 0,
+        'ingresos': np.nan_to_num(df['Ingresos'].to_numpy(dtype=float)[valid]),
+        'cantidad': np.nan_to_num(df['Cantidad'].to_numpy(dtype=float)[valid])
+    }
+
+
+class TrendsCube:
+    """
+    Cubo denso de métricas por día × categoría y hora × día de la semana × categoría
+
+    Las facturas distintas no se pueden sumar entre celdas si una factura
+    aparece en varias, así que se guardan aparte los conteos de todas las
+    categorías juntas. Al agrupar días en semanas o meses (y horas o días de la
+    semana entre sí) los conteos se suman: una factura tiene una sola fecha y hora.
+
+    Args:
+        df: DataFrame preprocesado con las transacciones
+    """
+
+    def __init__(self, df):
+        # Arreglos vacíos; _add() los extiende a los días y categorías de los datos
+        self._categories = []
+        self._start = 0
+        self._daily = {name: np.zeros((0, 0)) for name in METRICS}
+        self._daily_invoices = np.zeros(0)
+        self._hourly = {name: np.zeros((HOURS, WEEKDAYS, 0)) for name in METRICS}
+        self._hourly_invoices = np.zeros((HOURS, WEEKDAYS))
+
+        # Claves (factura, celda) ya contadas como hashes ordenados, para que
+        # update() sume solo las facturas nuevas de cada celda
+        self._seen = {
+            'dia_categoria': np.zeros(0, dtype=np.uint64), 'dia': np.zeros(0, dtype=np.uint64),
+            'hora_categoria': np.zeros(0, dtype=np.uint64), 'hora': np.zeros(0, dtype=np.uint64)
+        }
+        self._add(_cube_rows(df))
+
+    def _extend(self, rows):
+        """Agrega las categorías y los días nuevos del lote a los arreglos"""
+        present = rows['categoria'].remove_unused_categories().categories
+        nuevas = sorted(set(str(c) for c in present) - set(self._categories))
+        if nuevas:
+            self._categories.extend(nuevas)
+            pad = len(nuevas)
+            self._daily = {k: np.pad(v, ((0, 0), (0, pad))) for k, v in self._daily.items()}
+            self._hourly = {k: np.pad(v, ((0, 0), (0, 0), (0, pad))) for k, v in self._hourly.items()}
+
+        if not len(rows['dia']):
+            return
+        n_days = len(self._daily_invoices)
+        first, last = int(rows['dia'].min()), int(rows['dia'].max())
+        if n_days == 0:
+            self._start, before, after = first, 0, last - first + 1
+        else:
+            before = max(self._start - first, 0)
+            after = max(last - (self._start + n_days - 1), 0)
+        if before or after:
+            self._daily = {k: np.pad(v, ((before, after), (0, 0))) for k, v in self._daily.items()}
+            self._daily_invoices = np.pad(self._daily_invoices, (before, after))
+            self._start -= before
+
+    def _new_keys(self, key, invoices, cells):
+        """
+        Posiciones (una por clave distinta) de las claves (factura, celda) que
+        no se habían contado; las marca como vistas. `cells` debe identificar la
+        celda de forma estable entre lotes.
+        """
+        keys = invoices ^ (cells.astype(np.uint64) * _MIX)
+        # Primera aparición de cada clave con hash (más rápido que ordenar todas las filas)
+        first = np.flatnonzero(~pd.Series(keys).duplicated().to_numpy())
+        first = first[np.argsort(keys[first])]
+        keys = keys[first]
+        seen = self._seen[key]
+        if len(seen):
+            pos = np.searchsorted(seen, keys)
+            new = seen[np.minimum(pos, len(seen) - 1)] != keys
+            keys, first, pos = keys[new], first[new], pos[new]
+            self._seen[key] = np.insert(seen, pos, keys)
+        else:
+            self._seen[key] = keys
+        return first
+
+    def _add(self, rows):
+        """Extiende el cubo si hace falta, suma las filas y cuenta las facturas nuevas"""
+        self._extend(rows)
+        if not len(rows['dia']):
+            return
+        column_of = {name: i for i, name in enumerate(self._categories)}
+        lookup = np.array([column_of.get(str(c), -1) for c in rows['categoria'].categories], dtype=np.int64)
+        category = lookup[rows['categoria'].codes]
+        day = rows['dia'] - self._start
+        hour = rows['hora'] * WEEKDAYS + rows['dia_semana']
+        timed = rows['con_hora']
+
+        # Índice plano de cada celda: un bincount por métrica en lugar de np.add.at
+        n_categories = len(self._categories)
+        daily_cell = day * n_categories + category
+        hourly_cell = hour * n_categories + category
+        for name, values in (('ingresos', rows['ingresos']),
+                             ('cantidad', rows['cantidad']),
+                             ('transacciones', np.ones(len(day)))):
+            daily = self._daily[name]
+            daily += np.bincount(daily_cell, weights=values, minlength=daily.size).reshape(daily.shape)
+            hourly = self._hourly[name]
+            hourly += np.bincount(hourly_cell[timed], weights=values[timed],
+                                  minlength=hourly.size).reshape(hourly.shape)
+
+        # Facturas distintas por celda: solo las claves que no se habían visto.
+        # Las claves usan el día absoluto y la columna de la categoría, que no
+        # cambian al extender el cubo
+        invoiced = np.flatnonzero(rows['con_factura'])
+        invoices = rows['factura'][invoiced]
+        absolute_day = rows['dia'][invoiced]
+        new = invoiced[self._new_keys('dia_categoria', invoices, absolute_day * _CELL_STRIDE + category[invoiced])]
+        daily = self._daily['facturas']
+        daily += np.bincount(daily_cell[new], minlength=daily.size).reshape(daily.shape)
+        new = invoiced[self._new_keys('dia', invoices, absolute_day)]
+        self._daily_invoices += np.bincount(day[new], minlength=len(self._daily_invoices))
+
+        invoiced = invoiced[timed[invoiced]]
+        invoices = rows['factura'][invoiced]
+        new = invoiced[self._new_keys('hora_categoria', invoices, hour[invoiced] * _CELL_STRIDE + category[invoiced])]
+        hourly = self._hourly['facturas']
+        hourly += np.bincount(hourly_cell[new], minlength=hourly.size).reshape(hourly.shape)
+        new = invoiced[self._new_keys('hora', invoices, hour[invoiced])]
+        self._hourly_invoices += np.bincount(hour[new], minlength=HOURS * WEEKDAYS).reshape(HOURS, WEEKDAYS)
+
+    def update(self, batch):
+        """Suma un lote de transacciones nuevas (ya preprocesadas) al cubo"""
+        self._add(_cube_rows(batch))
+
+    @property
+    def categories(self):
+        return list(self._categories)
+
+    def _select(self, cube, invoices, categoria):
+        """Métricas de una categoría o de todas (sumando la última dimensión)"""
+        if categoria is None:
+            values = {name: cube[name].sum(axis=-1) for name in METRICS if name != 'facturas'}
+            values['facturas'] = invoices
+            return values
+        column = self._categories.index(categoria)
+        return {name: cube[name][..., column] for name in METRICS}
+
+    def trends(self, granularidad='dia', categoria=None):
+        """
+        Serie de métricas por período
+
+        Args:
+            granularidad: Una de GRANULARITIES
+            categoria: Nombre de la categoría o None para todas
+
+        Returns:
+            Lista de diccionarios {periodo, ingresos, cantidad, transacciones, facturas}
+
+        Raises:
+            ValueError: Si la granularidad no es válida
+            KeyError: Si la categoría no existe
+        """
+        if granularidad not in GRANULARITIES:
+            raise ValueError(f"Granularidad no válida: {granularidad}. Usa una de: {', '.join(GRANULARITIES)}")
+        if categoria is not None and categoria not in self._categories:
+            raise KeyError(categoria)
+
+        if granularidad in ('dia', 'semana', 'mes'):
+            values = self._select(self._daily, self._daily_invoices, categoria)
+            days = np.arange(self._start, self._start + len(self._daily_invoices)).astype('datetime64[D]')
+            if granularidad == 'dia':
+                labels, groups = days, np.arange(len(days))
+            else:
+                if granularidad == 'semana':
+                    # Semanas que empiezan el lunes (el 1970-01-01 fue jueves)
+                    periods = days - ((days.astype(np.int64) + 3) % 7)
+                else:
+                    periods = days.astype('datetime64[M]').astype('datetime64[D]')
+                labels, groups = np.unique(periods, return_inverse=True)
+            labels = [str(label) for label in labels]
+            totals = {name: np.bincount(groups, weights=v, minlength=len(labels)) for name, v in values.items()}
+        else:
+            values = self._select(self._hourly, self._hourly_invoices, categoria)
+            if granularidad == 'hora':
+                labels = list(range(HOURS))
+                totals = {name: v.sum(axis=1) for name, v in values.items()}
+            elif granularidad == 'dia_semana':
+                labels = DAY_NAMES
+                totals = {name: v.sum(axis=0) for name, v in values.items()}
+            else:
+                labels = [{'hora': h, 'dia_semana': DAY_NAMES[w]} for h in range(HOURS) for w in range(WEEKDAYS)]
+                totals = {name: v.reshape(-1) for name, v in values.items()}
+
+        result = []
+        for i, label in enumerate(labels):
+            item = dict(label) if isinstance(label, dict) else {'periodo': label}
+            item['ingresos'] = float(totals['ingresos'][i])
+            for name in ('cantidad', 'transacciones', 'facturas'):
+                item[name] = int(round(totals[name][i]))
+            result.append(item)
+        return result
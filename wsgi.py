@@ -0,0 +1,15 @@
+"""
+Punto de entrada WSGI para producción
+Carga datos y modelos al importar el módulo; con preload_app de gunicorn
+esto ocurre una sola vez en el proceso maestro antes de crear los workers.
+"""
+
+import gc
+
+from app import app, initialize
+
+initialize()
+
+# Mover los objetos ya cargados fuera del recolector de basura para que los
+# workers no toquen (y copien) esas páginas de memoria al recolectar
+gc.freeze()